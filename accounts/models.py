@@ -23,6 +23,13 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.email} - Level {self.level}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        profile = super().from_db(db, field_names, values)
+        # The stored timezone, so a save can tell it changed (analytics.signals rebuilds the rollup)
+        profile._saved_timezone = profile.__dict__.get('timezone')
+        return profile
+    
     def update_level(self):
         """Update user level based on points"""
         new_level = (self.total_points // 100) + 1
@@ -0,0 +1,92 @@
+import csv
+import json
+from datetime import date, datetime
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from points.models import DailyActivity, PointTransaction
+from tasks.models import Task
+
+
+# Rows fetched per database round trip while streaming
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Exported columns per dataset; team exports add the owner's username
+DATASETS = {
+    'tasks': {
+        'model': Task,
+        'fields': [
+            'id', 'title', 'description', 'status', 'priority', 'category', 'focus_category', 'tags',
+            'due_date', 'completed_at', 'created_at', 'updated_at', 'points_awarded', 'pomodoro_sessions',
+            'team_id', 'assigned_to__username',
+        ],
+    },
+    'point_transactions': {
+        'model': PointTransaction,
+        'fields': ['id', 'created_at', 'points', 'transaction_type', 'description', 'task_id'],
+    },
+    'daily_activity': {
+        'model': DailyActivity,
+        'fields': ['date', 'tasks_completed', 'tasks_total', 'points_earned', 'streak_day'],
+    },
+}
+
+
+def export_fields(dataset, team=None):
+    fields = DATASETS[dataset]['fields']
+    return ['user__username'] + fields if team is not None else fields
+
+
+def export_queryset(dataset, user=None, team=None):
+    """
+    values() rows of a dataset for one user or one team, in primary key order.
+    A team's tasks are the tasks shared with it; its points and activity are its members'.
+    """
+    model = DATASETS[dataset]['model']
+    if team is None:
+        rows = model.objects.filter(user=user)
+    elif model is Task:
+        rows = model.objects.filter(team=team)
+    else:
+        rows = model.objects.filter(user__in=team.members.values('pk'))
+    return rows.order_by('pk').values(*export_fields(dataset, team))
+
+
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+def csv_lines(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([csv_value(row[field]) for field in fields])
+
+
+def ndjson_lines(rows, fields):
+    for row in rows:
+        yield json.dumps({field: row[field] for field in fields}, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(dataset, export_format, user=None, team=None):
+    """
+    Lines of an export, generated lazily: rows come from a values() iterator in chunks of
+    EXPORT_CHUNK_SIZE, so memory stays flat however many rows there are.
+    """
+    fields = export_fields(dataset, team)
+    rows = export_queryset(dataset, user=user, team=team).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    lines = csv_lines if export_format == 'csv' else ndjson_lines
+    return lines(rows, fields)
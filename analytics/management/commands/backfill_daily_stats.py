@@ -0,0 +1,41 @@
+import logging
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from analytics.rollup import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user daily analytics rollup (UserDailyStats) from existing tasks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='Rebuild the rollup for a specific user ID only'
+        )
+    
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user_id']:
+            users = users.filter(id=options['user_id'])
+        
+        rebuilt_users = rows = failed = 0
+        for user in users.iterator():
+            try:
+                user_rows = rebuild_daily_stats(user.id)
+            except Exception:
+                logging.exception(f"Daily stats backfill failed for {user.username}")
+                failed += 1
+                continue
+            
+            rebuilt_users += 1
+            rows += user_rows
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'  {user.username}: {user_rows} days')
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt {rows} daily stats rows for {rebuilt_users} users'
+                + (f' ({failed} failed)' if failed else '')
+            )
+        )
@@ -0,0 +1,44 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from teams.models import Team
+from analytics.exports import DATASETS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream a user's or team's tasks, point transactions or daily activity as CSV or NDJSON"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS, help='What to export')
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--user-id', type=int, help='Export this user\'s data')
+        scope.add_argument('--team-id', help='Export this team\'s data (UUID)')
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format (default: csv)')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+    
+    def handle(self, *args, **options):
+        user = team = None
+        try:
+            if options['user_id']:
+                user = User.objects.get(id=options['user_id'])
+            else:
+                team = Team.objects.get(id=options['team_id'])
+        except (User.DoesNotExist, Team.DoesNotExist, ValidationError):
+            raise CommandError('No such user or team')
+        
+        lines = stream_export(options['dataset'], options['format'], user=user, team=team)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                rows = self.write(lines, output) - (options['format'] == 'csv')  # minus the header
+            self.stderr.write(self.style.SUCCESS(f"Exported {rows} rows to {options['output']}"))
+        else:
+            self.stdout.ending = ''  # lines already end with a newline
+            self.write(lines, self.stdout)
+    
+    def write(self, lines, output):
+        """Write lines as they are produced; returns how many were written"""
+        count = 0
+        for line in lines:
+            output.write(line)
+            count += 1
+        return count
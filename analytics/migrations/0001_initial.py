@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('tasks_created', models.IntegerField(default=0)),
+                ('tasks_completed', models.IntegerField(default=0)),
+                ('points_earned', models.IntegerField(default=0)),
+                ('category_counts', models.JSONField(default=dict, help_text='Completed tasks per category')),
+                ('priority_counts', models.JSONField(default=dict, help_text='Completed tasks per priority')),
+                ('tasks_due', models.IntegerField(default=0)),
+                ('tasks_due_completed', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User daily stats',
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Build every user's rollup from their existing tasks, so history isn't empty after deploy"""
+    from analytics.queries import resolve_timezone
+    from analytics.rollup import ROLLUP_FIELDS, daily_totals
+
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    Task = apps.get_model('tasks', 'Task')
+    UserDailyStats = apps.get_model('analytics', 'UserDailyStats')
+
+    timezones = dict(UserProfile.objects.values_list('user_id', 'timezone'))
+    for user_id in User.objects.order_by('pk').values_list('pk', flat=True).iterator():
+        states = Task.objects.filter(user_id=user_id).order_by().values(*ROLLUP_FIELDS).iterator(chunk_size=2000)
+        rows = [
+            UserDailyStats(user_id=user_id, date=day, **values)
+            for day, values in daily_totals(states, resolve_timezone(timezones.get(user_id))).items()
+        ]
+        UserDailyStats.objects.filter(user_id=user_id).delete()
+        UserDailyStats.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_auto_20250905_1549'),
+        ('analytics', '0001_initial'),
+        ('tasks', '0010_task_moscow_classification'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,57 @@
 from django.db import models
+from django.contrib.auth.models import User
 
-# Create your models here.
+
+class UserDailyStats(models.Model):
+    """
+    Per-user, per-day rollup of task activity, so analytics read O(days) rows instead of
+    every task. Days are local dates in the user's profile timezone.
+
+    Kept up to date by analytics.signals, which also rebuilds a user's rows when their
+    profile timezone changes; rebuild with `manage.py backfill_daily_stats` after bulk
+    changes (queryset update()/bulk_create skip signals).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    # Tasks created on this day
+    tasks_created = models.IntegerField(default=0)
+    # Tasks completed on this day, the points they awarded and their categories/priorities
+    tasks_completed = models.IntegerField(default=0)
+    points_earned = models.IntegerField(default=0)
+    category_counts = models.JSONField(default=dict, help_text="Completed tasks per category")
+    priority_counts = models.JSONField(default=dict, help_text="Completed tasks per priority")
+    # Tasks due on this day, and how many of them are done
+    tasks_due = models.IntegerField(default=0)
+    tasks_due_completed = models.IntegerField(default=0)
+
+    COUNTER_FIELDS = ['tasks_created', 'tasks_completed', 'points_earned', 'tasks_due', 'tasks_due_completed']
+    BREAKDOWN_FIELDS = ['category_counts', 'priority_counts']
+
+    class Meta:
+        unique_together = ['user', 'date']
+        ordering = ['-date']
+        verbose_name_plural = "User daily stats"
+
+    @property
+    def tasks_overdue(self):
+        """Tasks due on this day that are not done (overdue once the day has passed)"""
+        return self.tasks_due - self.tasks_due_completed
+
+    def apply(self, delta):
+        """Add a delta from analytics.rollup (counter -> n, (breakdown, key) -> n)"""
+        for name, value in delta.items():
+            if isinstance(name, tuple):
+                field, key = name
+                counts = getattr(self, field)
+                counts[key] = counts.get(key, 0) + value
+                if not counts[key]:
+                    del counts[key]
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def is_empty(self):
+        return not any(getattr(self, field) for field in self.COUNTER_FIELDS + self.BREAKDOWN_FIELDS)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} ({self.tasks_completed} completed)"
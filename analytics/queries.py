@@ -0,0 +1,99 @@
+import zoneinfo
+from datetime import datetime, time, timedelta
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+from tasks.models import Task
+
+
+PENDING_STATUSES = ['todo', 'in_progress']
+
+
+def overview_counters(now):
+    """Total / completed / pending / overdue task counts"""
+    return {
+        'total_tasks': Count('id'),
+        'completed_tasks': Count('id', filter=Q(status='done')),
+        'pending_tasks': Count('id', filter=Q(status__in=PENDING_STATUSES)),
+        'overdue_tasks': Count('id', filter=Q(due_date__lt=now, status__in=PENDING_STATUSES)),
+    }
+
+
+def status_counters():
+    """One count per status choice, keyed status_<status>"""
+    return {f'status_{status}': Count('id', filter=Q(status=status)) for status, _ in Task.STATUS_CHOICES}
+
+
+def priority_counters():
+    """Total and completed counts per priority choice, keyed priority_<priority>[_completed]"""
+    counters = {}
+    for priority, _ in Task.PRIORITY_CHOICES:
+        counters[f'priority_{priority}'] = Count('id', filter=Q(priority=priority))
+        counters[f'priority_{priority}_completed'] = Count('id', filter=Q(priority=priority, status='done'))
+    return counters
+
+
+def count_tasks(tasks, *counter_groups, **counters):
+    """
+    Evaluate counter groups (dicts of conditional Count expressions) over a task
+    queryset in a single aggregate query.
+    """
+    aggregates = {}
+    for group in counter_groups:
+        aggregates.update(group)
+    aggregates.update(counters)
+    return tasks.aggregate(**aggregates)
+
+
+def completion_rate(completed, total):
+    return (completed / total * 100) if total > 0 else 0
+
+
+def resolve_timezone(name):
+    """ZoneInfo for a profile timezone name (the site timezone if it is missing or unknown)"""
+    try:
+        return zoneinfo.ZoneInfo(name) if name else timezone.get_current_timezone()
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        return timezone.get_current_timezone()
+
+
+def user_timezone(user):
+    """The timezone from the user's profile (the site timezone if it is missing or unknown)"""
+    try:
+        return resolve_timezone(user.userprofile.timezone)
+    except ObjectDoesNotExist:
+        return timezone.get_current_timezone()
+
+
+def bucket_counts(tasks, field, start_date, end_date, tz, period='day', **aggregates):
+    """
+    Aggregates per local day (or Monday-based week) of a datetime field, from one grouped query.
+
+    Only tasks whose `field` falls on start_date..end_date in `tz` are counted. Returns
+    {bucket date: {name: value}} with every bucket in the range present; buckets without
+    rows are zero-filled.
+    """
+    trunc = TruncDate if period == 'day' else TruncWeek
+    range_start = datetime.combine(start_date, time.min, tzinfo=tz)
+    range_end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz)
+    rows = tasks.filter(
+        **{f'{field}__gte': range_start, f'{field}__lt': range_end}
+    ).annotate(
+        bucket=trunc(field, tzinfo=tz)
+    ).values('bucket').annotate(**aggregates).order_by('bucket')
+
+    found = {}
+    for row in rows:
+        bucket = row.pop('bucket')
+        if isinstance(bucket, datetime):
+            bucket = bucket.date()
+        found[bucket] = {name: value or 0 for name, value in row.items()}
+
+    step = timedelta(days=1 if period == 'day' else 7)
+    bucket = start_date if period == 'day' else start_date - timedelta(days=start_date.weekday())
+    buckets = {}
+    while bucket <= end_date:
+        buckets[bucket] = found.get(bucket, {name: 0 for name in aggregates})
+        bucket += step
+    return buckets
@@ -0,0 +1,140 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db import transaction
+from accounts.models import UserProfile
+from tasks.models import Task
+from .models import UserDailyStats
+from .queries import resolve_timezone
+
+
+# Task fields the rollup is derived from
+ROLLUP_FIELDS = ['user_id', 'status', 'category', 'priority', 'points_awarded', 'created_at', 'completed_at', 'due_date']
+
+
+def task_state(task):
+    """The rollup-relevant fields of a task instance, shaped like a values(*ROLLUP_FIELDS) row"""
+    return {field: getattr(task, field) for field in ROLLUP_FIELDS}
+
+
+def rollup_timezone(user_id):
+    """The timezone a user's rollup days are counted in"""
+    return resolve_timezone(
+        UserProfile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first()
+    )
+
+
+def contributions(state, tz, sign=1):
+    """{local date: delta} that one task state adds to (sign=-1: removes from) its user's rollup"""
+    deltas = defaultdict(Counter)
+    done = state['status'] == 'done'
+    if state['created_at']:
+        deltas[state['created_at'].astimezone(tz).date()]['tasks_created'] += sign
+    if done and state['completed_at']:
+        day = deltas[state['completed_at'].astimezone(tz).date()]
+        day['tasks_completed'] += sign
+        day['points_earned'] += sign * (state['points_awarded'] or 0)
+        day[('category_counts', state['category'])] += sign
+        day[('priority_counts', state['priority'])] += sign
+    if state['due_date']:
+        day = deltas[state['due_date'].astimezone(tz).date()]
+        day['tasks_due'] += sign
+        if done:
+            day['tasks_due_completed'] += sign
+    return deltas
+
+
+def apply_deltas(user_id, deltas):
+    """Add {date: delta} to a user's rollup rows, creating rows as needed and dropping emptied ones"""
+    with transaction.atomic():
+        for day, delta in sorted(deltas.items()):
+            stats, _ = UserDailyStats.objects.select_for_update().get_or_create(user_id=user_id, date=day)
+            stats.apply(delta)
+            if stats.is_empty:
+                stats.delete()
+            else:
+                stats.save()
+
+
+def record_task_change(previous, current):
+    """
+    Move a task's contribution from its previous state to its current one.
+    Either may be None (task created / deleted); only the days that actually change are written.
+    """
+    if previous == current:
+        return
+
+    timezones = {}
+    changes = defaultdict(lambda: defaultdict(Counter))
+    for state, sign in ((previous, -1), (current, 1)):
+        if state is None:
+            continue
+        user_id = state['user_id']
+        if user_id not in timezones:
+            timezones[user_id] = rollup_timezone(user_id)
+        for day, delta in contributions(state, timezones[user_id], sign).items():
+            changes[user_id][day].update(delta)
+
+    for user_id, deltas in changes.items():
+        deltas = {
+            day: {name: value for name, value in delta.items() if value}
+            for day, delta in deltas.items()
+        }
+        deltas = {day: delta for day, delta in deltas.items() if delta}
+        if deltas:
+            apply_deltas(user_id, deltas)
+
+
+def daily_totals(states, tz):
+    """{local date: {counter: n, breakdown: {key: n}}} summed over task states (values(*ROLLUP_FIELDS) rows)"""
+    totals = defaultdict(Counter)
+    for state in states:
+        for day, delta in contributions(state, tz).items():
+            totals[day].update(delta)
+
+    days = {}
+    for day, delta in sorted(totals.items()):
+        values = {}
+        for name, value in delta.items():
+            if not value:
+                continue
+            if isinstance(name, tuple):
+                field, key = name
+                values.setdefault(field, {})[key] = value
+            else:
+                values[name] = value
+        if values:
+            days[day] = values
+    return days
+
+
+def build_daily_stats(user_id, tz=None):
+    """A user's rollup rows computed from scratch from their tasks (unsaved)"""
+    tz = tz or rollup_timezone(user_id)
+    states = Task.objects.filter(user_id=user_id).values(*ROLLUP_FIELDS).iterator(chunk_size=2000)
+    return [
+        UserDailyStats(user_id=user_id, date=day, **values)
+        for day, values in daily_totals(states, tz).items()
+    ]
+
+
+def rebuild_daily_stats(user_id):
+    """Replace a user's rollup rows with ones rebuilt from their tasks; returns the row count"""
+    rows = build_daily_stats(user_id)
+    with transaction.atomic():
+        UserDailyStats.objects.filter(user_id=user_id).delete()
+        UserDailyStats.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def daily_stats(user, start_date, end_date):
+    """{date: UserDailyStats} for every day of start_date..end_date; days without activity get empty rows"""
+    found = {
+        stats.date: stats
+        for stats in UserDailyStats.objects.filter(user=user, date__gte=start_date, date__lte=end_date)
+    }
+    days = {}
+    current_date = start_date
+    while current_date <= end_date:
+        days[current_date] = found.get(current_date) or UserDailyStats(user=user, date=current_date)
+        current_date += timedelta(days=1)
+    return days
@@ -0,0 +1,51 @@
+import logging
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.models import UserProfile
+from tasks.models import Task
+from tasks.signals import stored_snapshot
+from .queries import resolve_timezone
+from .rollup import ROLLUP_FIELDS, rebuild_daily_stats, record_task_change, task_state
+
+
+@receiver(post_save, sender=Task)
+def update_daily_stats(sender, instance, **kwargs):
+    """Signal handler for when a task is saved: moves its counts between rollup days"""
+    # Stored values before and after this save (tasks.signals)
+    snapshot = getattr(instance, '_saved_snapshot', None)
+    stored = stored_snapshot(instance)
+    previous = {field: snapshot[field] for field in ROLLUP_FIELDS} if snapshot else None
+    current = {field: stored[field] for field in ROLLUP_FIELDS}
+    try:
+        record_task_change(previous, current)
+    except Exception:
+        # The task itself is saved; backfill_daily_stats repairs the rollup
+        logging.exception(f"Daily stats update failed for task {instance.pk}")
+
+
+@receiver(post_delete, sender=Task)
+def remove_from_daily_stats(sender, instance, origin=None, **kwargs):
+    """Signal handler for when a task is deleted: takes its counts out of the rollup"""
+    # When the owner is deleted their rollup rows go with them
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is User:
+        return
+    try:
+        record_task_change(task_state(instance), None)
+    except Exception:
+        logging.exception(f"Daily stats update failed for deleted task {instance.pk}")
+
+
+@receiver(post_save, sender=UserProfile)
+def rebuild_daily_stats_on_timezone_change(sender, instance, created, **kwargs):
+    """Rollup days are local dates, so a new profile timezone re-buckets the user's whole rollup"""
+    saved_timezone = getattr(instance, '_saved_timezone', None)
+    instance._saved_timezone = instance.timezone
+    if created or saved_timezone is None or resolve_timezone(saved_timezone) == resolve_timezone(instance.timezone):
+        return
+    try:
+        rebuild_daily_stats(instance.user_id)
+    except Exception:
+        logging.exception(f"Daily stats rebuild failed for user {instance.user_id}")
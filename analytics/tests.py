@@ -1,3 +1,354 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from tasks.models import Task
+from .models import UserDailyStats
+from .queries import bucket_counts, user_timezone
+from .rollup import build_daily_stats, rebuild_daily_stats
+
+
+# Every authenticated request: session and user lookups, then the session save (savepoint, update, release)
+REQUEST_QUERIES = 5
+# JSON endpoints first compute the user's data version (task aggregate; the profile is counted per test)
+VERSION_QUERIES = 1
+
+
+class AnalyticsQueryCountTests(TestCase):
+    """Analytics endpoints count with conditional aggregates instead of one query per counter"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.client.login(username='student', password='pass')
+        now = timezone.now()
+        for i, (status, priority) in enumerate([
+            ('todo', 'must'), ('in_progress', 'should'), ('done', 'must'), ('done', 'could'),
+            ('review', 'wont'), ('todo', 'could'), ('done', 'should'),
+        ]):
+            Task.objects.create(
+                user=self.user, title=f'Task {i}', status=status, priority=priority,
+                due_date=now + timedelta(days=i - 3),
+                completed_at=now - timedelta(days=i) if status == 'done' else None,
+            )
+
+    def get(self, name, queries, **params):
+        if name != 'dashboard':
+            queries += VERSION_QUERIES
+        with self.assertNumQueries(queries + REQUEST_QUERIES):
+            response = self.client.get(reverse(f'analytics:{name}'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_dashboard(self):
+        self.client.get(reverse('analytics:dashboard'))  # creates the user's level row
+        response = self.get('dashboard', 2)  # counters, user level (template context)
+        self.assertEqual(response.context['total_tasks'], 7)
+        self.assertEqual(response.context['completed_tasks'], 3)
+        self.assertEqual(response.context['pending_tasks'], 3)
+        self.assertEqual(response.context['overdue_tasks'], 2)
+
+    def test_priority_breakdown(self):
+        data = self.get('api_priority_breakdown', 2).json()  # profile, counters
+        must = next(item for item in data if item['priority'] == 'must')
+        self.assertEqual((must['total'], must['completed'], must['pending']), (2, 1, 1))
+
+    def test_overdue_analysis(self):
+        data = self.get('api_overdue_analysis', 2).json()  # profile, overdue tasks
+        self.assertEqual(data['total_overdue'], 2)
+        self.assertEqual(sum(item['count'] for item in data['overdue_by_priority']), 2)
+
+    def test_summary(self):
+        data = self.get('api_summary', 3).json()  # counters, profile, month rollup
+        self.assertEqual(data['user_stats']['total_tasks'], 7)
+        self.assertEqual(data['user_stats']['completed_tasks'], 3)
+
+    def test_user_points_level(self):
+        self.get('api_user_points_level', 2)  # profile, recent completions
+
+    def test_weekly_category_stats(self):
+        data = self.get('api_weekly_category_stats', 2).json()  # profile timezone, rollup
+        self.assertEqual(data['total_completed'], 3)
+        self.assertEqual(data['category_stats'][0], {'category': 'work', 'count': 3, 'label': 'Work', 'percentage': 100.0})
+
+    def test_analytics_api(self):
+        # counters, profile timezone, completion trend, MoSCoW classification, categories
+        data = self.get('api', 5, range=7).json()
+        self.assertEqual(data['overview']['total_tasks'], 7)
+        self.assertEqual(data['status_distribution'], {'todo': 2, 'in_progress': 1, 'review': 1, 'done': 3})
+        self.assertEqual(len(data['completion_trend']), 7)
+        self.assertEqual(sum(day['completed'] for day in data['completion_trend']), 3)
+
+    def test_daily_progress(self):
+        data = self.get('api_daily_progress', 2, days=7).json()  # profile timezone, rollup
+        days = data['daily_progress']
+        self.assertEqual(len(days), 7)
+        self.assertEqual(days[-1]['date'], timezone.localdate(timezone=user_timezone(self.user)).isoformat())
+        # due dates run from three days ago to three days ahead; only the past four fall in the window
+        self.assertEqual(sum(day['total_due'] for day in days), 4)
+        self.assertEqual([day['total_due'] for day in days[:3]], [0, 0, 0])
+
+    def test_productivity_trends(self):
+        for task in Task.objects.filter(user=self.user, status='done'):
+            task.points_awarded = 10
+            task.save()
+        data = self.get('api_productivity_trends', 2, days=30).json()  # profile timezone, rollup
+        weeks = data['weekly_trends']
+        self.assertEqual(len(weeks), 5)
+        self.assertEqual(sum(week['tasks_completed'] for week in weeks), 3)
+        self.assertEqual(sum(week['points_earned'] for week in weeks), 30)
+
+    def test_buckets_follow_the_user_timezone(self):
+        profile = self.user.userprofile
+        profile.timezone = 'Pacific/Kiritimati'  # UTC+14
+        profile.save()
+        tz = user_timezone(self.user)
+        today = timezone.localdate(timezone=tz)
+        late_yesterday = datetime.combine(today, time.min, tzinfo=tz) - timedelta(minutes=30)
+        Task.objects.create(
+            user=self.user, title='Late night', status='done', completed_at=late_yesterday, due_date=late_yesterday
+        )
+        buckets = bucket_counts(
+            Task.objects.filter(user=self.user, title='Late night'), 'completed_at',
+            today - timedelta(days=1), today, tz, completed=Count('id')
+        )
+        self.assertEqual(buckets, {today - timedelta(days=1): {'completed': 1}, today: {'completed': 0}})
+
+
+class UserDailyStatsTests(TestCase):
+    """Task signals keep the daily rollup equal to one rebuilt from scratch"""
+
+    FIELDS = UserDailyStats.COUNTER_FIELDS + UserDailyStats.BREAKDOWN_FIELDS
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.today = timezone.localdate(timezone=user_timezone(self.user))
+
+    def rollup(self):
+        return {
+            stats.date: {field: getattr(stats, field) for field in self.FIELDS}
+            for stats in UserDailyStats.objects.filter(user=self.user)
+        }
+
+    def rebuilt(self):
+        return {
+            stats.date: {field: getattr(stats, field) for field in self.FIELDS}
+            for stats in build_daily_stats(self.user.id)
+        }
+
+    def test_signals_track_task_lifecycle(self):
+        now = timezone.now()
+        task = Task.objects.create(user=self.user, title='Essay', category='study', priority='must', due_date=now)
+        today = self.rollup()[self.today]
+        self.assertEqual((today['tasks_created'], today['tasks_due'], today['tasks_completed']), (1, 1, 0))
+
+        task.mark_complete()
+        today = self.rollup()[self.today]
+        self.assertEqual((today['tasks_completed'], today['tasks_due_completed'], today['points_earned']), (1, 1, 10))
+        self.assertEqual(today['category_counts'], {'study': 1})
+        self.assertEqual(today['priority_counts'], {'must': 1})
+
+        task.due_date = now + timedelta(days=2)
+        task.save()
+        rollup = self.rollup()
+        self.assertEqual(rollup[self.today]['tasks_due'], 0)
+        self.assertEqual(rollup[self.today + timedelta(days=2)]['tasks_due_completed'], 1)
+        self.assertEqual(rollup, self.rebuilt())
+
+        task.delete()
+        self.assertEqual(self.rollup(), {})
+
+    def test_unrelated_edits_do_not_write(self):
+        task = Task.objects.create(user=self.user, title='Essay')
+        task.title = 'Long essay'
+        with CaptureQueriesContext(connection) as queries:
+            task.save()
+        self.assertFalse([query for query in queries if 'analytics_userdailystats' in query['sql']])
+
+    def snapshot_reads(self, task, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            task.save(**kwargs)
+        # values() reads of the stored row; the rollup and re-planning share one (tasks.signals)
+        return len([query for query in queries if query['sql'].startswith('SELECT "tasks_task"."user_id" AS')])
+
+    def test_snapshot_is_read_only_when_not_known(self):
+        task = Task.objects.create(user=self.user, title='Essay')
+        task.status = 'in_progress'
+        self.assertEqual(self.snapshot_reads(task), 0)  # stored values are remembered after a save
+
+        loaded = Task.objects.get(pk=task.pk)
+        loaded.status = 'done'
+        loaded.completed_at = timezone.now()
+        self.assertEqual(self.snapshot_reads(loaded), 0)  # compared against the loaded values
+        self.assertEqual(self.rollup(), self.rebuilt())
+
+        deferred = Task.objects.only('id', 'title').get(pk=task.pk)
+        self.assertEqual(self.snapshot_reads(deferred, update_fields=['title']), 0)
+        deferred.status = 'todo'
+        self.assertEqual(self.snapshot_reads(deferred, update_fields=['status']), 1)
+        self.assertEqual(self.rollup(), self.rebuilt())
+
+    def test_partial_save_only_counts_written_fields(self):
+        task = Task.objects.create(user=self.user, title='Essay', due_date=timezone.now())
+        task.due_date += timedelta(days=3)  # changed in memory, not saved
+        task.status = 'done'
+        task.completed_at = timezone.now()
+        task.save(update_fields=['status', 'completed_at'])
+        self.assertEqual(self.rollup(), self.rebuilt())
+
+    def test_backfill_rebuilds_rows_skipped_by_bulk_updates(self):
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(user=self.user, title=f'Task {i}', status='done', completed_at=now - timedelta(days=i), points_awarded=10)
+            for i in range(3)
+        ])
+        self.assertEqual(self.rollup(), {})
+
+        self.assertEqual(rebuild_daily_stats(self.user.id), 3)
+        rollup = self.rollup()
+        self.assertEqual(sum(day['tasks_completed'] for day in rollup.values()), 3)
+        self.assertEqual(rollup[self.today]['tasks_created'], 3)
+
+    def test_timezone_change_rebuckets_the_rollup(self):
+        now = timezone.now()
+        Task.objects.create(user=self.user, title='Essay', due_date=now)
+        Task.objects.create(user=self.user, title='Late night', due_date=now + timedelta(hours=13))
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.timezone = 'Pacific/Kiritimati'  # UTC+14
+        profile.save()
+        self.assertEqual(self.rollup(), self.rebuilt())
+
+        # new tasks land in the same local-day frame as the rebuilt rows
+        Task.objects.create(user=self.user, title='Quiz', due_date=now + timedelta(hours=6))
+        self.assertEqual(self.rollup(), self.rebuilt())
+
+    def test_profile_saves_without_timezone_change_do_not_rebuild(self):
+        Task.objects.create(user=self.user, title='Essay', due_date=timezone.now())
+        profile = UserProfile.objects.get(user=self.user)
+        profile.total_points += 10
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        self.assertFalse([query for query in queries if 'analytics_userdailystats' in query['sql']])
+
+    def test_data_migration_builds_rollup_from_existing_tasks(self):
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(user=self.user, title=f'Task {i}', status='done', completed_at=now - timedelta(days=i),
+                 due_date=now + timedelta(days=i), points_awarded=10, category='study')
+            for i in range(4)
+        ])
+        self.assertEqual(self.rollup(), {})
+
+        backfill = import_module('analytics.migrations.0002_backfill_daily_stats').backfill_daily_stats
+        backfill(apps, None)
+        self.assertEqual(self.rollup(), self.rebuilt())
+        self.assertEqual(sum(day['tasks_completed'] for day in self.rollup().values()), 4)
+
+    def test_deleting_user_removes_rollup(self):
+        Task.objects.create(user=self.user, title='Essay', due_date=timezone.now())
+        self.user.delete()
+        self.assertFalse(UserDailyStats.objects.exists())
+
+
+class ConditionalGetTests(TestCase):
+    """JSON endpoints answer 304 from the user's data version before doing any work"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.client.login(username='student', password='pass')
+        self.task = Task.objects.create(user=self.user, title='Essay', due_date=timezone.now() + timedelta(days=1))
+
+    def test_unchanged_data_is_not_modified(self):
+        for url in [reverse('analytics:api'), reverse('analytics:api_daily_progress'), reverse('tasks:task-kanban-board-data')]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+
+            # session, user, version aggregate, profile, session save
+            with self.assertNumQueries(REQUEST_QUERIES + VERSION_QUERIES + 1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_task_change_changes_version(self):
+        url = reverse('analytics:api_summary')
+        etag = self.client.get(url)['ETag']
+
+        self.task.mark_complete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['user_stats']['completed_tasks'], 1)
+
+        etag = response['ETag']
+        self.task.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        url = reverse('analytics:api_user_points_level')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+
+class ExportTests(TestCase):
+    """Exports stream values() rows as CSV or NDJSON"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.client.login(username='student', password='pass')
+        for i in range(3):
+            Task.objects.create(user=self.user, title=f'Task, "{i}"', category='study')
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('analytics:export', args=['tasks']))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual([row['title'] for row in rows], ['Task, "0"', 'Task, "1"', 'Task, "2"'])
+        self.assertEqual(rows[0]['due_date'], '')
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse('analytics:export', args=['tasks']), {'format': 'ndjson'})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['category'], 'study')
+
+    def test_team_export_is_for_members_only(self):
+        from teams.models import Team
+        other = User.objects.create_user(username='other', password='pass')
+        team = Team.objects.create(name='Study group', created_by=other)
+        url = reverse('analytics:export', args=['tasks'])
+        self.assertEqual(self.client.get(url, {'team_id': str(team.pk)}).status_code, 403)
+
+        team.members.add(self.user)
+        Task.objects.create(user=other, team=team, title='Shared')
+        rows = list(csv.DictReader(io.StringIO(self.content(self.client.get(url, {'team_id': str(team.pk)})))))
+        self.assertEqual([(row['user__username'], row['title']) for row in rows], [('other', 'Shared')])
+
+    def test_unknown_dataset_and_format(self):
+        self.assertEqual(self.client.get(reverse('analytics:export', args=['users'])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse('analytics:export', args=['tasks']), {'format': 'xml'}).status_code, 400
+        )
 
-# Create your tests here.
+    def test_export_command(self):
+        out = io.StringIO()
+        call_command('export_data', 'tasks', user_id=self.user.id, format='ndjson', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
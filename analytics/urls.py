@@ -18,4 +18,7 @@ urlpatterns = [
     path('api/user-points-level/', views.user_points_level, name='api_user_points_level'),
     path('api/overdue-analysis/', views.overdue_analysis, name='api_overdue_analysis'),
     path('api/summary/', views.analytics_summary, name='api_summary'),
+    
+    # Streaming exports (?format=csv|ndjson, ?team_id=<uuid> for a team)
+    path('export/<str:dataset>/', views.export_data, name='export'),
 ]
@@ -1,14 +1,23 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.db.models import Count, Q
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.views.decorators.http import require_GET
+from django.db.models import Count, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from tasks.models import Task
+from tasks.conditional import conditional_user_data
 from django.contrib.auth.models import User
+from .queries import (
+    PENDING_STATUSES, count_tasks, overview_counters, status_counters, priority_counters, completion_rate,
+    user_timezone, bucket_counts,
+)
+from .models import UserDailyStats
+from .rollup import daily_stats
+from .exports import DATASETS, FORMATS, stream_export
 
 
 @login_required
@@ -17,29 +26,12 @@ def analytics_dashboard(request):
     # Get basic analytics data for initial page load
     user = request.user
     
-    # Basic stats - personal tasks only
-    total_tasks = Task.objects.filter(user=user, team__isnull=True).count()
-    completed_tasks = Task.objects.filter(user=user, team__isnull=True, status='done').count()
-    pending_tasks = Task.objects.filter(user=user, team__isnull=True, status__in=['todo', 'in_progress']).count()
-    
-    # Calculate overdue tasks - personal tasks only
-    now = timezone.now()
-    overdue_tasks = Task.objects.filter(
-        user=user,
-        team__isnull=True,  # Exclude team tasks
-        due_date__lt=now,
-        status__in=['todo', 'in_progress']
-    ).count()
-    
-    # Calculate completion rate
-    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    # Basic stats - personal tasks only (team tasks excluded), in one query
+    counts = count_tasks(Task.objects.filter(user=user, team__isnull=True), overview_counters(timezone.now()))
     
     context = {
-        'total_tasks': total_tasks,
-        'completed_tasks': completed_tasks,
-        'pending_tasks': pending_tasks,
-        'overdue_tasks': overdue_tasks,
-        'completion_rate': round(completion_rate, 1),
+        **counts,
+        'completion_rate': round(completion_rate(counts['completed_tasks'], counts['total_tasks']), 1),
     }
     
     return render(request, 'analytics/dashboard.html', context)
@@ -47,36 +39,26 @@ def analytics_dashboard(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def daily_progress(request):
     """Get daily progress data for charts"""
     user = request.user
     days = int(request.GET.get('days', 7))  # Default to 7 days
     
-    end_date = timezone.now().date()
+    tz = user_timezone(user)
+    end_date = timezone.localdate(timezone=tz)
     start_date = end_date - timedelta(days=days-1)
     
+    # Tasks due on each day (in the user's timezone) and how many of them are done, from the rollup
     daily_data = []
-    current_date = start_date
-    
-    while current_date <= end_date:
-        # Tasks due on this date
-        tasks_due = Task.objects.filter(
-            user=user,
-            due_date__date=current_date
-        )
-        
-        # Tasks completed on this date
-        tasks_completed = tasks_due.filter(status='done')
-        
+    for current_date, day in daily_stats(user, start_date, end_date).items():
         daily_data.append({
             'date': current_date.strftime('%Y-%m-%d'),
             'day_name': current_date.strftime('%a'),
-            'total_due': tasks_due.count(),
-            'completed': tasks_completed.count(),
-            'percentage': (tasks_completed.count() / tasks_due.count() * 100) if tasks_due.count() > 0 else 0
+            'total_due': day.tasks_due,
+            'completed': day.tasks_due_completed,
+            'percentage': completion_rate(day.tasks_due_completed, day.tasks_due)
         })
-        
-        current_date += timedelta(days=1)
     
     return Response({
         'period': f"{start_date} to {end_date}",
@@ -86,19 +68,21 @@ def daily_progress(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def weekly_category_stats(request):
     """Get weekly category completion statistics for pie chart"""
     user = request.user
-    week_ago = timezone.now() - timedelta(days=7)
-    
-    # Get completed tasks in the last week by category
-    stats = Task.objects.filter(
-        user=user,
-        completed_at__gte=week_ago,
-        status='done'
-    ).values('category').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    end_date = timezone.localdate(timezone=user_timezone(user))
+    
+    # Completed tasks in the last 7 days by category, from the rollup
+    category_counts = {}
+    for day in daily_stats(user, end_date - timedelta(days=6), end_date).values():
+        for category, count in day.category_counts.items():
+            category_counts[category] = category_counts.get(category, 0) + count
+    stats = [
+        {'category': category, 'count': count}
+        for category, count in sorted(category_counts.items(), key=lambda item: -item[1])
+    ]
     
     # Calculate total for percentages
     total_completed = sum(item['count'] for item in stats)
@@ -118,16 +102,17 @@ def weekly_category_stats(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def priority_breakdown(request):
     """Get task breakdown by MoSCoW priority"""
     user = request.user
     
     priority_data = []
-    priority_labels = dict(Task.PRIORITY_CHOICES)
+    counts = count_tasks(Task.objects.filter(user=user), priority_counters())
     
     for priority_key, priority_label in Task.PRIORITY_CHOICES:
-        total = Task.objects.filter(user=user, priority=priority_key).count()
-        completed = Task.objects.filter(user=user, priority=priority_key, status='done').count()
+        total = counts[f'priority_{priority_key}']
+        completed = counts[f'priority_{priority_key}_completed']
         pending = total - completed
         
         priority_data.append({
@@ -136,7 +121,7 @@ def priority_breakdown(request):
             'total': total,
             'completed': completed,
             'pending': pending,
-            'completion_rate': (completed / total * 100) if total > 0 else 0
+            'completion_rate': completion_rate(completed, total)
         })
     
     return Response(priority_data)
@@ -144,42 +129,32 @@ def priority_breakdown(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def productivity_trends(request):
     """Get productivity trends over time"""
     user = request.user
     days = int(request.GET.get('days', 30))
     
-    end_date = timezone.now().date()
+    tz = user_timezone(user)
+    end_date = timezone.localdate(timezone=tz)
     start_date = end_date - timedelta(days=days-1)
     
+    # Completions and points per day from the rollup; the weeks start at start_date, so days are folded below
+    days = daily_stats(user, start_date, end_date)
+    
     # Weekly aggregation for better visualization
     weekly_data = []
     current_week_start = start_date
     
     while current_week_start <= end_date:
         week_end = min(current_week_start + timedelta(days=6), end_date)
-        
-        # Tasks completed in this week
-        week_completed = Task.objects.filter(
-            user=user,
-            completed_at__date__gte=current_week_start,
-            completed_at__date__lte=week_end,
-            status='done'
-        ).count()
-        
-        # Total points earned in this week
-        week_points = Task.objects.filter(
-            user=user,
-            completed_at__date__gte=current_week_start,
-            completed_at__date__lte=week_end,
-            status='done'
-        ).aggregate(total_points=Count('points_awarded'))['total_points'] or 0
+        week_days = [days[current_week_start + timedelta(days=offset)] for offset in range((week_end - current_week_start).days + 1)]
         
         weekly_data.append({
             'week_start': current_week_start.strftime('%Y-%m-%d'),
             'week_end': week_end.strftime('%Y-%m-%d'),
-            'tasks_completed': week_completed,
-            'points_earned': week_points * 10,  # 10 points per completed task
+            'tasks_completed': sum(day.tasks_completed for day in week_days),
+            'points_earned': sum(day.points_earned for day in week_days),
             'week_label': f"Week of {current_week_start.strftime('%b %d')}"
         })
         
@@ -193,6 +168,7 @@ def productivity_trends(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def user_points_level(request):
     """Get user points and level information"""
     user = request.user
@@ -223,27 +199,25 @@ def user_points_level(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def overdue_analysis(request):
     """Analyze overdue tasks patterns"""
     user = request.user
     now = timezone.now()
     
-    # Current overdue tasks
-    overdue_tasks = Task.objects.filter(
+    # Current overdue tasks (fetched once; the breakdowns are counted from the same rows)
+    overdue_tasks = list(Task.objects.filter(
         user=user,
         due_date__lt=now,
-        status__in=['todo', 'in_progress']
-    )
-    
-    # Overdue by category
-    overdue_by_category = overdue_tasks.values('category').annotate(
-        count=Count('id')
-    ).order_by('-count')
+        status__in=PENDING_STATUSES
+    ).only('id', 'title', 'due_date', 'priority', 'category'))
     
-    # Overdue by priority
-    overdue_by_priority = overdue_tasks.values('priority').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    def breakdown(field):
+        counts = {}
+        for task in overdue_tasks:
+            value = getattr(task, field)
+            counts[value] = counts.get(value, 0) + 1
+        return [{field: value, 'count': count} for value, count in sorted(counts.items(), key=lambda item: -item[1])]
     
     # Average days overdue
     overdue_days = []
@@ -254,10 +228,10 @@ def overdue_analysis(request):
     avg_days_overdue = sum(overdue_days) / len(overdue_days) if overdue_days else 0
     
     return Response({
-        'total_overdue': overdue_tasks.count(),
+        'total_overdue': len(overdue_tasks),
         'average_days_overdue': round(avg_days_overdue, 1),
-        'overdue_by_category': list(overdue_by_category),
-        'overdue_by_priority': list(overdue_by_priority),
+        'overdue_by_category': breakdown('category'),
+        'overdue_by_priority': breakdown('priority'),
         'overdue_tasks': [{
             'id': task.id,
             'title': task.title,
@@ -271,59 +245,42 @@ def overdue_analysis(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def analytics_api(request):
     """Combined analytics API endpoint for dashboard"""
     user = request.user
     time_range = int(request.GET.get('range', 30))
     
-    # Basic overview
-    total_tasks = Task.objects.filter(user=user).count()
-    completed_tasks = Task.objects.filter(user=user, status='done').count()
-    pending_tasks = Task.objects.filter(user=user, status__in=['todo', 'in_progress']).count()
-    
-    # Calculate overdue tasks
+    # Overview and status counts in one query
     now = timezone.now()
-    overdue_tasks = Task.objects.filter(
-        user=user,
-        due_date__lt=now,
-        status__in=['todo', 'in_progress']
-    ).count()
-    
-    # Calculate completion rate
-    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    counts = count_tasks(Task.objects.filter(user=user), overview_counters(now), status_counters())
     
-    # Completion trend (last 30 days)
-    end_date = now.date()
+    # Completion trend (last 30 days) in the user's timezone, one grouped query
+    tz = user_timezone(user)
+    end_date = timezone.localdate(timezone=tz)
     start_date = end_date - timedelta(days=time_range-1)
     
-    completion_trend = []
-    current_date = start_date
-    
-    while current_date <= end_date:
-        completed_on_date = Task.objects.filter(
-            user=user,
-            completed_at__date=current_date,
-            status='done'
-        ).count()
-        
-        completion_trend.append({
-            'date': current_date.isoformat(),
-            'completed': completed_on_date
-        })
-        current_date += timedelta(days=1)
+    buckets = bucket_counts(
+        Task.objects.filter(user=user, status='done'), 'completed_at', start_date, end_date, tz,
+        completed=Count('id')
+    )
+    completion_trend = [
+        {'date': current_date.isoformat(), 'completed': day['completed']}
+        for current_date, day in buckets.items()
+    ]
     
     # Status distribution
     status_distribution = {}
     for status, label in Task.STATUS_CHOICES:
-        count = Task.objects.filter(user=user, status=status).count()
+        count = counts[f'status_{status}']
         if count > 0:
             status_distribution[status] = count
     
     # Priority distribution - use MoSCoW priorities with error handling
     priority_distribution = {'must': 0, 'should': 0, 'could': 0, 'wont': 0}
     
-    # Get user tasks to calculate MoSCoW distribution
-    user_tasks = Task.objects.filter(user=user)
+    # Get user tasks to calculate MoSCoW distribution (classified in one planner pass)
+    user_tasks = Task.objects.filter(user=user).with_moscow()
     for task in user_tasks:
         try:
             moscow_priority = task.moscow_priority  # Use the property that calculates MoSCoW
@@ -344,11 +301,11 @@ def analytics_api(request):
     return Response({
         'time_range': time_range,
         'overview': {
-            'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks,
-            'pending_tasks': pending_tasks,
-            'overdue_tasks': overdue_tasks,
-            'completion_rate': completion_rate
+            'total_tasks': counts['total_tasks'],
+            'completed_tasks': counts['completed_tasks'],
+            'pending_tasks': counts['pending_tasks'],
+            'overdue_tasks': counts['overdue_tasks'],
+            'completion_rate': completion_rate(counts['completed_tasks'], counts['total_tasks'])
         },
         'completion_trend': completion_trend,
         'status_distribution': status_distribution,
@@ -359,44 +316,35 @@ def analytics_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_user_data
 def analytics_summary(request):
     """Get comprehensive analytics summary"""
     user = request.user
     
-    # Basic stats
-    total_tasks = Task.objects.filter(user=user).count()
-    completed_tasks = Task.objects.filter(user=user, status='done').count()
-    pending_tasks = Task.objects.filter(user=user, status__in=['todo', 'in_progress']).count()
-    
-    # This month stats
+    # Current status counts in one query
     now = timezone.now()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    month_completed = Task.objects.filter(
-        user=user,
-        status='done',
-        completed_at__gte=month_start
-    ).count()
-    
-    month_created = Task.objects.filter(
-        user=user,
-        created_at__gte=month_start
-    ).count()
+    counts = count_tasks(Task.objects.filter(user=user), overview_counters(now))
     
     # User profile data
     profile = user.userprofile
     
+    # This month's activity (in the user's timezone) from the rollup
+    month_start = timezone.localdate(now, timezone=user_timezone(user)).replace(day=1)
+    month = UserDailyStats.objects.filter(user=user, date__gte=month_start).aggregate(
+        completed=Sum('tasks_completed'), created=Sum('tasks_created')
+    )
+    
     return Response({
         'user_stats': {
-            'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks,
-            'pending_tasks': pending_tasks,
-            'completion_rate': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+            'total_tasks': counts['total_tasks'],
+            'completed_tasks': counts['completed_tasks'],
+            'pending_tasks': counts['pending_tasks'],
+            'completion_rate': completion_rate(counts['completed_tasks'], counts['total_tasks'])
         },
         'monthly_stats': {
-            'completed_this_month': month_completed,
-            'created_this_month': month_created,
-            'month_name': now.strftime('%B %Y')
+            'completed_this_month': month['completed'] or 0,
+            'created_this_month': month['created'] or 0,
+            'month_name': month_start.strftime('%B %Y')
         },
         'gamification': {
             'total_points': profile.total_points,
@@ -408,3 +356,38 @@ def analytics_summary(request):
             'study_hours_per_day': profile.study_hours_per_day
         }
     })
+
+
+@login_required
+@require_GET
+def export_data(request, dataset):
+    """Stream a dataset (tasks, point transactions, daily activity) as CSV or NDJSON"""
+    if dataset not in DATASETS:
+        raise Http404("Unknown export")
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(FORMATS)}"}, status=400)
+    
+    # A team's export is open to its members only
+    team = None
+    team_id = request.GET.get('team_id')
+    if team_id:
+        from teams.models import Team
+        from django.core.exceptions import ValidationError
+        try:
+            team = Team.objects.get(id=team_id)
+        except (Team.DoesNotExist, ValidationError):
+            return JsonResponse({'error': 'Team not found'}, status=404)
+        if not team.members.filter(pk=request.user.pk).exists():
+            return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    content_type, extension = FORMATS[export_format]
+    scope = f"team-{team.pk}" if team else request.user.username
+    response = StreamingHttpResponse(
+        stream_export(dataset, export_format, user=request.user, team=team),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{scope}-{dataset}-{timezone.localdate():%Y%m%d}.{extension}"'
+    )
+    return response
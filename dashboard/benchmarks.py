@@ -0,0 +1,147 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Rows of the compact prompt (see prompt_builder): "HH:MM-HH:MM|minutes" and "id|M|..."
+BLOCK_ROW = re.compile(r'^(\d{2}):(\d{2})-\d{2}:\d{2}\|(\d+)$', re.MULTILINE)
+TASK_ROW = re.compile(r'^(\d+)\|([MS])\|', re.MULTILINE)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def fake_schedule(prompt, task_minutes=45, buffer_minutes=10):
+    """A plausible schedule for a compact prompt: its tasks packed in order into its blocks"""
+    blocks = [(int(hour) * 60 + int(minute), int(length)) for hour, minute, length in BLOCK_ROW.findall(prompt)]
+    tasks = TASK_ROW.findall(prompt)
+    schedule = []
+    block_index, offset = 0, 0
+    for task_id, category in tasks:
+        while block_index < len(blocks) and offset + task_minutes > blocks[block_index][1]:
+            block_index, offset = block_index + 1, 0
+        if block_index == len(blocks):
+            break
+        start = blocks[block_index][0] + offset
+        schedule.append({
+            'task_id': task_id,
+            'scheduled_start': f'{start // 60 % 24:02d}:{start % 60:02d}',
+            'scheduled_end': f'{(start + task_minutes) // 60 % 24:02d}:{(start + task_minutes) % 60:02d}',
+            'estimated_duration_minutes': task_minutes,
+            'pomodoro_sessions': 2,
+            'break_minutes': 5,
+            'reasoning': 'benchmark',
+            'priority_score': 95 if category == 'M' else 70,
+        })
+        offset += task_minutes + buffer_minutes
+    must = sum(1 for item in schedule if item['priority_score'] == 95)
+    return {
+        'schedule': schedule,
+        'summary': {
+            'total_scheduled_minutes': task_minutes * len(schedule),
+            'total_break_minutes': 5 * len(schedule),
+            'tasks_scheduled': len(schedule),
+            'moscow_must_scheduled': must,
+            'moscow_should_scheduled': len(schedule) - must,
+        },
+    }
+
+
+class FakeCompletionServer:
+    """
+    Local stand-in for the OpenRouter chat completions endpoint.
+
+    Each request waits `latency` seconds (+/- `jitter`), then answers 429 with probability
+    `rate_limit_ratio`, malformed (non-JSON) content with probability `malformed_ratio`,
+    and otherwise a schedule for the tasks in the prompt. Streamed requests get
+    server-sent events.
+    """
+
+    def __init__(self, latency=0.3, jitter=0.1, rate_limit_ratio=0.0, malformed_ratio=0.0, seed=42):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.malformed_ratio = malformed_ratio
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'rate_limited': 0, 'malformed': 0}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real endpoint
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                outcome, delay = server.draw()
+                time.sleep(delay)
+
+                if outcome == 'rate_limited':
+                    return self.send_json(429, {'error': {'message': 'Rate limit exceeded', 'code': 429}})
+                prompt = request['messages'][-1]['content']
+                if outcome == 'malformed':
+                    content = 'I am unable to produce a schedule right now {'
+                else:
+                    content = json.dumps(fake_schedule(prompt))
+
+                if request.get('stream'):
+                    self.send_stream(content)
+                else:
+                    self.send_json(200, {'choices': [{'message': {'content': content}}]})
+
+            def send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_stream(self, content):
+                events = [content[i:i + 40] for i in range(0, len(content), 40)]
+                body = ''.join(
+                    f"data: {json.dumps({'choices': [{'delta': {'content': delta}}]})}\n\n" for delta in events
+                ) + 'data: [DONE]\n\n'
+                body = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/api/v1/chat/completions'
+
+    def draw(self):
+        """Outcome and delay for the next request"""
+        with self.lock:
+            self.counts['requests'] += 1
+            roll = self.rng.random()
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            if roll < self.rate_limit_ratio:
+                self.counts['rate_limited'] += 1
+                return 'rate_limited', delay
+            if roll < self.rate_limit_ratio + self.malformed_ratio:
+                self.counts['malformed'] += 1
+                return 'malformed', delay
+            return 'ok', delay
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
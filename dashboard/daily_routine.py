@@ -87,32 +87,11 @@ def daily_routine(request):
     ).order_by('due_date')
     
     # Get MoSCoW analysis for overdue tasks
-    result = MoSCoWCacheService.get_moscow_analysis(request.user)
-    
-    # Create task details mapping
-    task_details = {}
-    for log_entry in result['decision_log']:
-        task_id = int(log_entry['id'])
-        task_details[task_id] = {
-            'category': log_entry['final'],
-            'score': log_entry['score'],
-            'task_type': log_entry['type'],
-            'importance': log_entry['importance'],
-            'urgency': log_entry['urgency'],
-            'due_in_days': log_entry['due_in_days'],
-            'reasoning': log_entry['matched_rule']
-        }
+    task_details = MoSCoWCacheService.get_task_details(request.user, request)
     
     # Apply MoSCoW analysis to overdue tasks
     def apply_moscow_analysis(task_list):
-        for task in task_list:
-            details = task_details.get(task.id, {})
-            task.moscow_category = details.get('category', 'should')
-            task.moscow_score = details.get('score', 30)
-            task.moscow_task_type = details.get('task_type', 'Regular coursework')
-            task.moscow_reasoning = details.get('reasoning', 'Default classification')
-            task.moscow_due_in_days = details.get('due_in_days')
-        return task_list
+        return MoSCoWCacheService.apply_task_details(task_list, task_details)
     
     overdue_tasks = apply_moscow_analysis(list(overdue_tasks))
     
@@ -58,21 +58,7 @@ def focus_timer(request):
         
         # Apply MoSCoW analysis to scheduled tasks
         if scheduled_tasks.exists():
-            result = MoSCoWCacheService.get_moscow_analysis(request.user)
-            
-            # Create task details mapping
-            task_details = {}
-            for log_entry in result['decision_log']:
-                task_id = int(log_entry['id'])
-                task_details[task_id] = {
-                    'category': log_entry['final'],
-                    'score': log_entry['score'],
-                    'task_type': log_entry['type'],
-                    'importance': log_entry['importance'],
-                    'urgency': log_entry['urgency'],
-                    'due_in_days': log_entry['due_in_days'],
-                    'reasoning': log_entry['matched_rule']
-                }
+            task_details = MoSCoWCacheService.get_task_details(request.user, request)
             
             # Apply MoSCoW analysis to scheduled tasks
             scheduled_tasks_list = list(scheduled_tasks)
@@ -139,21 +125,7 @@ def focus_timer(request):
         
         # Apply MoSCoW analysis to scheduled tasks
         if scheduled_tasks.exists():
-            result = MoSCoWCacheService.get_moscow_analysis(request.user)
-            
-            # Create task details mapping
-            task_details = {}
-            for log_entry in result['decision_log']:
-                task_id = int(log_entry['id'])
-                task_details[task_id] = {
-                    'category': log_entry['final'],
-                    'score': log_entry['score'],
-                    'task_type': log_entry['type'],
-                    'importance': log_entry['importance'],
-                    'urgency': log_entry['urgency'],
-                    'due_in_days': log_entry['due_in_days'],
-                    'reasoning': log_entry['matched_rule']
-                }
+            task_details = MoSCoWCacheService.get_task_details(request.user, request)
             
             # Apply MoSCoW analysis to scheduled tasks
             scheduled_tasks_list = list(scheduled_tasks)
@@ -231,21 +203,7 @@ def focus_timer(request):
                 
                 # Apply MoSCoW analysis to scheduled tasks
                 if scheduled_tasks.exists():
-                    result = MoSCoWCacheService.get_moscow_analysis(request.user)
-                    
-                    # Create task details mapping
-                    task_details = {}
-                    for log_entry in result['decision_log']:
-                        task_id = int(log_entry['id'])
-                        task_details[task_id] = {
-                            'category': log_entry['final'],
-                            'score': log_entry['score'],
-                            'task_type': log_entry['type'],
-                            'importance': log_entry['importance'],
-                            'urgency': log_entry['urgency'],
-                            'due_in_days': log_entry['due_in_days'],
-                            'reasoning': log_entry['matched_rule']
-                        }
+                    task_details = MoSCoWCacheService.get_task_details(request.user, request)
                     
                     # Apply MoSCoW analysis to scheduled tasks
                     scheduled_tasks_list = list(scheduled_tasks)
@@ -300,7 +258,7 @@ def focus_timer(request):
             user_tasks = Task.objects.filter(
                 user=request.user,
                 status__in=['todo', 'in_progress']
-            ).order_by('due_date')
+            ).order_by('due_date').with_moscow()
             
             print(f"DEBUG: Direct access with NO schedule - showing all MoSCoW tasks. Found {user_tasks.count()} tasks for user {request.user.username}")
             
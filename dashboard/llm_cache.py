@@ -0,0 +1,91 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+class ResponseCache:
+    """
+    Thread-safe in-process cache for LLM responses.
+    Entries expire after `ttl` seconds; beyond `maxsize` entries the least recently used is evicted.
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def schedule_cache_key(user, target_date, model, available_blocks, moscow_tasks, tasks_by_id):
+    """
+    Content address of a scheduling request: the day, model, time blocks and the
+    MUST / top-5 SHOULD tasks that go into the prompt (each with its updated_at).
+    """
+    def task_entries(entries):
+        tasks = (tasks_by_id.get(int(task_data['id'])) for task_data in entries)
+        return [[task.id, task.updated_at.isoformat()] for task in tasks if task is not None]
+
+    payload = {
+        'user': user.id,
+        'date': target_date.isoformat(),
+        'model': model,
+        'blocks': sorted(
+            [block.id, block.start_time.strftime('%H:%M'), block.end_time.strftime('%H:%M')]
+            for block in available_blocks
+        ),
+        'must': task_entries(moscow_tasks.get('must', [])),
+        'should': task_entries(moscow_tasks.get('should', [])[:5]),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+# Shared by every scheduler in the process
+schedule_response_cache = ResponseCache(
+    maxsize=getattr(settings, 'SCHEDULER_RESPONSE_CACHE_SIZE', 256),
+    ttl=getattr(settings, 'SCHEDULER_RESPONSE_CACHE_TTL', 3600),
+)
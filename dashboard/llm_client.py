@@ -0,0 +1,133 @@
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+CONNECT_TIMEOUT = getattr(settings, 'SCHEDULER_LLM_CONNECT_TIMEOUT', 5)
+READ_TIMEOUT = getattr(settings, 'SCHEDULER_LLM_READ_TIMEOUT', 30)
+POOL_SIZE = getattr(settings, 'SCHEDULER_LLM_POOL_SIZE', 10)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide keep-alive session, so schedules reuse TCP/TLS connections to the provider"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retries are handled by the callers (and the circuit breaker), not by urllib3
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def extract_json(text):
+    """The JSON object in a completion that may wrap it in prose or code fences"""
+    start_idx = text.find('{')
+    end_idx = text.rfind('}') + 1
+    if start_idx == -1 or end_idx == 0:
+        raise ValueError("No JSON found in AI response")
+    try:
+        return json.loads(text[start_idx:end_idx])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse AI response as JSON: {e}")
+
+
+class JSONObjectScanner:
+    """
+    Incrementally finds the first complete top-level JSON object in streamed text.
+    Tracks brace depth outside of strings, so parsing can start before the stream ends.
+    """
+
+    def __init__(self):
+        self.text = []
+        self.buffer = ''
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, chunk):
+        """Add text; returns the parsed object once it is complete, else None"""
+        self.text.append(chunk)
+        offset = len(self.buffer)
+        self.buffer += chunk
+
+        for index in range(offset, len(self.buffer)):
+            char = self.buffer[index]
+            if self.start is None:
+                if char == '{':
+                    self.start = index
+                    self.depth = 1
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        return json.loads(self.buffer[self.start:index + 1])
+                    except json.JSONDecodeError:
+                        # Braces in prose, not the schedule: look for the next object
+                        self.start = None
+        return None
+
+    def full_text(self):
+        return ''.join(self.text)
+
+
+def read_completion(response):
+    """
+    Parse the JSON object out of a chat completion response.
+    Server-sent event streams are parsed as tokens arrive and the connection is closed
+    as soon as the object is complete; a regular JSON body is parsed as a whole.
+    """
+    if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+        try:
+            content = response.json()['choices'][0]['message']['content']
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"Unexpected AI response format: {e}")
+        return extract_json(content or '')
+
+    scanner = JSONObjectScanner()
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            # Blank keep-alives and ": PROCESSING" comments carry no data
+            if not line or not line.startswith('data:'):
+                continue
+            payload = line[len('data:'):].strip()
+            if payload == '[DONE]':
+                break
+            try:
+                event = json.loads(payload)
+            except json.JSONDecodeError:
+                continue
+            if 'error' in event:
+                raise ValueError(f"AI provider error: {event['error']}")
+
+            delta = (event.get('choices') or [{}])[0].get('delta') or {}
+            if delta.get('content'):
+                result = scanner.feed(delta['content'])
+                if result is not None:
+                    return result
+    finally:
+        # Stops the provider's generation early when the object is already complete
+        response.close()
+
+    return extract_json(scanner.full_text())
@@ -0,0 +1,172 @@
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for the LLM provider, shared by every worker through the Django cache.
+
+    Outcomes are counted in buckets over a rolling window. Once the error rate reaches
+    `error_rate` (with at least `min_calls` calls) the circuit opens and callers fail
+    fast for `cooldown` seconds. After that a single probe call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    BUCKET_SECONDS = 10
+    PROBE_TIMEOUT = 60
+
+    def __init__(self, name, error_rate=0.5, min_calls=5, window=60, cooldown=30):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+
+    def _key(self, suffix):
+        return f"llm_breaker:{self.name}:{suffix}"
+
+    def _buckets(self, now=None):
+        current = int((now or time.time()) // self.BUCKET_SECONDS)
+        return range(current - self.window // self.BUCKET_SECONDS + 1, current + 1)
+
+    def _count(self, outcome):
+        key = self._key(f"{outcome}:{self._buckets()[-1]}")
+        cache.add(key, 0, self.window + self.BUCKET_SECONDS)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            cache.add(key, 1, self.window + self.BUCKET_SECONDS)
+
+    def window_stats(self):
+        """Calls, failures and error rate over the rolling window"""
+        keys = [self._key(f"{outcome}:{bucket}") for bucket in self._buckets() for outcome in ('ok', 'err')]
+        counts = cache.get_many(keys)
+        failures = sum(value for key, value in counts.items() if ':err:' in key)
+        calls = sum(counts.values())
+        return {
+            'calls': calls,
+            'failures': failures,
+            'error_rate': failures / calls if calls else 0.0,
+        }
+
+    def allow_request(self):
+        """Whether a call may go to the provider now"""
+        if cache.get(self._key('open')) is not None:
+            return False
+        if cache.get(self._key('tripped')) is not None:
+            # Half-open: only one caller gets to probe the provider
+            return cache.add(self._key('probe'), uuid.uuid4().hex, self.PROBE_TIMEOUT)
+        return True
+
+    def release(self):
+        """Give back a probe slot when the call was not made after all"""
+        cache.delete(self._key('probe'))
+
+    def record_success(self):
+        self._count('ok')
+        if cache.get(self._key('tripped')) is not None:
+            # The probe worked: close and start a fresh window
+            cache.delete_many([self._key('tripped'), self._key('probe')] + [
+                self._key(f"{outcome}:{bucket}") for bucket in self._buckets() for outcome in ('ok', 'err')
+            ])
+
+    def record_failure(self):
+        self._count('err')
+        if cache.get(self._key('tripped')) is not None:
+            self._open()
+            return
+        stats = self.window_stats()
+        if stats['calls'] >= self.min_calls and stats['error_rate'] >= self.error_rate:
+            self._open()
+
+    def _open(self):
+        cache.set(self._key('open'), time.time(), self.cooldown)
+        cache.set(self._key('tripped'), True, None)
+        cache.delete(self._key('probe'))
+
+    def state(self):
+        opened_at = cache.get(self._key('open'))
+        if opened_at is not None:
+            state = 'open'
+        elif cache.get(self._key('tripped')) is not None:
+            state = 'half_open'
+        else:
+            state = 'closed'
+        return {
+            'state': state,
+            'retry_after': max(0, round(opened_at + self.cooldown - time.time())) if opened_at is not None else 0,
+            **self.window_stats(),
+        }
+
+    def reset(self):
+        cache.delete_many([self._key('open'), self._key('tripped'), self._key('probe')])
+
+
+class TokenBucket:
+    """
+    Request budget toward the LLM provider, shared through the Django cache.
+    Refills `rate` tokens per second up to `capacity`; callers that find it empty
+    fall back instead of waiting.
+    """
+
+    LOCK_TIMEOUT = 1
+    LOCK_WAIT = 0.05
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.key = f"llm_budget:{name}"
+        self.lock_key = f"llm_budget:{name}:lock"
+
+    def _refill(self, state, now):
+        if state is None:
+            return self.capacity
+        return min(self.capacity, state['tokens'] + (now - state['updated']) * self.rate)
+
+    def consume(self, tokens=1):
+        """Take tokens from the bucket; False if there are not enough (or the bucket is busy)"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while not cache.add(self.lock_key, token, self.LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+
+        try:
+            now = time.time()
+            available = self._refill(cache.get(self.key), now)
+            allowed = available >= tokens
+            if allowed:
+                available -= tokens
+            # Keep the state until the bucket would be full again anyway
+            cache.set(self.key, {'tokens': available, 'updated': now}, int(self.capacity / self.rate) + 1)
+            return allowed
+        finally:
+            if cache.get(self.lock_key) == token:
+                cache.delete(self.lock_key)
+
+    def state(self):
+        return {
+            'tokens': round(self._refill(cache.get(self.key), time.time()), 2),
+            'capacity': self.capacity,
+            'rate_per_minute': self.rate * 60,
+        }
+
+
+# Shared by every scheduler in the process (state itself lives in the cache)
+llm_breaker = CircuitBreaker(
+    'openrouter',
+    error_rate=getattr(settings, 'SCHEDULER_BREAKER_ERROR_RATE', 0.5),
+    min_calls=getattr(settings, 'SCHEDULER_BREAKER_MIN_CALLS', 5),
+    window=getattr(settings, 'SCHEDULER_BREAKER_WINDOW', 60),
+    cooldown=getattr(settings, 'SCHEDULER_BREAKER_COOLDOWN', 30),
+)
+llm_budget = TokenBucket(
+    'openrouter',
+    rate=getattr(settings, 'SCHEDULER_LLM_REQUESTS_PER_MINUTE', 20) / 60,
+    capacity=getattr(settings, 'SCHEDULER_LLM_BURST', 5),
+)
@@ -0,0 +1,190 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as clock_time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from tasks.models import Task, TimeBlock
+from priority_analyzer.benchmarks import generate_texts
+from priority_analyzer.services import MoSCoWPriorityPlanner
+from dashboard.ai_scheduler import DeepSeekSchedulerService, LLM_CONCURRENCY
+from dashboard.scheduling import STRATEGIES
+from dashboard.benchmarks import FakeCompletionServer, percentile
+from dashboard.llm_cache import schedule_response_cache
+from dashboard.llm_guard import llm_breaker, llm_budget
+
+
+USERNAME_PREFIX = 'bench_scheduler_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test schedule generation against a local fake completion server: '
+        'N concurrent users through generate_daily_schedule'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Synthetic users (default: 20)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent schedule generations (default: 8)')
+        parser.add_argument('--days', type=int, default=1, help='Days scheduled per user (default: 1)')
+        parser.add_argument('--tasks-per-user', type=int, default=15, help='Tasks per user (default: 15)')
+        parser.add_argument('--latency', type=float, default=0.3, help='Fake completion latency in seconds (default: 0.3)')
+        parser.add_argument('--rate-limit-ratio', type=float, default=0.1, help='Share of 429 answers (default: 0.1)')
+        parser.add_argument('--malformed-ratio', type=float, default=0.05, help='Share of non-JSON answers (default: 0.05)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and server outcomes')
+        parser.add_argument(
+            '--respect-budget',
+            action='store_true',
+            help='Keep the shared LLM request budget (by default it is lifted so the server is the bottleneck)'
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic users and schedules afterwards')
+        parser.add_argument(
+            '--packing-tasks',
+            type=int,
+            default=500,
+            help='Tasks packed per fallback strategy in the packing benchmark; 0 skips it (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['concurrency'] < 1 or options['days'] < 1:
+            raise CommandError('--users, --concurrency and --days must be at least 1')
+
+        if options['packing_tasks'] > 0:
+            self.report_packing(options['packing_tasks'])
+
+        users = self.create_users(options)
+        start_date = timezone.localdate() + timedelta(days=1)
+        jobs = [(user, start_date + timedelta(days=day)) for day in range(options['days']) for user in users]
+
+        budget = (llm_budget.rate, llm_budget.capacity)
+        if not options['respect_budget']:
+            llm_budget.rate, llm_budget.capacity = 1e6, 1e6
+        llm_breaker.reset()
+        schedule_response_cache.clear()
+
+        server = FakeCompletionServer(
+            latency=options['latency'],
+            rate_limit_ratio=options['rate_limit_ratio'],
+            malformed_ratio=options['malformed_ratio'],
+            seed=options['seed'],
+        )
+        try:
+            with server, override_settings(OPENROUTER_API_URL=server.url, DEEPSEEK_API_KEY='benchmark'):
+                self.stdout.write(
+                    f'{len(jobs)} schedules, {options["concurrency"]} concurrent, '
+                    f'LLM concurrency {LLM_CONCURRENCY}, latency {options["latency"]}s'
+                )
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    results = list(executor.map(lambda job: self.run_job(*job), jobs))
+                elapsed = time.perf_counter() - started
+            self.report(results, elapsed, server.counts)
+        finally:
+            llm_budget.rate, llm_budget.capacity = budget
+            if not options['keep']:
+                User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def create_users(self, options):
+        """Synthetic users with blocks on every weekday and a mix of MUST/SHOULD tasks"""
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        rng = random.Random(options['seed'])
+        planner = MoSCoWPriorityPlanner()
+        now = timezone.now()
+
+        users = [User(username=f'{USERNAME_PREFIX}{i}') for i in range(options['users'])]
+        User.objects.bulk_create(users)
+        users = list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id'))
+
+        blocks, tasks = [], []
+        texts = iter(generate_texts(planner, len(users) * options['tasks_per_user'], options['seed'], max_description_words=30))
+        for user in users:
+            for day in range(7):
+                blocks.append(TimeBlock(user=user, day_of_week=day, start_time=clock_time(9, 0), end_time=clock_time(12, 0)))
+                blocks.append(TimeBlock(user=user, day_of_week=day, start_time=clock_time(14, 0), end_time=clock_time(18, 0)))
+            for _ in range(options['tasks_per_user']):
+                title, description = next(texts)
+                tasks.append(Task(
+                    user=user, title=title[:200], description=description,
+                    due_date=now + timedelta(hours=rng.randint(2, 240))
+                ))
+        TimeBlock.objects.bulk_create(blocks)
+        Task.objects.bulk_create(tasks)
+        return users
+
+    def run_job(self, user, target_date):
+        """One schedule generation as the background worker runs it; (seconds, queries, outcome)"""
+        try:
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                daily_schedule, _ = DeepSeekSchedulerService().generate_daily_schedule(user, target_date, replace=True)
+            elapsed = time.perf_counter() - started
+            if 'Fallback scheduling' in daily_schedule.ai_response:
+                outcome = 'fallback'
+            elif daily_schedule.llm_latency_ms is None:
+                outcome = 'cached'
+            else:
+                outcome = 'ai'
+            return elapsed, len(queries), outcome
+        except Exception as e:
+            return 0, 0, f'error: {e}'
+        finally:
+            connection.close()
+
+    def report_packing(self, task_count, repeat=3):
+        """Time get_fallback_schedule per strategy on unsaved tasks and blocks (no database access)"""
+        titles = ['Weekly quiz', 'Read chapter 4', 'Homework 3', 'Final exam revision', 'Essay draft']
+        blocks = [
+            TimeBlock(id=hour + 1, day_of_week=0, start_time=clock_time(hour, 0), end_time=clock_time(hour, 50))
+            for hour in range(24)
+        ]
+        tasks_by_id = {i: Task(id=i, title=titles[i % len(titles)]) for i in range(1, task_count + 1)}
+        buckets = {'must': [{'id': task_id} for task_id in tasks_by_id], 'should': []}
+        scheduler = DeepSeekSchedulerService()
+
+        self.stdout.write(f'Fallback packing, {task_count} tasks into {len(blocks)} blocks (best of {repeat})')
+        for strategy in STRATEGIES:
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = scheduler.get_fallback_schedule(
+                    None, timezone.localdate(), blocks, buckets, strategy, tasks_by_id
+                )
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            per_task_us = best / task_count * 1e6
+            line = (
+                f'  {strategy:<10} {best * 1000:9.2f} ms  ({per_task_us:7.1f} us/task, '
+                f'{len(result["schedule"])} placed)'
+            )
+            # Target: well under a millisecond per task
+            self.stdout.write(line if per_task_us < 1000 else self.style.WARNING(line))
+
+    def report(self, results, elapsed, server_counts):
+        done = [result for result in results if not result[2].startswith('error')]
+        errors = [result[2] for result in results if result[2].startswith('error')]
+        latencies = [seconds * 1000 for seconds, _, _ in done]
+        queries = [count for _, count, _ in done]
+        outcomes = {outcome: sum(1 for result in done if result[2] == outcome) for outcome in ('ai', 'fallback', 'cached')}
+
+        self.stdout.write(f'  schedules/sec       {len(done) / elapsed:10.2f}  ({len(done)} in {elapsed:.2f}s)')
+        for pct in (50, 95, 99):
+            self.stdout.write(f'  p{pct} latency         {percentile(latencies, pct):10.1f} ms')
+        self.stdout.write(
+            f'  fallback ratio      {outcomes["fallback"] / max(len(done), 1):10.2%}  '
+            f'(ai {outcomes["ai"]}, fallback {outcomes["fallback"]}, cached {outcomes["cached"]})'
+        )
+        self.stdout.write(
+            f'  queries/schedule    {sum(queries) / max(len(queries), 1):10.1f}  (max {max(queries, default=0)})'
+        )
+        self.stdout.write(
+            f'  server              {server_counts["requests"]} requests, '
+            f'{server_counts["rate_limited"]} rate limited, {server_counts["malformed"]} malformed'
+        )
+        self.stdout.write(f'  circuit breaker     {llm_breaker.state()["state"]}')
+        if errors:
+            self.stdout.write(self.style.ERROR(f'  {len(errors)} errors, e.g. {errors[0]}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Benchmark finished without errors'))
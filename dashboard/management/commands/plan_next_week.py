@@ -0,0 +1,63 @@
+import logging
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.utils import timezone
+from dashboard.scheduling import STRATEGIES
+from dashboard.week_planner import generate_week_schedule
+
+
+class Command(BaseCommand):
+    help = 'Pre-plan the schedules for the coming week (run nightly, e.g. from cron)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='Plan the week for a specific user ID only'
+        )
+        parser.add_argument(
+            '--start-date',
+            help='First day to plan, YYYY-MM-DD (default: next Monday)'
+        )
+        parser.add_argument(
+            '--strategy',
+            choices=STRATEGIES,
+            help='Packing strategy (default: settings.SCHEDULER_FALLBACK_STRATEGY)'
+        )
+    
+    def handle(self, *args, **options):
+        if options['start_date']:
+            try:
+                start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--start-date must be YYYY-MM-DD')
+        else:
+            today = timezone.localdate()
+            start_date = today + timedelta(days=7 - today.weekday())
+        
+        # Only users with time blocks can be scheduled
+        users = User.objects.filter(is_active=True, time_blocks__is_available=True).distinct()
+        if options['user_id']:
+            users = users.filter(id=options['user_id'])
+        
+        planned_users = failed = 0
+        for user in users.iterator():
+            try:
+                planned = generate_week_schedule(user, start_date, strategy=options['strategy'])
+            except Exception:
+                logging.exception(f"Weekly planning failed for {user.username}")
+                failed += 1
+                continue
+            
+            planned_users += 1
+            if options['verbosity'] >= 2:
+                total = sum(len(scheduled_tasks) for _, scheduled_tasks in planned)
+                self.stdout.write(f'  {user.username}: {total} tasks over {len(planned)} days')
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Planned week of {start_date} for {planned_users} users'
+                + (f' ({failed} failed)' if failed else '')
+            )
+        )
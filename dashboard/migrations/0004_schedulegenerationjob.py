@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:06
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_scheduledtask_schedule_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleGenerationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('target_date', models.DateField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('scheduled_count', models.PositiveIntegerField(default=0)),
+                ('used_fallback', models.BooleanField(default=False)),
+                ('message', models.TextField(blank=True, default='')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('daily_schedule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_jobs', to='dashboard.dailyschedule')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Schedule Generation Job',
+                'verbose_name_plural': 'Schedule Generation Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'target_date', 'status'], name='dashboard_s_user_id_f3c85c_idx')],
+            },
+        ),
+    ]
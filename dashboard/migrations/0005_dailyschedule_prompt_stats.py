@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_schedulegenerationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyschedule',
+            name='generation_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time taken to produce the schedule', null=True),
+        ),
+        migrations.AddField(
+            model_name='dailyschedule',
+            name='llm_latency_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='AI request time; empty when no request was made', null=True),
+        ),
+        migrations.AddField(
+            model_name='dailyschedule',
+            name='prompt_chars',
+            field=models.PositiveIntegerField(default=0, help_text='Characters sent to the AI (instructions + prompt)'),
+        ),
+        migrations.AddField(
+            model_name='dailyschedule',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(default=0, help_text='Estimated tokens sent to the AI'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+import uuid
 from datetime import datetime, timedelta
 
 
@@ -83,6 +84,12 @@ class DailySchedule(models.Model):
 
     generation_timestamp = models.DateTimeField(auto_now_add=True)
     
+    # Prompt size and latency
+    prompt_chars = models.PositiveIntegerField(default=0, help_text="Characters sent to the AI (instructions + prompt)")
+    prompt_tokens = models.PositiveIntegerField(default=0, help_text="Estimated tokens sent to the AI")
+    llm_latency_ms = models.PositiveIntegerField(null=True, blank=True, help_text="AI request time; empty when no request was made")
+    generation_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Time taken to produce the schedule")
+    
     # Status
     is_active = models.BooleanField(default=True)
     
@@ -94,3 +101,44 @@ class DailySchedule(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.date}"
+
+
+class ScheduleGenerationJob(models.Model):
+    """Background generation of a DailySchedule, polled by the client"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ['queued', 'running']
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedule_jobs')
+    target_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    
+    # Outcome
+    daily_schedule = models.ForeignKey(DailySchedule, on_delete=models.SET_NULL, null=True, blank=True, related_name='generation_jobs')
+    scheduled_count = models.PositiveIntegerField(default=0)
+    used_fallback = models.BooleanField(default=False)
+    message = models.TextField(blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', 'target_date', 'status'])]
+        verbose_name = "Schedule Generation Job"
+        verbose_name_plural = "Schedule Generation Jobs"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.target_date} ({self.status})"
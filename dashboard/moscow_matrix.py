@@ -18,20 +18,7 @@ def moscow_matrix(request):
     
     # Use cached MoSCoW analysis
     result = MoSCoWCacheService.get_moscow_analysis(request.user)
-    
-    # Create task objects with analysis details
-    task_details = {}
-    for log_entry in result['decision_log']:
-        task_id = int(log_entry['id'])
-        task_details[task_id] = {
-            'category': log_entry['final'],
-            'score': log_entry['score'],
-            'task_type': log_entry['type'],
-            'importance': log_entry['importance'],
-            'urgency': log_entry['urgency'],
-            'due_in_days': log_entry['due_in_days'],
-            'reasoning': log_entry['matched_rule']
-        }
+    task_details = MoSCoWCacheService.build_task_details(result)
     
     # Categorize tasks by their calculated priority
     must_have_tasks = []
@@ -0,0 +1,115 @@
+import math
+from django.conf import settings
+
+
+# Per-call prompt budget; the fixed instructions below are sent separately as the system message
+TOKEN_BUDGET = getattr(settings, 'SCHEDULER_PROMPT_TOKEN_BUDGET', 1500)
+CHARS_PER_TOKEN = 4  # rough average for English text
+MAX_DESCRIPTION_CHARS = 160
+MAX_TITLE_CHARS = 80
+
+
+# Identical on every call, so it is sent once as the system message instead of being
+# rebuilt into every prompt (and providers can cache it as a prefix)
+SCHEDULING_INSTRUCTIONS = """You are an academic productivity scheduler. Build a one-day schedule for a student.
+
+Input: the day, the available time blocks and the tasks as pipe-separated tables.
+Task category M = MUST (urgent and important), S = SHOULD (important, less urgent).
+
+Rules:
+1. Schedule ALL M tasks before any S task; add S tasks only if time permits.
+2. Items must lie inside the time blocks; leave 10-15 min between tasks.
+3. Use 25-min Pomodoro sessions with 5-min breaks; for tasks over 2 hours use 52/17.
+4. Realistic durations: final exam prep 3-5h, midterm 2-3h, major project 4-6h, homework 45-90m,
+   lab report 1-2h, quiz 30-60m, problem set 1-2h, presentation 2-3h, reading 30-45m/chapter, discussion post 15-30m.
+5. Don't over-schedule or stack hard tasks back-to-back. If an M task can't fit, say why in the summary.
+
+Return ONLY a JSON object, times in 24-hour HH:MM, task_id from the task table:
+{"schedule": [{"task_id": "12", "task_title": "...", "time_block_start": "09:00", "time_block_end": "11:00",
+"scheduled_start": "09:00", "scheduled_end": "10:30", "estimated_duration_minutes": 90, "pomodoro_sessions": 3,
+"break_minutes": 10, "reasoning": "...", "priority_score": 95}],
+"summary": {"total_scheduled_minutes": 90, "total_break_minutes": 10, "tasks_scheduled": 1,
+"moscow_must_scheduled": 1, "moscow_should_scheduled": 0, "remaining_time_minutes": 330, "scheduling_strategy": "..."}}"""
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _clean(text, limit):
+    """Single line, pipes escaped, cut to `limit` characters"""
+    text = ' '.join((text or '').split()).replace('|', '/')
+    return text if len(text) <= limit else text[:max(0, limit - 1)] + '…'
+
+
+class SchedulingPromptBuilder:
+    """
+    Compact, token-budgeted prompt for one day.
+
+    Blocks and tasks are encoded as pipe-separated rows. When they don't fit the budget,
+    SHOULD rows are left out first (lowest priority first) until the rows without
+    descriptions fit; MUST rows are never dropped. The rest of the budget then goes to
+    descriptions in priority order, so the lowest priority rows are the ones whose
+    descriptions get cut or omitted.
+    """
+
+    def __init__(self, token_budget=None):
+        self.token_budget = token_budget or TOKEN_BUDGET
+        self.stats = {}
+
+    def build(self, target_date, available_blocks, block_minutes, must_tasks, should_tasks):
+        """
+        Prompt text for the day. must_tasks/should_tasks are (task, due_in_days) pairs in priority order.
+        Sizes and what was cut are left in self.stats.
+        """
+        total_minutes = sum(block_minutes)
+        header = (
+            f"Day: {target_date.strftime('%a %Y-%m-%d')}\n"
+            f"Available: {total_minutes} min\n"
+            "Blocks (start-end|min):\n"
+            + ''.join(
+                f"{block.start_time.strftime('%H:%M')}-{block.end_time.strftime('%H:%M')}|{minutes}\n"
+                for block, minutes in zip(available_blocks, block_minutes)
+            )
+            + "Tasks (id|cat|due|days left|title|description):\n"
+        )
+
+        rows = [(task, 'M', days) for task, days in must_tasks] + [(task, 'S', days) for task, days in should_tasks]
+        prefixes = [self._row_prefix(task, category, days) for task, category, days in rows]
+        descriptions = [_clean(task.description, MAX_DESCRIPTION_CHARS) for task, _, _ in rows]
+        budget_chars = self.token_budget * CHARS_PER_TOKEN - len(header)
+
+        # Leave out SHOULD rows (lowest first) until the bare rows fit
+        must_count = len(must_tasks)
+        while len(prefixes) > must_count and sum(len(prefix) + 1 for prefix in prefixes) > budget_chars:
+            prefixes.pop()
+            descriptions.pop()
+        dropped = len(rows) - len(prefixes)
+
+        # Spend what is left on descriptions, highest priority first
+        remaining = budget_chars - sum(len(prefix) + 1 for prefix in prefixes)
+        truncated = 0
+        lines = []
+        for prefix, description in zip(prefixes, descriptions):
+            if description:
+                allowed = max(0, remaining - 1)
+                if len(description) + 1 > remaining:
+                    description = _clean(description, allowed) if allowed > 8 else ''
+                    truncated += 1
+                if description:
+                    remaining -= len(description) + 1
+            lines.append(f"{prefix}|{description}" if description else prefix)
+
+        prompt = header + '\n'.join(lines) + f"\nSchedule all {must_count} M tasks first."
+        self.stats = {
+            'prompt_chars': len(prompt) + len(SCHEDULING_INSTRUCTIONS),
+            'prompt_tokens': estimate_tokens(prompt) + estimate_tokens(SCHEDULING_INSTRUCTIONS),
+            'tasks_included': len(lines),
+            'tasks_dropped': dropped,
+            'descriptions_truncated': truncated,
+        }
+        return prompt
+
+    def _row_prefix(self, task, category, days):
+        due = task.due_date.strftime('%m-%d') if task.due_date else '-'
+        return f"{task.id}|{category}|{due}|{days if days is not None else '-'}|{_clean(task.title, MAX_TITLE_CHARS)}"
@@ -0,0 +1,252 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from tasks.models import Task, TimeBlock
+from priority_analyzer.signals import MoSCoWCacheService
+from .models import ScheduledTask, DailySchedule
+from .ai_scheduler import DeepSeekSchedulerService
+from .scheduling import MINUTES_PER_DAY, block_span, minutes_to_time, time_to_minutes
+
+
+# Only these tasks belong in a schedule; done and in-review tasks are never inserted
+ACTIVE_STATUSES = ['todo', 'in_progress']
+
+BUFFER_MINUTES = 10  # same gap as the fallback packer
+MUST_PRIORITY_SCORE = 95
+SHOULD_PRIORITY_SCORE = 70
+
+
+def local_now():
+    return timezone.localtime()
+
+
+class DayReplanner:
+    """
+    Patches a user's schedule for today after a single task changed, instead of regenerating it.
+
+    - a completed (or no longer relevant) task frees the rest of its slot, which is
+      backfilled with the first unscheduled SHOULD task that fits;
+    - a task that became MUST is inserted at the earliest free point of a block and the
+      later items are shifted; SHOULD items pushed past the block end are dropped.
+
+    Only rows whose times change are updated and nothing in the past is moved.
+    """
+
+    def __init__(self, user, now=None):
+        self.user = user
+        self.now = now or local_now()
+        self.date = self.now.date()
+        self.now_minutes = time_to_minutes(self.now.time())
+        self.scheduler = DeepSeekSchedulerService()
+
+    def load(self):
+        """Today's schedule and rows; False if there is no schedule to patch"""
+        self.daily_schedule = DailySchedule.objects.filter(user=self.user, date=self.date).first()
+        if self.daily_schedule is None:
+            return False
+        self.rows = list(
+            ScheduledTask.objects.filter(user=self.user, scheduled_date=self.date).select_related('time_block')
+        )
+        return True
+
+    def span(self, row):
+        """(start, end) minutes of a row in its block's frame (past midnight in overnight blocks)"""
+        block_start, _ = block_span(row.time_block)
+        start = time_to_minutes(row.start_time)
+        if start < block_start:
+            start += MINUTES_PER_DAY
+        return start, start + row.estimated_duration_minutes
+
+    def open_rows(self, task_id, include_completed=False):
+        """A task's rows that have not ended yet"""
+        return [
+            row for row in self.rows
+            if row.task_id == task_id and (include_completed or not row.is_completed)
+            and self.span(row)[1] > self.now_minutes
+        ]
+
+    def _count(self, row, sign):
+        """F-expression deltas on the DailySchedule totals for adding (1) or removing (-1) a row"""
+        is_must = row.priority_score >= MUST_PRIORITY_SCORE
+        return {
+            'tasks_count': sign,
+            'total_scheduled_minutes': sign * row.estimated_duration_minutes,
+            'total_break_minutes': sign * row.break_minutes,
+            'moscow_must_count': sign if is_must else 0,
+            'moscow_should_count': 0 if is_must else sign,
+        }
+
+    def _apply_totals(self, added=(), removed=()):
+        deltas = {}
+        for rows, sign in ((added, 1), (removed, -1)):
+            for row in rows:
+                for field, value in self._count(row, sign).items():
+                    deltas[field] = deltas.get(field, 0) + value
+        updates = {field: F(field) + value for field, value in deltas.items() if value}
+        if updates:
+            DailySchedule.objects.filter(pk=self.daily_schedule.pk).update(**updates)
+
+    def _row(self, task, time_block, start, minutes, priority_score, reasoning):
+        return ScheduledTask(
+            user=self.user,
+            task=task,
+            time_block=time_block,
+            estimated_duration_minutes=minutes,
+            scheduled_date=self.date,
+            start_time=minutes_to_time(start),
+            end_time=minutes_to_time(start + minutes),
+            pomodoro_sessions=max(1, minutes // 25),
+            break_minutes=5 if minutes < 60 else 10,
+            ai_reasoning=reasoning,
+            priority_score=priority_score,
+            schedule_type='ai'
+        )
+
+    def backfill(self, time_block, start, end):
+        """Fill start..end of a block with the first unscheduled SHOULD task that fits"""
+        scheduled_ids = {row.task_id for row in self.rows}
+        should_ids = [
+            int(task_data['id'])
+            for task_data in MoSCoWCacheService.get_moscow_analysis(self.user)['buckets'].get('should', [])
+            if int(task_data['id']) not in scheduled_ids
+        ]
+        if not should_ids:
+            return None
+
+        # The analysis may be a stale copy that still lists a task just completed or sent to review
+        tasks_by_id = Task.objects.filter(status__in=ACTIVE_STATUSES).in_bulk(should_ids)
+        for task_id in should_ids:
+            task = tasks_by_id.get(task_id)
+            if task is None:
+                continue
+            minutes = self.scheduler._estimate_task_duration(task)
+            if minutes <= end - start:
+                row = self._row(
+                    task, time_block, start, minutes, SHOULD_PRIORITY_SCORE,
+                    f"SHOULD task: {task.title}. Backfilled into time freed up in today's schedule."
+                )
+                row.save()
+                self.rows.append(row)
+                return row
+        return None
+
+    def release(self, task, completed):
+        """Free the remaining time of a task's rows (marking them completed or removing them) and backfill it"""
+        # Rows ticked off in the schedule view are still freed when the task itself is completed
+        rows = self.open_rows(task.id, include_completed=completed)
+        if not rows:
+            return []
+
+        with transaction.atomic():
+            if completed:
+                ScheduledTask.objects.filter(pk__in=[row.pk for row in rows]).update(is_completed=True)
+            else:
+                ScheduledTask.objects.filter(pk__in=[row.pk for row in rows]).delete()
+                self.rows = [row for row in self.rows if row not in rows]
+
+            added = []
+            for row in rows:
+                start, end = self.span(row)
+                backfilled = self.backfill(row.time_block, max(start, self.now_minutes), end)
+                if backfilled:
+                    added.append(backfilled)
+            self._apply_totals(added=added, removed=[] if completed else rows)
+        return added
+
+    def insert(self, task):
+        """Insert a MUST task at the earliest point of today's blocks, shifting later items"""
+        if any(row.task_id == task.id and not row.is_completed for row in self.rows):
+            return None
+
+        minutes = self.scheduler._estimate_task_duration(task)
+        blocks = TimeBlock.objects.filter(
+            user=self.user, day_of_week=self.date.weekday(), is_available=True
+        ).order_by('start_time')
+
+        for time_block in blocks:
+            plan = self._plan_insert(time_block, minutes)
+            if plan is None:
+                continue
+
+            start, moved, dropped = plan
+            row = self._row(
+                task, time_block, start, minutes, MUST_PRIORITY_SCORE,
+                f"Priority MUST task: {task.title}. Inserted into today's schedule, later items shifted."
+            )
+            with transaction.atomic():
+                row.save()
+                if moved:
+                    ScheduledTask.objects.bulk_update(moved, ['start_time', 'end_time'])
+                if dropped:
+                    ScheduledTask.objects.filter(pk__in=[item.pk for item in dropped]).delete()
+                self._apply_totals(added=[row], removed=dropped)
+            self.rows = [item for item in self.rows if item not in dropped] + [row]
+            return row
+        return None
+
+    def _plan_insert(self, time_block, minutes):
+        """(start, moved rows, dropped rows) for inserting into a block, or None if it can't take the task"""
+        block_start, block_end = block_span(time_block)
+        items = sorted(
+            (row for row in self.rows if row.time_block_id == time_block.id),
+            key=lambda row: self.span(row)[0]
+        )
+
+        # Started or completed items stay where they are; the task goes right after them
+        cursor = max(block_start, self.now_minutes)
+        for row in items:
+            start, end = self.span(row)
+            if row.is_completed or start < self.now_minutes:
+                cursor = max(cursor, end + BUFFER_MINUTES)
+        if cursor + minutes > block_end:
+            return None
+
+        moved, dropped = [], []
+        previous_end = cursor + minutes
+        for row in items:
+            start, end = self.span(row)
+            if row.is_completed or start < cursor:
+                continue
+            new_start = max(start, previous_end + BUFFER_MINUTES)
+            new_end = new_start + (end - start)
+            if new_end > block_end:
+                if row.priority_score >= MUST_PRIORITY_SCORE:
+                    return None  # never push another MUST task out of the day
+                dropped.append(row)
+                continue
+            if new_start != start:
+                moved.append((row, new_start, new_end))
+            previous_end = new_end
+
+        # Only change the rows once the whole block is known to work
+        for row, new_start, new_end in moved:
+            row.start_time = minutes_to_time(new_start)
+            row.end_time = minutes_to_time(new_end)
+        return cursor, [row for row, _, _ in moved], dropped
+
+
+def replan_after_task_change(task, completed=False, redated=False, deactivated=False, now=None):
+    """
+    Patch today's schedule of the task's owner and assignee after it was completed, added,
+    re-dated or moved out of the active statuses without being completed (deactivated)
+    """
+    active = task.status in ACTIVE_STATUSES
+    if not (completed or deactivated or active):
+        return
+
+    users = [task.user] + ([task.assigned_to] if task.assigned_to_id and task.assigned_to_id != task.user_id else [])
+    category = task.get_moscow_priority() if active else None
+
+    for user in users:
+        replanner = DayReplanner(user, now=now)
+        if not replanner.load():
+            continue
+        if completed:
+            replanner.release(task, completed=True)
+        elif not active:
+            replanner.release(task, completed=False)
+        elif category == 'must':
+            replanner.insert(task)
+        elif redated and category != 'should':
+            # Moved out of MUST/SHOULD: give its slot to something more urgent
+            replanner.release(task, completed=False)
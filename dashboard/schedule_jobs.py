@@ -0,0 +1,97 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.utils import timezone
+from .models import ScheduleGenerationJob
+from .ai_scheduler import DeepSeekSchedulerService
+
+
+# Worker threads for schedule generation (LLM concurrency is limited separately in ai_scheduler)
+JOB_WORKERS = getattr(settings, 'SCHEDULER_JOB_WORKERS', 4)
+
+# Jobs left running longer than this (e.g. the process died) no longer block new ones
+JOB_STALE_AFTER = timedelta(minutes=10)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='schedule-job')
+        return _executor
+
+
+def enqueue_schedule_job(user, target_date):
+    """
+    Queue schedule generation for a user's day and return the job.
+    An unfinished job for the same day is reused instead of starting another one.
+    """
+    with transaction.atomic():
+        # Serialize enqueues per user so two requests can't both miss the active job and create one
+        # (MySQL has no partial unique indexes to enforce this)
+        User.objects.select_for_update().filter(pk=user.pk).first()
+        active = ScheduleGenerationJob.objects.filter(
+            user=user,
+            target_date=target_date,
+            status__in=ScheduleGenerationJob.ACTIVE_STATUSES,
+            created_at__gte=timezone.now() - JOB_STALE_AFTER
+        ).first()
+        if active:
+            return active
+
+        job = ScheduleGenerationJob.objects.create(user=user, target_date=target_date)
+
+    if getattr(settings, 'SCHEDULER_JOBS_EAGER', False):
+        # Run inline (tests, management commands)
+        run_schedule_job(job.id)
+        job.refresh_from_db()
+    else:
+        # The worker reads the job row, so only submit it once it is committed
+        transaction.on_commit(lambda: get_executor().submit(run_schedule_job_in_thread, job.id))
+    return job
+
+
+def run_schedule_job_in_thread(job_id):
+    try:
+        run_schedule_job(job_id)
+    finally:
+        # Worker threads own their connections
+        connections.close_all()
+
+
+def run_schedule_job(job_id):
+    """Generate the schedule for a job, replacing any existing schedule for that day"""
+    job = ScheduleGenerationJob.objects.select_related('user').get(id=job_id)
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        # The old schedule stays in place until the new one is ready, then both are swapped in one transaction
+        scheduler = DeepSeekSchedulerService()
+        daily_schedule, scheduled_tasks = scheduler.generate_daily_schedule(job.user, job.target_date, replace=True)
+
+        job.used_fallback = 'Fallback scheduling' in daily_schedule.ai_response
+        if job.used_fallback:
+            job.message = f'AI scheduling unavailable (rate limit), used intelligent fallback. Generated optimized schedule for {len(scheduled_tasks)} tasks.'
+        else:
+            job.message = f'Successfully generated AI-powered schedule for {job.target_date.strftime("%B %d, %Y")}! Scheduled {len(scheduled_tasks)} tasks with focus timer support.'
+        job.daily_schedule = daily_schedule
+        job.scheduled_count = len(scheduled_tasks)
+        job.status = 'succeeded'
+    except Exception as e:
+        logging.exception(f"Schedule generation job {job_id} failed")
+        job.error = f'Error generating schedule: {str(e)}'
+        job.status = 'failed'
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
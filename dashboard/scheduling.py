@@ -0,0 +1,120 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import time
+
+
+MINUTES_PER_DAY = 24 * 60
+
+# Fallback packing strategies
+FIRST_FIT = 'first_fit'        # earliest free slot that is long enough
+BEST_FIT = 'best_fit'          # shortest free slot that is long enough (keeps long slots for long tasks)
+EARLIEST_DEADLINE = 'edf'      # order tasks by deadline, then place first-fit
+STRATEGIES = (FIRST_FIT, BEST_FIT, EARLIEST_DEADLINE)
+
+
+def time_to_minutes(value):
+    """Minutes since midnight for a datetime.time"""
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_time(minutes):
+    """datetime.time for a minute offset (offsets past midnight wrap to the next day)"""
+    minutes %= MINUTES_PER_DAY
+    return time(minutes // 60, minutes % 60)
+
+
+def block_span(time_block):
+    """
+    (start, end) minute offsets of a time block.
+    A block that ends at or before its start runs past midnight, so its end is on the next day.
+    """
+    start = time_to_minutes(time_block.start_time)
+    end = time_to_minutes(time_block.end_time)
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+class FreeList:
+    """
+    Free intervals of a day's time blocks.
+
+    Intervals are (start, end, block) with minute offsets and are kept in two sorted lists:
+    by start for first-fit and by (length, start) for best-fit, so a best-fit lookup is a
+    single bisect. Placing a task consumes the front of an interval.
+    """
+
+    def __init__(self, time_blocks):
+        self.blocks = {}
+        self.by_start = []
+        self.by_length = []
+        for time_block in time_blocks:
+            start, end = block_span(time_block)
+            self.blocks[time_block.id] = time_block
+            self._add(start, end, time_block.id)
+
+    def _add(self, start, end, block_id):
+        insort(self.by_start, (start, end, block_id))
+        insort(self.by_length, (end - start, start, end, block_id))
+
+    def _remove(self, start, end, block_id):
+        del self.by_start[bisect_left(self.by_start, (start, end, block_id))]
+        del self.by_length[bisect_left(self.by_length, (end - start, start, end, block_id))]
+
+    def first_fit(self, minutes):
+        """Earliest (start, end, block_id) interval with at least `minutes` free, or None"""
+        for interval in self.by_start:
+            if interval[1] - interval[0] >= minutes:
+                return interval
+        return None
+
+    def best_fit(self, minutes):
+        """Shortest (start, end, block_id) interval with at least `minutes` free, or None"""
+        index = bisect_left(self.by_length, (minutes,))
+        if index == len(self.by_length):
+            return None
+        _, start, end, block_id = self.by_length[index]
+        return start, end, block_id
+
+    def find(self, minutes, strategy=FIRST_FIT):
+        if strategy == BEST_FIT:
+            return self.best_fit(minutes)
+        return self.first_fit(minutes)
+
+    def allocate(self, interval, minutes):
+        """Consume `minutes` from the front of an interval returned by find()"""
+        start, end, block_id = interval
+        self._remove(start, end, block_id)
+        if start + minutes < end:
+            self._add(start + minutes, end, block_id)
+
+    def remaining_minutes(self):
+        return sum(end - start for start, end, _ in self.by_start)
+
+
+class BlockIndex:
+    """Find the time block that contains a scheduled start/end (e.g. from an AI response)"""
+
+    def __init__(self, time_blocks):
+        self.blocks = {time_block.id: time_block for time_block in time_blocks}
+        self.spans = sorted(block_span(time_block) + (time_block.id,) for time_block in time_blocks)
+        self.starts = [start for start, _, _ in self.spans]
+
+    def get(self, block_id):
+        return self.blocks.get(block_id)
+
+    def find(self, start_time, end_time):
+        """Block whose span covers start_time..end_time, or None"""
+        start = time_to_minutes(start_time)
+        end = time_to_minutes(end_time)
+        if end < start:
+            end += MINUTES_PER_DAY
+
+        # Times after midnight can also fall in the next-day part of an overnight block
+        for offset in (0, MINUTES_PER_DAY):
+            index = bisect_right(self.starts, start + offset) - 1
+            while index >= 0:
+                _, block_end, block_id = self.spans[index]
+                if block_end >= end + offset:
+                    return self.blocks[block_id]
+                index -= 1
+        return None
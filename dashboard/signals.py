@@ -0,0 +1,34 @@
+import logging
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from tasks.models import Task
+from tasks.signals import stored_snapshot
+from .replanner import ACTIVE_STATUSES, replan_after_task_change
+
+
+@receiver(post_save, sender=Task)
+def patch_todays_schedule(sender, instance, created, **kwargs):
+    """
+    Signal handler for when a task is created, completed, re-dated or set aside (e.g. sent to review).
+    Patches today's schedule in place instead of regenerating it.
+    """
+    if not getattr(settings, 'SCHEDULER_INCREMENTAL_REPLAN', True):
+        return
+
+    # Stored status and due date before and after this save (tasks.signals)
+    previous = getattr(instance, '_saved_snapshot', None)
+    current = stored_snapshot(instance)
+    active = current['status'] in ACTIVE_STATUSES
+    was_active = previous is not None and previous['status'] in ACTIVE_STATUSES
+    completed = previous is not None and previous['status'] != 'done' and current['status'] == 'done'
+    deactivated = was_active and not active and not completed
+    redated = previous is not None and previous['due_date'] != current['due_date']
+    if not (completed or deactivated or (active and (created or redated))):
+        return
+
+    try:
+        replan_after_task_change(instance, completed=completed, redated=redated, deactivated=deactivated)
+    except Exception:
+        # The task itself is saved; a stale schedule can still be regenerated
+        logging.exception(f"Incremental re-planning failed for task {instance.pk}")
@@ -1,3 +1,684 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import date, time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from priority_analyzer.signals import MoSCoWCacheService
+from tasks.models import Task, TimeBlock
+from .ai_scheduler import DeepSeekSchedulerService
+from .llm_cache import ResponseCache, schedule_response_cache
+from .llm_guard import llm_breaker, llm_budget
+from .models import ScheduledTask, DailySchedule, ScheduleGenerationJob
+from .week_planner import WeekPlanner
+from . import replanner
+from .prompt_builder import SchedulingPromptBuilder, estimate_tokens
+from .scheduling import BEST_FIT, EARLIEST_DEADLINE, FIRST_FIT, BlockIndex, FreeList, block_span
+
+
+# Queries for one generated day once the MoSCoW analysis is cached:
+# time blocks, candidate tasks (in_bulk), savepoint, DailySchedule insert,
+# ScheduledTask bulk insert, release savepoint
+SCHEDULE_QUERY_COUNT = 6
+
+
+class GenerateDailyScheduleQueryTests(TestCase):
+    """Schedule generation must not issue per-task queries"""
+
+    def setUp(self):
+        cache.clear()
+        schedule_response_cache.clear()
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.target_date = date(2025, 9, 8)  # a Monday
+        for start, end in [(time(8, 0), time(12, 0)), (time(13, 0), time(17, 0)), (time(22, 0), time(1, 0))]:
+            TimeBlock.objects.create(user=self.user, day_of_week=0, start_time=start, end_time=end)
+
+        now = timezone.now()
+        self.tasks = [
+            Task.objects.create(user=self.user, title=title, due_date=now + timedelta(hours=hours))
+            for title, hours in [
+                ('Final exam review', 10), ('Quiz prep', 20), ('Lab report', 30), ('Homework 3', 12),
+                ('Reading chapter 4', 40), ('Project milestone', 15), ('Problem set 2', 50), ('Essay draft', 60),
+            ]
+        ]
+
+        # Warm the MoSCoW cache so only schedule generation is counted
+        MoSCoWCacheService.get_moscow_analysis(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_fallback_schedule_query_count(self):
+        scheduler = DeepSeekSchedulerService()
+        scheduler.api_key = None  # forces the fallback path
+
+        with self.assertNumQueries(SCHEDULE_QUERY_COUNT):
+            daily_schedule, scheduled_tasks = scheduler.generate_daily_schedule(self.user, self.target_date)
+
+        self.assertTrue(scheduled_tasks)
+        self.assertEqual(ScheduledTask.objects.filter(user=self.user).count(), len(scheduled_tasks))
+        self.assertEqual(DailySchedule.objects.get(user=self.user).pk, daily_schedule.pk)
+
+    def test_ai_schedule_query_count(self):
+        scheduler = DeepSeekSchedulerService()
+        schedule = [
+            {
+                'task_id': str(task.id),
+                'scheduled_start': f'{8 + i}:00',
+                'scheduled_end': f'{8 + i}:45',
+                'estimated_duration_minutes': 45,
+                'reasoning': 'test',
+                'priority_score': 90,
+            }
+            for i, task in enumerate(self.tasks[:3])
+        ]
+        # One item in the overnight block, after midnight
+        schedule.append({
+            'task_id': str(self.tasks[3].id),
+            'scheduled_start': '00:05',
+            'scheduled_end': '00:50',
+            'estimated_duration_minutes': 45,
+            'reasoning': 'test',
+            'priority_score': 80,
+        })
+        ai_response = {
+            'schedule': schedule,
+            'summary': {
+                'total_scheduled_minutes': 180, 'total_break_minutes': 20, 'tasks_scheduled': 4,
+                'moscow_must_scheduled': 4, 'moscow_should_scheduled': 0,
+            },
+        }
+
+        with mock.patch.object(DeepSeekSchedulerService, 'call_deepseek_api_smart', return_value=ai_response):
+            with self.assertNumQueries(SCHEDULE_QUERY_COUNT):
+                _, scheduled_tasks = scheduler.generate_daily_schedule(self.user, self.target_date)
+
+        self.assertEqual(len(scheduled_tasks), 4)
+        self.assertEqual(scheduled_tasks[-1].time_block.start_time, time(22, 0))
+
+    def test_malformed_ai_items_fall_back(self):
+        scheduler = DeepSeekSchedulerService()
+        item = {
+            'task_id': str(self.tasks[0].id), 'scheduled_start': '08:00', 'scheduled_end': '08:45',
+            'estimated_duration_minutes': 45, 'reasoning': 'test', 'priority_score': 90,
+        }
+        malformed = [
+            {key: value for key, value in item.items() if key != 'reasoning'},
+            {key: value for key, value in item.items() if key != 'task_id'},
+            {**item, 'task_id': None},
+            {**item, 'priority_score': 'high'},
+        ]
+        for bad_item in malformed:
+            ai_response = {'schedule': [item, bad_item], 'summary': {}}
+            with mock.patch.object(DeepSeekSchedulerService, 'call_deepseek_api_smart', return_value=ai_response):
+                daily_schedule, scheduled_tasks = scheduler.generate_daily_schedule(self.user, self.target_date)
+
+            self.assertIn('Fallback scheduling', daily_schedule.ai_response)
+            self.assertTrue(scheduled_tasks)
+            self.assertEqual(DailySchedule.objects.filter(user=self.user).count(), 1)
+            DailySchedule.objects.all().delete()
+            ScheduledTask.objects.all().delete()
+
+
+class OpenRouterStub:
+    """Local HTTP server standing in for the OpenRouter chat completions API"""
+
+    def __init__(self, status=200, content=None, events=None):
+        self.status = status
+        self.content = content
+        self.events = events  # content deltas to send as a server-sent event stream
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                stub.requests.append(json.loads(self.rfile.read(length)))
+                if stub.events is not None:
+                    self.send_response(stub.status)
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.end_headers()
+                    self.wfile.write(b': OPENROUTER PROCESSING\n\n')
+                    for delta in stub.events:
+                        event = {'choices': [{'delta': {'content': delta}}]}
+                        self.wfile.write(f'data: {json.dumps(event)}\n\n'.encode())
+                    self.wfile.write(b'data: [DONE]\n\n')
+                    return
+                body = json.dumps({'choices': [{'message': {'content': stub.content or ''}}]}).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/api/v1/chat/completions'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ScheduleJobTests(TestCase):
+    """generate_schedule queues a job and the status endpoint reports its result"""
+
+    def setUp(self):
+        cache.clear()
+        schedule_response_cache.clear()
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.client.login(username='student', password='pass')
+        self.target_date = date(2025, 9, 8)  # a Monday
+        self.block = TimeBlock.objects.create(user=self.user, day_of_week=0, start_time=time(9, 0), end_time=time(12, 0))
+        self.task = Task.objects.create(user=self.user, title='Final exam review', due_date=timezone.now() + timedelta(hours=10))
+
+    def tearDown(self):
+        cache.clear()
+
+    def ai_content(self):
+        return json.dumps({
+            'schedule': [{
+                'task_id': str(self.task.id),
+                'scheduled_start': '09:00',
+                'scheduled_end': '10:30',
+                'estimated_duration_minutes': 90,
+                'reasoning': 'stub',
+                'priority_score': 95,
+            }],
+            'summary': {
+                'total_scheduled_minutes': 90, 'total_break_minutes': 10, 'tasks_scheduled': 1,
+                'moscow_must_scheduled': 1, 'moscow_should_scheduled': 0,
+            },
+        })
+
+    def generate(self):
+        return self.client.post(
+            reverse('dashboard:generate_schedule'),
+            {'target_date': self.target_date.isoformat()},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+    def test_generate_returns_job_and_status_reports_ai_schedule(self):
+        with OpenRouterStub(content=self.ai_content()) as stub:
+            with override_settings(SCHEDULER_JOBS_EAGER=True, OPENROUTER_API_URL=stub.url, DEEPSEEK_API_KEY='test'):
+                response = self.generate()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(stub.requests), 1)
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'succeeded')
+        self.assertFalse(status['used_fallback'])
+        self.assertEqual(status['scheduled_count'], 1)
+        self.assertTrue(status['redirect_url'].startswith('/dashboard/schedule/view/2025/9/8/'))
+
+        # Fixed instructions travel as the system message; size and latency are recorded
+        self.assertEqual([message['role'] for message in stub.requests[0]['messages']], ['system', 'user'])
+        daily_schedule = DailySchedule.objects.get(user=self.user)
+        self.assertGreater(daily_schedule.prompt_tokens, 0)
+        self.assertIsNotNone(daily_schedule.llm_latency_ms)
+        self.assertIsNotNone(daily_schedule.generation_ms)
+
+    def test_identical_request_is_served_from_response_cache(self):
+        with OpenRouterStub(content=self.ai_content()) as stub:
+            with override_settings(SCHEDULER_JOBS_EAGER=True, OPENROUTER_API_URL=stub.url, DEEPSEEK_API_KEY='test'):
+                self.generate()
+                response = self.generate()
+                self.assertEqual(len(stub.requests), 1)
+
+                # Editing a candidate task changes the key
+                self.task.title = 'Final exam review (ch. 1-5)'
+                self.task.save()
+                self.generate()
+
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(self.client.get(response.json()['status_url']).json()['scheduled_count'], 1)
+        stats = schedule_response_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 1 / 3)
+
+    def test_rate_limited_provider_falls_back(self):
+        with OpenRouterStub(status=429) as stub:
+            with override_settings(SCHEDULER_JOBS_EAGER=True, OPENROUTER_API_URL=stub.url, DEEPSEEK_API_KEY='test'):
+                response = self.generate()
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'succeeded')
+        self.assertTrue(status['used_fallback'])
+        self.assertEqual(ScheduledTask.objects.filter(user=self.user).count(), 1)
+
+    def test_background_job_is_queued_once_per_day(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.generate()
+            again = self.generate()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'queued')
+        self.assertEqual(again.json()['job_id'], response.json()['job_id'])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_regenerating_swaps_the_schedule(self):
+        with OpenRouterStub(status=429) as stub:
+            with override_settings(SCHEDULER_JOBS_EAGER=True, OPENROUTER_API_URL=stub.url, DEEPSEEK_API_KEY='test'):
+                first = self.generate().json()
+                second = self.generate().json()
+
+        self.assertNotEqual(first['job_id'], second['job_id'])
+        daily_schedule = DailySchedule.objects.get(user=self.user, date=self.target_date)
+        self.assertEqual(ScheduleGenerationJob.objects.get(id=second['job_id']).daily_schedule, daily_schedule)
+        self.assertEqual(ScheduledTask.objects.filter(user=self.user, scheduled_date=self.target_date).count(), 1)
+
+    def test_failed_generation_keeps_the_existing_schedule(self):
+        with OpenRouterStub(status=429) as stub:
+            with override_settings(SCHEDULER_JOBS_EAGER=True, OPENROUTER_API_URL=stub.url, DEEPSEEK_API_KEY='test'):
+                self.generate()
+                # the next run fails: no available time blocks left for the day
+                TimeBlock.objects.filter(id=self.block.id).update(is_available=False)
+                response = self.generate()
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'failed')
+        self.assertTrue(DailySchedule.objects.filter(user=self.user, date=self.target_date).exists())
+        self.assertEqual(ScheduledTask.objects.filter(user=self.user, scheduled_date=self.target_date).count(), 1)
+
+    def test_stale_job_does_not_block_the_day(self):
+        stale = ScheduleGenerationJob.objects.create(user=self.user, target_date=self.target_date, status='running')
+        ScheduleGenerationJob.objects.filter(id=stale.id).update(created_at=timezone.now() - timedelta(hours=1))
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.generate()
+
+        self.assertNotEqual(response.json()['job_id'], str(stale.id))
+        self.assertEqual(len(callbacks), 1)
+
+    def test_status_is_private_to_the_owner(self):
+        job = ScheduleGenerationJob.objects.create(user=self.user, target_date=self.target_date)
+        User.objects.create_user(username='other', password='pass')
+        self.client.login(username='other', password='pass')
+
+        response = self.client.get(reverse('dashboard:schedule_job_status', args=[job.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTests(TestCase):
+    def test_entries_expire_and_least_recently_used_is_evicted(self):
+        now = [0.0]
+        response_cache = ResponseCache(maxsize=2, ttl=60, clock=lambda: now[0])
+        response_cache.set('a', 1)
+        response_cache.set('b', 2)
+        self.assertEqual(response_cache.get('a'), 1)
+
+        response_cache.set('c', 3)  # evicts 'b', the least recently used
+        self.assertIsNone(response_cache.get('b'))
+        self.assertEqual(response_cache.get('c'), 3)
+
+        now[0] = 61
+        self.assertIsNone(response_cache.get('a'))
+        self.assertEqual(response_cache.stats(), {
+            'hits': 2, 'misses': 2, 'evictions': 1, 'size': 1, 'maxsize': 2, 'hit_rate': 0.5,
+        })
+
+
+@override_settings(DEEPSEEK_API_KEY='test')
+class CircuitBreakerTests(TestCase):
+    """Provider failures open the shared circuit so callers fall back without a network call"""
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def call(self, stub):
+        scheduler = DeepSeekSchedulerService()
+        scheduler.api_url = stub.url
+        return scheduler.call_deepseek_api_smart('prompt')
+
+    def test_circuit_opens_on_error_rate_and_probe_closes_it(self):
+        with OpenRouterStub(status=429) as stub, mock.patch.object(llm_budget, 'capacity', 100):
+            for _ in range(llm_breaker.min_calls):
+                with self.assertRaisesMessage(ValueError, '429'):
+                    self.call(stub)
+
+            self.assertEqual(llm_breaker.state()['state'], 'open')
+            self.assertEqual(llm_breaker.state()['error_rate'], 1.0)
+            with self.assertRaisesMessage(ValueError, 'circuit open'):
+                self.call(stub)
+            self.assertEqual(len(stub.requests), llm_breaker.min_calls)
+
+            # Cooldown over: one probe goes through and its success closes the circuit
+            cache.delete(llm_breaker._key('open'))
+            self.assertEqual(llm_breaker.state()['state'], 'half_open')
+            stub.status = 200
+            stub.content = '{"schedule": []}'
+            self.assertEqual(self.call(stub), {'schedule': []})
+
+        self.assertEqual(llm_breaker.state()['state'], 'closed')
+        self.assertEqual(llm_breaker.state()['calls'], 0)
+
+    def test_spent_budget_falls_back_without_request(self):
+        with OpenRouterStub(content='{"schedule": []}') as stub:
+            for _ in range(llm_budget.capacity):
+                self.call(stub)
+            with self.assertRaisesMessage(ValueError, 'budget exhausted'):
+                self.call(stub)
+
+        self.assertEqual(len(stub.requests), llm_budget.capacity)
+
+
+@override_settings(DEEPSEEK_API_KEY='test')
+class StreamingCompletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_schedule_is_parsed_from_event_stream(self):
+        events = ['Here is the plan: {"schedule": [{"task_id": "1", ', '"reasoning": "use {braces}"}], ', '"summary": {}}', ' and some trailing {text']
+        with OpenRouterStub(events=events) as stub:
+            scheduler = DeepSeekSchedulerService()
+            scheduler.api_url = stub.url
+            result = scheduler.call_deepseek_api_smart('prompt')
+
+        self.assertTrue(stub.requests[0]['stream'])
+        self.assertEqual(result, {'schedule': [{'task_id': '1', 'reasoning': 'use {braces}'}], 'summary': {}})
+
+    def test_malformed_stream_raises_value_error(self):
+        with OpenRouterStub(events=['{"schedule": [', 'oops']) as stub:
+            scheduler = DeepSeekSchedulerService()
+            scheduler.api_url = stub.url
+            with self.assertRaises(ValueError):
+                scheduler.call_deepseek_api_smart('prompt')
+
+
+class WeekPlannerTests(TestCase):
+    """A week is planned from one load of blocks and tasks, each task on one day before its deadline"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.client.login(username='student', password='pass')
+        self.start_date = timezone.localdate()
+        for day in range(7):
+            TimeBlock.objects.create(user=self.user, day_of_week=day, start_time=time(9, 0), end_time=time(12, 0))
+
+        now = timezone.now()
+        self.tasks = [
+            Task.objects.create(user=self.user, title=title, due_date=now + timedelta(hours=hours))
+            for title, hours in [
+                ('Final exam review', 10), ('Quiz prep', 20), ('Lab report', 30), ('Homework 3', 12),
+                ('Reading chapter 4', 40), ('Project milestone', 15), ('Problem set 2', 50), ('Essay draft', 60),
+            ]
+        ]
+        MoSCoWCacheService.get_moscow_analysis(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_week_is_planned_and_saved_in_one_pass(self):
+        planner = WeekPlanner(self.user, self.start_date)
+        # blocks, candidate tasks, then savepoint, two deletes, two bulk inserts, release
+        with self.assertNumQueries(8):
+            planned = planner.save(planner.plan())
+
+        self.assertEqual(len(planned), 7)
+        self.assertEqual(DailySchedule.objects.filter(user=self.user).count(), 7)
+        scheduled = ScheduledTask.objects.filter(user=self.user)
+        task_ids = [scheduled_task.task_id for scheduled_task in scheduled]
+        self.assertTrue(task_ids)
+        self.assertEqual(len(task_ids), len(set(task_ids)))
+        for scheduled_task in scheduled.select_related('task'):
+            due_date = timezone.localtime(scheduled_task.task.due_date).date()
+            if due_date >= self.start_date:
+                self.assertLessEqual(scheduled_task.scheduled_date, due_date)
+
+    def test_week_view_replaces_existing_days(self):
+        url = reverse('dashboard:generate_week_schedule')
+        data = {'week_start': self.start_date.isoformat()}
+        self.client.post(url, data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        response = self.client.post(url, data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        body = response.json()
+        self.assertTrue(body['success'])
+        self.assertEqual(body['days'][0]['date'], self.start_date.isoformat())
+        self.assertEqual(DailySchedule.objects.filter(user=self.user).count(), 7)
+        self.assertEqual(
+            ScheduledTask.objects.filter(user=self.user).count(),
+            sum(day['scheduled_count'] for day in body['days'])
+        )
+
+
+class IncrementalReplanTests(TestCase):
+    """Task changes patch today's schedule in place"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.today = timezone.localdate()
+        TimeBlock.objects.create(user=self.user, day_of_week=self.today.weekday(), start_time=time(8, 0), end_time=time(12, 0))
+
+        now = timezone.now()
+        # 45 minute quizzes: two MUST, six SHOULD; the block fits four
+        self.must = [Task.objects.create(user=self.user, title=f'Quiz {i}', due_date=now + timedelta(hours=10 * (i + 1))) for i in range(2)]
+        self.should = [Task.objects.create(user=self.user, title=f'Quiz {i + 2}', due_date=now + timedelta(hours=80 + 10 * i)) for i in range(6)]
+
+        scheduler = DeepSeekSchedulerService()
+        scheduler.api_key = None
+        scheduler.generate_daily_schedule(self.user, self.today)
+
+        now_patch = mock.patch.object(replanner, 'local_now', return_value=timezone.localtime().replace(hour=8, minute=0))
+        now_patch.start()
+        self.addCleanup(now_patch.stop)
+
+    def tearDown(self):
+        cache.clear()
+
+    def rows(self):
+        return {
+            row.task_id: (row.pk, row.start_time.strftime('%H:%M'), row.is_completed)
+            for row in ScheduledTask.objects.filter(user=self.user, scheduled_date=self.today)
+        }
+
+    def test_completed_task_slot_is_backfilled(self):
+        before = self.rows()
+        self.assertEqual(set(before), {self.must[0].id, self.must[1].id, self.should[0].id, self.should[1].id})
+
+        self.must[1].status = 'done'
+        self.must[1].save()
+
+        after = self.rows()
+        self.assertEqual(after[self.must[1].id], (before[self.must[1].id][0], '08:55', True))
+        self.assertEqual(after[self.should[2].id][1:], ('08:55', False))
+        for task in (self.must[0], self.should[0], self.should[1]):
+            self.assertEqual(after[task.id], before[task.id])
+        self.assertEqual(DailySchedule.objects.get(user=self.user, date=self.today).tasks_count, 5)
+
+    def test_new_must_task_is_inserted_and_later_items_shift(self):
+        before = self.rows()
+        urgent = Task.objects.create(user=self.user, title='Quiz urgent', due_date=timezone.now() + timedelta(hours=5))
+
+        after = self.rows()
+        self.assertEqual(after[urgent.id][1], '08:00')
+        self.assertEqual(after[self.must[0].id], (before[self.must[0].id][0], '08:55', False))
+        self.assertEqual(after[self.must[1].id][1], '09:50')
+        self.assertEqual(after[self.should[0].id][1], '10:45')
+        # Pushed past the end of the block
+        self.assertNotIn(self.should[1].id, after)
+        self.assertEqual(DailySchedule.objects.get(user=self.user, date=self.today).tasks_count, 4)
+
+    def test_redated_inactive_task_is_not_inserted(self):
+        done = Task.objects.create(user=self.user, title='Quiz done', status='done', completed_at=timezone.now())
+        review = Task.objects.create(user=self.user, title='Quiz review', status='review')
+        before = self.rows()
+
+        for task in (done, review):
+            task.due_date = timezone.now() + timedelta(hours=3)
+            task.save()
+
+        self.assertEqual(self.rows(), before)
+        self.assertEqual(DailySchedule.objects.get(user=self.user, date=self.today).tasks_count, 4)
+
+    def test_task_sent_to_review_releases_its_slot(self):
+        before = self.rows()
+        self.assertIn(self.must[1].id, before)
+
+        self.must[1].status = 'review'
+        self.must[1].save()
+
+        after = self.rows()
+        self.assertNotIn(self.must[1].id, after)
+        self.assertEqual(after[self.should[2].id][1:], ('08:55', False))
+        self.assertEqual(DailySchedule.objects.get(user=self.user, date=self.today).tasks_count, 4)
+
+    def test_stale_analysis_does_not_backfill_a_reviewed_task(self):
+        # Another worker is recomputing the analysis, so the stale copy (listing should[0] as active) is served
+        cache.add(MoSCoWCacheService.lock_key(self.user.id), 'other-worker', 30)
+        self.assertIn(self.should[0].id, self.rows())
+
+        self.should[0].status = 'review'
+        self.should[0].save()
+
+        after = self.rows()
+        self.assertNotIn(self.should[0].id, after)
+        self.assertIn(self.should[2].id, after)
+
+    def test_unrelated_edit_leaves_schedule_alone(self):
+        before = self.rows()
+        self.should[0].title = 'Quiz 2 (chapter 3)'
+        with CaptureQueriesContext(connection) as queries:
+            self.should[0].save()
+        self.assertFalse([query for query in queries if 'dashboard_' in query['sql']])
+        self.assertEqual(self.rows(), before)
+
+
+class PromptBuilderTests(TestCase):
+    def test_prompt_stays_within_budget_and_keeps_must_tasks(self):
+        user = User.objects.create_user(username='student', password='pass')
+        block = TimeBlock.objects.create(user=user, day_of_week=0, start_time=time(9, 0), end_time=time(17, 0))
+        tasks = [
+            Task.objects.create(user=user, title=f'Problem set {i}', description='Work through every exercise. ' * 30)
+            for i in range(40)
+        ]
+        builder = SchedulingPromptBuilder(token_budget=250)
+
+        prompt = builder.build(date(2025, 9, 8), [block], [480], [(task, 1) for task in tasks[:10]], [(task, 5) for task in tasks[10:]])
+
+        self.assertLessEqual(estimate_tokens(prompt), 260)
+        for task in tasks[:10]:
+            self.assertIn(f'\n{task.id}|M|', prompt)
+        self.assertGreater(builder.stats['tasks_dropped'], 0)
+        self.assertGreater(builder.stats['descriptions_truncated'], 0)
+
+
+class FallbackPackingTests(TestCase):
+    """Fallback schedules pack tasks into the free intervals of the day's blocks"""
+
+    def setUp(self):
+        self.scheduler = DeepSeekSchedulerService()
+
+    def blocks(self, *spans):
+        return [
+            TimeBlock(id=i, day_of_week=0, start_time=start, end_time=end)
+            for i, (start, end) in enumerate(spans, start=1)
+        ]
+
+    def tasks(self, *titles, due_dates=None):
+        due_dates = due_dates or [None] * len(titles)
+        return {i: Task(id=i, title=title, due_date=due) for i, (title, due) in enumerate(zip(titles, due_dates), start=1)}
+
+    def schedule(self, blocks, tasks_by_id, strategy, must=None, should=()):
+        must = list(tasks_by_id) if must is None else must
+        buckets = {'must': [{'id': task_id} for task_id in must], 'should': [{'id': task_id} for task_id in should]}
+        result = self.scheduler.get_fallback_schedule(None, date(2025, 9, 8), blocks, buckets, strategy, tasks_by_id)
+        return [(item['task_id'], item['scheduled_start'], item['scheduled_end']) for item in result['schedule']]
+
+    def test_first_fit_takes_the_earliest_slot(self):
+        blocks = self.blocks((time(9, 0), time(12, 0)), (time(14, 0), time(15, 10)))
+        self.assertEqual(
+            self.schedule(blocks, self.tasks('Read chapter 4'), FIRST_FIT),
+            [(1, '09:00', '10:00')]
+        )
+
+    def test_best_fit_keeps_long_slots_for_long_tasks(self):
+        blocks = self.blocks((time(9, 0), time(12, 0)), (time(14, 0), time(15, 10)))
+        tasks_by_id = self.tasks('Read chapter 4', 'Final exam revision')
+        self.assertEqual(
+            self.schedule(blocks, tasks_by_id, BEST_FIT),
+            [(1, '14:00', '15:00'), (2, '09:00', '12:00')]
+        )
+        # first fit spends the morning on the short task and has nowhere left for the exam
+        self.assertEqual(self.schedule(blocks, tasks_by_id, FIRST_FIT), [(1, '09:00', '10:00')])
+
+    def test_edf_places_the_nearest_deadline_first(self):
+        now = timezone.now()
+        blocks = self.blocks((time(9, 0), time(11, 0)))
+        tasks_by_id = self.tasks(
+            'Read chapter 4', 'Read chapter 5', 'Read chapter 6',
+            due_dates=[now + timedelta(days=3), None, now + timedelta(days=1)]
+        )
+        self.assertEqual(
+            self.schedule(blocks, tasks_by_id, EARLIEST_DEADLINE, must=[1, 2], should=[3]),
+            [(1, '09:00', '10:00')]
+        )
+        self.assertEqual(
+            self.schedule(blocks, tasks_by_id, EARLIEST_DEADLINE, must=[2, 1, 3]),
+            [(3, '09:00', '10:00')]
+        )
+        self.assertEqual(
+            self.schedule(blocks, tasks_by_id, FIRST_FIT, must=[2, 1, 3]),
+            [(2, '09:00', '10:00')]
+        )
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.schedule(self.blocks((time(9, 0), time(10, 0))), self.tasks('Read chapter 4'), 'worst_fit')
+
+    def test_overnight_blocks_run_past_midnight(self):
+        overnight, = self.blocks((time(22, 0), time(1, 0)))
+        self.assertEqual(block_span(overnight), (22 * 60, 25 * 60))
+        whole_day, = self.blocks((time(6, 0), time(6, 0)))
+        self.assertEqual(block_span(whole_day), (6 * 60, 30 * 60))
+
+        tasks_by_id = self.tasks('Read chapter 4', 'Weekly quiz', 'Read chapter 5')
+        self.assertEqual(
+            self.schedule([overnight], tasks_by_id, FIRST_FIT),
+            [(1, '22:00', '23:00'), (2, '23:10', '23:55')]
+        )
+        # the quiz ends at 23:55; the 00:05-01:00 remainder is too short for another hour
+        index = BlockIndex([overnight])
+        self.assertEqual(index.find(time(23, 10), time(23, 55)), overnight)
+        self.assertEqual(index.find(time(0, 5), time(0, 50)), overnight)
+        self.assertEqual(index.find(time(23, 30), time(0, 30)), overnight)
+        self.assertIsNone(index.find(time(0, 30), time(1, 30)))
+
+    def test_free_list_never_double_books(self):
+        blocks = self.blocks((time(8, 0), time(12, 0)), (time(13, 0), time(17, 0)), (time(22, 0), time(1, 0)))
+        for strategy in (FIRST_FIT, BEST_FIT):
+            with self.subTest(strategy=strategy):
+                free_list = FreeList(blocks)
+                placed = []
+                for minutes in [45, 120, 60, 90, 30, 180, 75, 60, 45, 240]:
+                    interval = free_list.find(minutes, strategy)
+                    if interval is None:
+                        continue
+                    free_list.allocate(interval, minutes)
+                    placed.append((interval[0], interval[0] + minutes))
+                placed.sort()
+                self.assertTrue(all(end <= next_start for (_, end), (next_start, _) in zip(placed, placed[1:])))
+                total = sum(end - start for start, end in map(block_span, blocks))
+                self.assertEqual(free_list.remaining_minutes(), total - sum(end - start for start, end in placed))
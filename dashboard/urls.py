@@ -27,6 +27,9 @@ urlpatterns = [
     path('time-blocks/delete/<int:block_id>/', views.delete_time_block, name='delete_time_block'),
     path('time-blocks/edit/<int:block_id>/', views.edit_time_block, name='edit_time_block'),
     path('schedule/generate/', views.generate_schedule, name='generate_schedule'),
+    path('schedule/generate-week/', views.generate_week_schedule, name='generate_week_schedule'),
+    path('schedule/jobs/<uuid:job_id>/', views.schedule_job_status, name='schedule_job_status'),
+    path('schedule/status/', views.scheduler_status, name='scheduler_status'),
     path('schedule/view/<int:year>/<int:month>/<int:day>/', views.view_schedule, name='view_schedule'),
     path('schedule/history/', views.schedule_history, name='schedule_history'),
     path('custom-schedule/', views.create_custom_schedule, name='create_custom_schedule'),
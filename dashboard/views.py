@@ -4,6 +4,7 @@ from django.contrib import messages
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.http import JsonResponse
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from datetime import timedelta, datetime, date
 from tasks.models import Task, TimeBlock
@@ -11,8 +12,11 @@ from .daily_routine import daily_routine
 from priority_analyzer.signals import MoSCoWCacheService
 from .moscow_matrix import moscow_matrix
 from .focus_timer import focus_timer
-from .models import ScheduledTask, DailySchedule
-from .ai_scheduler import DeepSeekSchedulerService
+from .models import ScheduledTask, DailySchedule, ScheduleGenerationJob
+from .schedule_jobs import enqueue_schedule_job
+from .week_planner import generate_week_schedule as plan_week
+from .llm_guard import llm_breaker, llm_budget
+from .llm_cache import schedule_response_cache
 import json
 
 
@@ -50,32 +54,11 @@ def dashboard_home(request):
     
     # Get MoSCoW analysis for tasks
     from priority_analyzer.signals import MoSCoWCacheService
-    result = MoSCoWCacheService.get_moscow_analysis(request.user)
-    
-    # Create task details mapping
-    task_details = {}
-    for log_entry in result['decision_log']:
-        task_id = int(log_entry['id'])
-        task_details[task_id] = {
-            'category': log_entry['final'],
-            'score': log_entry['score'],
-            'task_type': log_entry['type'],
-            'importance': log_entry['importance'],
-            'urgency': log_entry['urgency'],
-            'due_in_days': log_entry['due_in_days'],
-            'reasoning': log_entry['matched_rule']
-        }
+    task_details = MoSCoWCacheService.get_task_details(request.user, request)
     
     # Apply MoSCoW analysis to task lists
     def apply_moscow_analysis(task_list):
-        for task in task_list:
-            details = task_details.get(task.id, {})
-            task.moscow_category = details.get('category', 'should')
-            task.moscow_score = details.get('score', 30)
-            task.moscow_task_type = details.get('task_type', 'Regular coursework')
-            task.moscow_reasoning = details.get('reasoning', 'Default classification')
-            task.moscow_due_in_days = details.get('due_in_days')
-        return task_list
+        return MoSCoWCacheService.apply_task_details(task_list, task_details)
     
     recent_tasks = apply_moscow_analysis(list(recent_tasks))
     upcoming_tasks = apply_moscow_analysis(list(upcoming_tasks))
@@ -434,7 +417,7 @@ def edit_time_block(request, block_id):
 
 @login_required
 def generate_schedule(request):
-    """Generate AI-powered daily schedule"""
+    """Queue AI-powered daily schedule generation; the client polls schedule_job_status"""
     if request.method == 'POST':
         target_date_str = request.POST.get('target_date')
         
@@ -442,50 +425,13 @@ def generate_schedule(request):
             # Parse target date
             target_date = datetime.strptime(target_date_str, '%Y-%m-%d').date()
             
-            # Check if schedule already exists
-            existing_schedule = DailySchedule.objects.filter(
-                user=request.user,
-                date=target_date
-            ).first()
-            
-            if existing_schedule:
-                # Delete existing schedule and regenerate
-                ScheduledTask.objects.filter(user=request.user, scheduled_date=target_date).delete()
-                existing_schedule.delete()
-            
-            # Initialize AI scheduler
-            scheduler = DeepSeekSchedulerService()
+            # Generation (LLM call + fallback) runs on a background worker
+            job = enqueue_schedule_job(request.user, target_date)
             
-            try:
-                # Generate schedule (now includes intelligent fallback)
-                daily_schedule, scheduled_tasks = scheduler.generate_daily_schedule(request.user, target_date)
-                
-                # Prepare success message
-                if hasattr(daily_schedule, 'ai_response') and 'Fallback scheduling' in daily_schedule.ai_response:
-                    success_message = f'AI scheduling unavailable (rate limit), used intelligent fallback. Generated optimized schedule for {len(scheduled_tasks)} tasks.'
-                else:
-                    success_message = f'Successfully generated AI-powered schedule for {target_date.strftime("%B %d, %Y")}! Scheduled {len(scheduled_tasks)} tasks with focus timer support.'
-                
-                # Return JSON response for AJAX requests
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse({
-                        'success': True,
-                        'message': success_message,
-                        'redirect_url': f'/dashboard/schedule/view/{target_date.year}/{target_date.month}/{target_date.day}/'
-                    })
-                else:
-                    messages.success(request, success_message)
-                    return redirect('dashboard:view_schedule', year=target_date.year, month=target_date.month, day=target_date.day)
-                
-            except Exception as e:
-                error_message = f'Error generating schedule: {str(e)}'
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse({
-                        'success': False,
-                        'error': error_message
-                    })
-                else:
-                    messages.error(request, error_message)
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse(schedule_job_payload(job), status=202)
+            else:
+                messages.info(request, f'Generating your schedule for {target_date.strftime("%B %d, %Y")}. Refresh in a moment to see it.')
         
         except Exception as e:
             error_message = f'Error processing request: {str(e)}'
@@ -500,6 +446,80 @@ def generate_schedule(request):
     return redirect('dashboard:daily_routine')
 
 
+@login_required
+@require_http_methods(["POST"])
+def generate_week_schedule(request):
+    """Plan the seven days starting at week_start (default: today) in one pass"""
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    try:
+        week_start_str = request.POST.get('week_start')
+        week_start = datetime.strptime(week_start_str, '%Y-%m-%d').date() if week_start_str else timezone.localdate()
+        
+        planned = plan_week(request.user, week_start)
+    except Exception as e:
+        error_message = f'Error planning week: {str(e)}'
+        if is_ajax:
+            return JsonResponse({'success': False, 'error': error_message})
+        messages.error(request, error_message)
+        return redirect('dashboard:daily_routine')
+    
+    total = sum(len(scheduled_tasks) for _, scheduled_tasks in planned)
+    message = f'Planned {total} tasks across {len(planned)} days starting {week_start.strftime("%B %d, %Y")}.'
+    if is_ajax:
+        return JsonResponse({
+            'success': True,
+            'message': message,
+            'days': [
+                {
+                    'date': daily_schedule.date.isoformat(),
+                    'scheduled_count': len(scheduled_tasks),
+                    'url': reverse('dashboard:view_schedule', args=[daily_schedule.date.year, daily_schedule.date.month, daily_schedule.date.day]),
+                }
+                for daily_schedule, scheduled_tasks in planned
+            ],
+        })
+    messages.success(request, message)
+    return redirect('dashboard:daily_routine')
+
+
+def schedule_job_payload(job):
+    """JSON body describing a schedule generation job"""
+    target_date = job.target_date
+    payload = {
+        'success': job.status != 'failed',
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': reverse('dashboard:schedule_job_status', args=[job.id]),
+    }
+    if job.status == 'succeeded':
+        payload.update({
+            'message': job.message,
+            'scheduled_count': job.scheduled_count,
+            'used_fallback': job.used_fallback,
+            'redirect_url': f'/dashboard/schedule/view/{target_date.year}/{target_date.month}/{target_date.day}/'
+        })
+    elif job.status == 'failed':
+        payload['error'] = job.error
+    return payload
+
+
+@login_required
+def schedule_job_status(request, job_id):
+    """Poll endpoint for a schedule generation job"""
+    job = get_object_or_404(ScheduleGenerationJob, id=job_id, user=request.user)
+    return JsonResponse(schedule_job_payload(job))
+
+
+@login_required
+def scheduler_status(request):
+    """AI scheduler health: circuit breaker state, rolling error rate, request budget and response cache"""
+    return JsonResponse({
+        'circuit_breaker': llm_breaker.state(),
+        'rate_budget': llm_budget.state(),
+        'response_cache': schedule_response_cache.stats(),
+    })
+
+
 @login_required
 def view_schedule(request, year, month, day):
     """View a specific day's schedule"""
@@ -566,21 +586,7 @@ def view_schedule(request, year, month, day):
         ).order_by('priority', 'due_date')
         
         # Apply MoSCoW analysis to tasks
-        result = MoSCoWCacheService.get_moscow_analysis(request.user)
-        
-        # Create task details mapping
-        task_details = {}
-        for log_entry in result['decision_log']:
-            task_id = int(log_entry['id'])
-            task_details[task_id] = {
-                'category': log_entry['final'],
-                'score': log_entry['score'],
-                'task_type': log_entry['type'],
-                'importance': log_entry['importance'],
-                'urgency': log_entry['urgency'],
-                'due_in_days': log_entry['due_in_days'],
-                'reasoning': log_entry['matched_rule']
-            }
+        task_details = MoSCoWCacheService.get_task_details(request.user, request)
         
         # Apply MoSCoW analysis to available tasks
         available_tasks_list = list(available_tasks)
@@ -0,0 +1,129 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from tasks.models import Task, TimeBlock
+from priority_analyzer.signals import MoSCoWCacheService
+from .models import ScheduledTask, DailySchedule
+from .ai_scheduler import DeepSeekSchedulerService
+from .scheduling import FreeList, STRATEGIES, FIRST_FIT
+
+
+WEEK_DAYS = 7
+
+
+class WeekPlanner:
+    """
+    Plans seven consecutive days in one pass.
+
+    Time blocks for every weekday, the MoSCoW analysis and the MUST/SHOULD tasks are
+    loaded once. Each task is placed on at most one day, never after its due date:
+    MUST tasks on the earliest day with room, SHOULD tasks on the least loaded day.
+    The whole week is written in one transaction.
+    """
+
+    BUFFER_MINUTES = 10
+
+    def __init__(self, user, start_date, strategy=None, scheduler=None):
+        self.user = user
+        self.start_date = start_date
+        self.dates = [start_date + timedelta(days=offset) for offset in range(WEEK_DAYS)]
+        self.strategy = strategy or getattr(settings, 'SCHEDULER_FALLBACK_STRATEGY', FIRST_FIT)
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown fallback scheduling strategy: {self.strategy}")
+        self.scheduler = scheduler or DeepSeekSchedulerService()
+
+    def load(self):
+        """Blocks for all weekdays (one query) and the candidate tasks (one query)"""
+        self.blocks_by_day = defaultdict(list)
+        for block in TimeBlock.objects.filter(user=self.user, is_available=True).order_by('start_time'):
+            self.blocks_by_day[block.day_of_week].append(block)
+
+        buckets = MoSCoWCacheService.get_moscow_analysis(self.user)['buckets']
+        must_ids = [int(task_data['id']) for task_data in buckets.get('must', [])]
+        should_ids = [int(task_data['id']) for task_data in buckets.get('should', [])]
+        tasks_by_id = Task.objects.in_bulk(must_ids + should_ids)
+
+        self.candidates = [(tasks_by_id[task_id], 95, True) for task_id in must_ids if task_id in tasks_by_id]
+        self.candidates += [(tasks_by_id[task_id], 70, False) for task_id in should_ids if task_id in tasks_by_id]
+        # MUST before SHOULD, then earliest deadline first (tasks without one go last)
+        self.candidates.sort(key=lambda c: (not c[2], c[0].due_date is None, c[0].due_date.timestamp() if c[0].due_date else 0))
+        self.tasks_by_id = tasks_by_id
+
+    def last_day_index(self, task):
+        """Index of the last day the task may go on (overdue tasks may go on any day, earliest first)"""
+        if task.due_date is None:
+            return WEEK_DAYS - 1
+        due_date = timezone.localtime(task.due_date).date()
+        if due_date < self.start_date:
+            return WEEK_DAYS - 1
+        return min((due_date - self.start_date).days, WEEK_DAYS - 1)
+
+    def plan(self):
+        """Schedule results (fallback format) for every day that has time blocks, keyed by date"""
+        self.load()
+        free_lists = {
+            day: FreeList(self.blocks_by_day[day.weekday()])
+            for day in self.dates if self.blocks_by_day[day.weekday()]
+        }
+        placed = defaultdict(list)  # date -> [(start minute, item, is_must)]
+
+        for task, priority_score, is_must in self.candidates:
+            estimated_minutes = self.scheduler._estimate_task_duration(task)
+            days = [day for day in self.dates[:self.last_day_index(task) + 1] if day in free_lists]
+
+            fits = []
+            for day in days:
+                interval = free_lists[day].find(estimated_minutes, self.strategy)
+                if interval is not None:
+                    fits.append((day, interval))
+            if not fits:
+                continue
+
+            if is_must:
+                day, interval = fits[0]
+            else:
+                day, interval = max(fits, key=lambda fit: free_lists[fit[0]].remaining_minutes())
+
+            item = self.scheduler.place_task(
+                free_lists[day], interval, task, estimated_minutes, priority_score, is_must, self.BUFFER_MINUTES
+            )
+            placed[day].append((interval[0], item, is_must))
+
+        results = {}
+        for day, free_list in free_lists.items():
+            entries = sorted(placed[day], key=lambda entry: entry[0])
+            must_scheduled = sum(1 for _, _, is_must in entries if is_must)
+            results[day] = self.scheduler.fallback_result(
+                [item for _, item, _ in entries], must_scheduled, len(entries) - must_scheduled,
+                free_list.remaining_minutes(),
+                f"Weekly planning ({self.strategy}): {len(entries)} tasks for {day.strftime('%A')}, each task planned once across the week."
+            )
+        return results
+
+    def save(self, results):
+        """
+        Replace the week's schedules with the planned ones in one transaction.
+        Returns [(daily_schedule, scheduled_tasks)] in date order.
+        """
+        planned = []
+        for day in sorted(results):
+            blocks = self.blocks_by_day[day.weekday()]
+            planned.append((
+                self.scheduler.build_daily_schedule(self.user, day, blocks, results[day], "Weekly planning"),
+                self.scheduler.build_scheduled_tasks(self.user, day, blocks, results[day], self.tasks_by_id),
+            ))
+
+        with transaction.atomic():
+            ScheduledTask.objects.filter(user=self.user, scheduled_date__in=self.dates).delete()
+            DailySchedule.objects.filter(user=self.user, date__in=self.dates).delete()
+            DailySchedule.objects.bulk_create([daily_schedule for daily_schedule, _ in planned])
+            ScheduledTask.objects.bulk_create([task for _, scheduled_tasks in planned for task in scheduled_tasks])
+        return planned
+
+
+def generate_week_schedule(user, start_date, strategy=None):
+    """Plan and save the seven days starting at start_date"""
+    planner = WeekPlanner(user, start_date, strategy=strategy)
+    return planner.save(planner.plan())
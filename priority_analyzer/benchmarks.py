@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+
+FILLER_WORDS = [
+    'the', 'lecture', 'covers', 'dynamic', 'programming', 'and', 'graph', 'theory',
+    'with', 'several', 'worked', 'examples', 'from', 'chapter', 'four', 'five',
+    'please', 'read', 'carefully', 'before', 'class', 'notes', 'group', 'meeting',
+]
+
+# Fixed clock for reproducible corpora and golden outputs
+BENCHMARK_NOW = datetime(2025, 9, 4, 10, 0, tzinfo=dt_timezone.utc)
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_golden.json')
+
+ESTIMATED_SIZES = [None, None, None, 'small', 'medium', 'large']
+COURSE_WEIGHTS = [None, None, None, 0.1, 0.2, 0.3, 0.5]
+
+
+def generate_texts(planner, count, seed, max_description_words=200):
+    """Generate (title, description) pairs with a realistic mix of keyword hits"""
+    rng = random.Random(seed)
+    keywords = [keyword for keywords in planner.task_type_keywords.values() for keyword in keywords]
+    texts = []
+    for _ in range(count):
+        title = ' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(2, 6)))
+        description = ' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(0, max_description_words)))
+        # ~70% of tasks mention at least one keyword, sometimes several
+        for _ in range(rng.choice([0, 0, 0, 1, 1, 1, 1, 2, 2, 3])):
+            keyword = rng.choice(keywords)
+            if rng.random() < 0.3:
+                keyword = keyword.title()
+            if rng.random() < 0.5:
+                title = f"{title} {keyword}"
+            else:
+                description = f"{description} {keyword}"
+        texts.append((title, description))
+    return texts
+
+
+def generate_corpus(planner, count, seed, now=BENCHMARK_NOW):
+    """
+    Task dicts in analyze_tasks input format: mixed keyword hits, ~15% without a due date,
+    the rest spread from two weeks overdue to two months out (with some exact day boundaries).
+    """
+    rng = random.Random(seed + 1)
+    tasks = []
+    for i, (title, description) in enumerate(generate_texts(planner, count, seed, max_description_words=40)):
+        roll = rng.random()
+        if roll < 0.15:
+            due_at = None
+        elif roll < 0.25:
+            due_at = (now + timedelta(days=rng.randint(-3, 15))).isoformat()
+        else:
+            due_at = (now + timedelta(minutes=rng.randint(-14 * 1440, 60 * 1440))).isoformat()
+        tasks.append({
+            'id': str(i),
+            'title': title,
+            'description': description,
+            'due_at': due_at,
+            'estimated_size': rng.choice(ESTIMATED_SIZES),
+            'course_weight': rng.choice(COURSE_WEIGHTS),
+        })
+    return tasks
+
+
+def digest(items):
+    """SHA-256 of an iterable of JSON-serializable items (order matters)"""
+    sha = hashlib.sha256()
+    for item in items:
+        sha.update(json.dumps(item, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        sha.update(b'\n')
+    return sha.hexdigest()
+
+
+def result_digest(result):
+    """Digest of an analyze_tasks result (generated_at, decision_log, then every bucket)"""
+    def items():
+        yield result['generated_at']
+        yield from result['decision_log']
+        for category in sorted(result['buckets']):
+            yield category
+            yield from result['buckets'][category]
+    return digest(items())
+
+
+def golden_key(size, seed):
+    return f'{size}:{seed}'
+
+
+def load_golden():
+    if not os.path.exists(GOLDEN_PATH):
+        return {}
+    with open(GOLDEN_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_golden(golden):
+    with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+        json.dump(golden, f, indent=2, sort_keys=True)
+        f.write('\n')
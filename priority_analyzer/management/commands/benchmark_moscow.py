@@ -0,0 +1,77 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from priority_analyzer.benchmarks import generate_texts
+from priority_analyzer.services import MoSCoWPriorityPlanner, DEFAULT_TASK_TYPE
+
+
+def legacy_classify_task_type(task_type_keywords, title, description=""):
+    """The original nested keyword loop, kept as the benchmark baseline"""
+    text = f"{title} {description}".lower()
+    for task_type, keywords in task_type_keywords.items():
+        for keyword in keywords:
+            if keyword in text:
+                return task_type
+    return DEFAULT_TASK_TYPE
+
+
+class Command(BaseCommand):
+    help = 'Benchmark MoSCoW task type classification against the legacy keyword loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks',
+            type=int,
+            default=10000,
+            help='Number of synthetic tasks to classify (default: 10000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of timed runs; the best run is reported (default: 3)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic corpus'
+        )
+
+    def handle(self, *args, **options):
+        planner = MoSCoWPriorityPlanner()
+        texts = generate_texts(planner, options['tasks'], options['seed'])
+        self.stdout.write(f'Generated {len(texts)} synthetic tasks')
+
+        def timed(classify):
+            best = None
+            for _ in range(max(1, options['repeat'])):
+                start = time.perf_counter()
+                results = [classify(title, description) for title, description in texts]
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            return results, best
+
+        legacy_results, legacy_time = timed(
+            lambda title, description: legacy_classify_task_type(planner.task_type_keywords, title, description)
+        )
+        compiled_results, compiled_time = timed(planner.classify_task_type)
+
+        if legacy_results != compiled_results:
+            mismatches = sum(1 for a, b in zip(legacy_results, compiled_results) if a != b)
+            raise CommandError(f'Compiled matcher disagrees with legacy loop on {mismatches} tasks')
+
+        matcher = planner.keyword_matcher
+        self.stdout.write(
+            f'Keyword table: {len(matcher.table)} keywords '
+            f'(from {sum(len(k) for k in planner.task_type_keywords.values())}), '
+            f'backend: {"aho-corasick" if matcher.automaton is not None else "substring table"}'
+        )
+        for label, elapsed in [
+            ('Legacy loop', legacy_time),
+            ('Compiled matcher', compiled_time),
+        ]:
+            self.stdout.write(
+                f'  {label:<18} {elapsed * 1000:9.2f} ms  '
+                f'({elapsed / len(texts) * 1e6:6.2f} us/task, x{legacy_time / elapsed:.2f})'
+            )
+        self.stdout.write(self.style.SUCCESS('All classifications match the legacy loop'))
@@ -0,0 +1,183 @@
+import gc
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from tasks.models import Task
+from priority_analyzer.benchmarks import (
+    BENCHMARK_NOW, generate_corpus, digest, result_digest, golden_key, load_golden, save_golden,
+)
+from priority_analyzer.services import MoSCoWPriorityPlanner
+
+
+# Stages whose output must equal the analyze_tasks golden result
+ANALYZE_STAGES = ['analyze_tasks', 'analyze_tasks_batch', 'analyze_django_tasks']
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the MoSCoW planner stage by stage on synthetic corpora and '
+        'fail if any output differs from the recorded golden digests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='100,10000,1000000',
+            help='Comma separated corpus sizes (default: 100,10000,1000000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of timed runs per stage; the best run is reported (default: 3)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the synthetic corpora'
+        )
+        parser.add_argument(
+            '--no-memory',
+            action='store_true',
+            help='Skip the (slow) tracemalloc run that measures decision_log memory'
+        )
+        parser.add_argument(
+            '--update-golden',
+            action='store_true',
+            help='Record the current outputs as the golden digests instead of checking them'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of integers')
+
+        planner = MoSCoWPriorityPlanner()
+        golden = load_golden()
+        failures = []
+        unchecked = []
+
+        for size in sizes:
+            key = golden_key(size, options['seed'])
+            digests = self.run_size(planner, size, options)
+
+            if options['update_golden']:
+                golden[key] = digests
+                continue
+
+            expected = golden.get(key)
+            if expected is None:
+                self.stdout.write(self.style.WARNING(
+                    f'  No golden output recorded for {key}; run with --update-golden to record it'
+                ))
+                unchecked.append(size)
+                continue
+            for stage, value in digests.items():
+                if expected.get(stage) != value:
+                    failures.append(f'{stage} ({size} tasks)')
+
+        if options['update_golden']:
+            save_golden(golden)
+            self.stdout.write(self.style.SUCCESS(f'Recorded golden digests for sizes {sizes}'))
+            return
+
+        if failures:
+            raise CommandError(f'Output differs from the golden result: {", ".join(failures)}')
+        if unchecked:
+            self.stdout.write(self.style.WARNING(f'Not checked against golden results: sizes {unchecked}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All stage outputs match the golden results'))
+
+    def run_size(self, planner, size, options):
+        """Time each planner stage on one corpus; returns {stage: digest}"""
+        self.stdout.write(f'Corpus of {size} tasks (seed {options["seed"]})')
+        tasks = generate_corpus(planner, size, options['seed'])
+        tasks_data = {'now': BENCHMARK_NOW.isoformat(), 'timezone': 'UTC', 'tasks': tasks}
+        digests = {}
+
+        def timed(label, func):
+            best = None
+            result = None
+            for _ in range(max(1, options['repeat'])):
+                result = None
+                gc.collect()
+                start = time.perf_counter()
+                result = func()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(
+                f'  {label:<26} {best * 1000:11.2f} ms  ({best / max(size, 1) * 1e6:7.2f} us/task)'
+            )
+            return result
+
+        # 1. Keyword classification
+        task_types = timed('classify_task_type', lambda: [
+            planner.classify_task_type(task['title'], task['description']) for task in tasks
+        ])
+        digests['classify_task_type'] = digest(task_types)
+
+        # 2. Urgency, on pre-parsed due dates and the classified types
+        # (bound as defaults so the names can be freed once timing is done)
+        due_dates = [planner.parse_due_at(task['due_at']) for task in tasks]
+        urgency = timed('calculate_urgency_weight', lambda due_dates=due_dates, task_types=task_types: [
+            planner.calculate_urgency_weight(
+                due_date, task_type, task['estimated_size'], task['course_weight'], now=BENCHMARK_NOW
+            )
+            for due_date, task_type, task in zip(due_dates, task_types, tasks)
+        ])
+        digests['calculate_urgency_weight'] = digest(urgency)
+        del task_types, urgency
+
+        # 3. Full analysis, scalar and batch
+        digests['analyze_tasks'] = result_digest(
+            timed('analyze_tasks', lambda: planner.analyze_tasks(tasks_data, now=BENCHMARK_NOW))
+        )
+        digests['analyze_tasks_batch'] = result_digest(
+            timed('analyze_tasks_batch', lambda: planner.analyze_tasks_batch(tasks_data, now=BENCHMARK_NOW))
+        )
+
+        # 4. Django path on unsaved Task instances
+        task_objects = []
+        for task, due_date in zip(tasks, due_dates):
+            task_object = Task(id=int(task['id']), title=task['title'], description=task['description'], due_date=due_date)
+            task_object.estimated_size = task['estimated_size']
+            task_object.course_weight = task['course_weight']
+            task_objects.append(task_object)
+        del due_dates
+        digests['analyze_django_tasks'] = result_digest(
+            timed(
+                'analyze_django_tasks',
+                lambda task_objects=task_objects: planner.analyze_django_tasks(task_objects, now=BENCHMARK_NOW)
+            )
+        )
+        del task_objects
+
+        mismatched = [stage for stage in ANALYZE_STAGES if digests[stage] != digests['analyze_tasks']]
+        if mismatched:
+            raise CommandError(f'{", ".join(mismatched)} disagree with analyze_tasks on {size} tasks')
+
+        if not options['no_memory']:
+            self.report_memory(planner, tasks_data, size)
+
+        return digests
+
+    def report_memory(self, planner, tasks_data, size):
+        """Peak and retained memory of the analysis result (decision_log and buckets)"""
+        for label, analyze in [
+            ('analyze_tasks', planner.analyze_tasks),
+            ('analyze_tasks_batch', planner.analyze_tasks_batch),
+        ]:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                result = analyze(tasks_data, now=BENCHMARK_NOW)
+                retained, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            del result
+            self.stdout.write(
+                f'  {label + " memory":<26} peak {peak / 2 ** 20:9.1f} MiB, '
+                f'retained {retained / 2 ** 20:9.1f} MiB ({retained / max(size, 1):.0f} B/task)'
+            )
@@ -1,11 +1,19 @@
-from django.core.management.base import BaseCommand
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.db import connections
+from tasks.models import Task
+from priority_analyzer.services import MoSCoWPriorityPlanner
 from priority_analyzer.signals import MoSCoWCacheService
 
 
 class Command(BaseCommand):
-    help = 'Refresh MoSCoW matrix for all users - run daily to handle date changes'
+    help = 'Refresh MoSCoW matrix for all users (cache entries already expire at deadline boundaries)'
     
     def add_arguments(self, parser):
         parser.add_argument(
@@ -18,6 +26,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear all MoSCoW cache entries'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Worker processes for the all-users refresh; 1 runs in-process (default: CPU count)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per database round trip and users per cache.set_many (default: 2000)'
+        )
     
     def handle(self, *args, **options):
         if options['clear_all']:
@@ -54,38 +74,156 @@ class Command(BaseCommand):
                     self.style.ERROR(f'User with ID {options["user_id"]} not found')
                 )
         else:
-            # Refresh for all users with active tasks
-            self.stdout.write('Refreshing MoSCoW matrix for all users with active tasks...')
-            
-            users_with_tasks = User.objects.filter(
-                owned_tasks__status__in=['todo', 'in_progress']
-            ).distinct()
-            
-            total_users = users_with_tasks.count()
-            self.stdout.write(f'Found {total_users} users with active tasks')
-            
-            refreshed_count = 0
-            for user in users_with_tasks:
-                try:
-                    result = MoSCoWCacheService.force_refresh_moscow_analysis(user)
-                    refreshed_count += 1
-                    
-                    # Count tasks in each bucket
+            self.refresh_all_users(options)
+    
+    def refresh_all_users(self, options):
+        """Stream every active task once, group by user and analyze the groups in a process pool"""
+        workers = options['workers'] or 1
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        
+        self.stdout.write('Refreshing MoSCoW matrix for all users with active tasks...')
+        start = time.perf_counter()
+        
+        user_rows = self.load_user_rows(chunk_size)
+        total_users = len(user_rows)
+        total_tasks = sum(len(rows) for rows in user_rows.values())
+        self.stdout.write(
+            f'Found {total_users} users with active tasks '
+            f'(loaded in {time.perf_counter() - start:.1f}s)'
+        )
+        if not total_users:
+            return
+        
+        usernames = {}
+        if options['verbosity'] >= 2:
+            usernames = dict(User.objects.filter(id__in=list(user_rows)).values_list('id', 'username'))
+        
+        jobs = [(user_id, rows) for user_id, rows in user_rows.items()]
+        del user_rows
+        
+        refreshed_count = 0
+        failed_count = 0
+        pending = []
+        analyze_start = time.perf_counter()
+        
+        with self.analyze_pool(workers) as imap:
+            for user_id, result, ttl, error in imap(analyze_user_rows, jobs, max(1, min(64, total_users // (workers * 4)))):
+                if error:
+                    failed_count += 1
+                    self.stdout.write(
+                        self.style.WARNING(f'Failed to refresh MoSCoW matrix for user {user_id}: {error}')
+                    )
+                    continue
+                
+                refreshed_count += 1
+                pending.append((user_id, result, ttl))
+                
+                if usernames:
                     counts = {bucket: len(tasks) for bucket, tasks in result['buckets'].items()}
                     self.stdout.write(
-                        f'  {user.username}: Must: {counts["must"]}, '
+                        f'  {usernames.get(user_id, user_id)}: Must: {counts["must"]}, '
                         f'Should: {counts["should"]}, Could: {counts["could"]}, '
                         f'Won\'t: {counts["wont"]}'
                     )
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'Failed to refresh MoSCoW matrix for {user.username}: {str(e)}'
-                        )
-                    )
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully refreshed MoSCoW matrix for {refreshed_count}/{total_users} users'
-                )
+                
+                if len(pending) >= chunk_size:
+                    self.store_results(pending)
+                    pending = []
+                    self.report_progress(refreshed_count + failed_count, total_users, analyze_start)
+        
+        if pending:
+            self.store_results(pending)
+        
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully refreshed MoSCoW matrix for {refreshed_count}/{total_users} users '
+                f'({total_tasks} task rows) in {elapsed:.1f}s '
+                f'[{refreshed_count / elapsed:.0f} users/s, {total_tasks / elapsed:.0f} rows/s, {workers} workers]'
             )
+        )
+    
+    def load_user_rows(self, chunk_size):
+        """
+        {user_id: [row, ...]} for every active task, streamed in one query.
+        A task is listed under its owner and, if different, its assignee.
+        """
+        planner = MoSCoWPriorityPlanner()
+        tasks = Task.objects.filter(status__in=['todo', 'in_progress']).values(
+            'id', 'title', 'due_date', 'content_task_type', 'user_id', 'assigned_to_id'
+        )
+        
+        user_rows = defaultdict(list)
+        chunk = []
+        
+        def flush(chunk):
+            # Backfill tasks saved before the classification was persisted
+            MoSCoWCacheService._classify_missing(planner, chunk)
+            for row in chunk:
+                owner_id = row.pop('user_id')
+                assignee_id = row.pop('assigned_to_id')
+                user_rows[owner_id].append(row)
+                if assignee_id and assignee_id != owner_id:
+                    user_rows[assignee_id].append(row)
+        
+        for row in tasks.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+        
+        return user_rows
+    
+    @contextmanager
+    def analyze_pool(self, workers):
+        """Yield an imap(func, iterable, chunksize) running in-process or in a process pool"""
+        if workers <= 1:
+            yield lambda func, iterable, chunksize: map(func, iterable)
+            return
+        
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+        with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+            yield pool.imap_unordered
+    
+    def store_results(self, pending):
+        """Write a batch of results with one set_many per distinct timeout"""
+        by_ttl = defaultdict(dict)
+        stale = {}
+        for user_id, result, ttl in pending:
+            by_ttl[ttl][MoSCoWCacheService.cache_key(user_id)] = result
+            stale[MoSCoWCacheService.stale_cache_key(user_id)] = result
+        
+        for ttl, values in by_ttl.items():
+            cache.set_many(values, ttl)
+        cache.set_many(stale, MoSCoWCacheService.MAX_CACHE_TTL)
+    
+    def report_progress(self, done, total, start):
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed if elapsed else 0
+        remaining = (total - done) / rate if rate else 0
+        self.stdout.write(
+            f'  {done}/{total} users ({done / total:.0%}), '
+            f'{rate:.0f} users/s, ~{remaining:.0f}s remaining'
+        )
+
+
+def init_worker():
+    """Make sure Django is configured in spawned (non-fork) worker processes"""
+    import django
+    django.setup()
+
+
+def analyze_user_rows(job):
+    """Pool worker: (user_id, rows) -> (user_id, result, ttl, error)"""
+    user_id, rows = job
+    try:
+        planner = MoSCoWPriorityPlanner()
+        batch = planner.analyze_task_rows(rows)
+        return user_id, batch.to_result(), MoSCoWCacheService.cache_ttl(batch), None
+    except Exception as e:
+        return user_id, None, None, str(e)
@@ -1,9 +1,256 @@
+import hashlib
 import json
 import math
-from datetime import datetime, timezone as dt_timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+import numpy as np
 from django.utils import timezone
 from django.conf import settings
 
+# Optional C implementation of the keyword automaton
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+DEFAULT_TASK_TYPE = 'Regular coursework'
+
+# Bump when the keyword rules change so persisted classifications are recomputed on save
+CLASSIFIER_VERSION = 1
+
+
+def content_hash(title, description):
+    """Hash of the text that drives task type classification"""
+    text = f"{CLASSIFIER_VERSION}\x00{title}\x00{description or ''}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class KeywordMatcher:
+    """
+    Precompiled first-match classifier for the ordered task type keyword rules.
+    
+    The ordered mapping is flattened once into a single (keyword, task_type) table.
+    A keyword that contains an earlier keyword (from its own or a higher priority type)
+    can never decide the result, so it is dropped. When pyahocorasick is installed the
+    table is compiled into an Aho-Corasick automaton and the text is scanned once;
+    otherwise the table is checked in order with substring tests.
+    """
+    
+    def __init__(self, task_type_keywords, default=DEFAULT_TASK_TYPE):
+        self.default = default
+        self.table = self._compile(task_type_keywords)
+        self.top_type = self.table[0][1] if self.table else None
+        self.automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self.automaton = ahocorasick.Automaton()
+            for rank, (keyword, task_type) in enumerate(self.table):
+                self.automaton.add_word(keyword, (rank, task_type))
+            self.automaton.make_automaton()
+    
+    @staticmethod
+    def _compile(task_type_keywords):
+        table = []
+        for task_type, keywords in task_type_keywords:
+            for keyword in keywords:
+                # Any text containing this keyword also contains an earlier one
+                if any(earlier in keyword for earlier, _ in table):
+                    continue
+                table.append((keyword, task_type))
+        return tuple(table)
+    
+    def classify(self, title, description=""):
+        text = f"{title} {description}".lower()
+        
+        if self.automaton is not None:
+            # Table ranks follow type priority, so the lowest rank seen wins
+            best = None
+            for _, (rank, task_type) in self.automaton.iter(text):
+                if best is None or rank < best[0]:
+                    best = (rank, task_type)
+                    if task_type == self.top_type:
+                        break
+            return best[1] if best else self.default
+        
+        for keyword, task_type in self.table:
+            if keyword in text:
+                return task_type
+        return self.default
+
+
+@lru_cache(maxsize=None)
+def _get_keyword_matcher(frozen_keywords):
+    """Build (once per process) the matcher for a frozen keyword mapping"""
+    return KeywordMatcher(frozen_keywords)
+
+
+def get_keyword_matcher(task_type_keywords):
+    """Return the shared KeywordMatcher for an ordered {task_type: [keywords]} mapping"""
+    frozen = tuple((task_type, tuple(keywords)) for task_type, keywords in task_type_keywords.items())
+    return _get_keyword_matcher(frozen)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Size codes used by the batch path (anything else counts as unknown/medium)
+BATCH_SIZE_CODES = {'small': 1, 'large': 2}
+
+MOSCOW_CATEGORIES = ['must', 'should', 'could', 'wont']
+
+# Category for each MoSCoW rule code produced by analyze_batch (in rule order)
+BATCH_RULE_CATEGORIES = np.array([0, 0, 0, 1, 1, 3, 0, 1, 2, 3], dtype=np.int8)
+
+# due_in_days values whose next step down (d -> d - 1) can change urgency, rule/bucket
+# or the due label shown in templates; see calculate_urgency_weight and apply_moscow_rules
+DEADLINE_BOUNDARY_DAYS = (14, 8, 4, 3, 2, 1, 0)
+
+MICROSECONDS_PER_DAY = 24 * 3600 * 10 ** 6
+
+
+def datetime_to_epoch_us(value):
+    """Exact microseconds since the epoch for an aware datetime"""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def format_matched_rule(rule_code, score):
+    """Human readable rule text for a batch rule code (matches apply_moscow_rules)"""
+    if rule_code == 0:
+        return 'Rule 1: Hard deadline within 24h → must'
+    if rule_code == 1:
+        return 'Rule 2: Major academic due ≤2 days → must'
+    if rule_code == 2:
+        return 'Rule 3: Regular coursework due ≤1 days → must'
+    if rule_code == 3:
+        return 'Rule 4: Regular coursework due ≤7 days → should'
+    if rule_code == 4:
+        return 'Rule 5: Supplementary due ≤1 day → should'
+    if rule_code == 5:
+        return 'Rule 6: Non-academic → wont'
+    if rule_code == 6:
+        return f'Threshold: score {score} ≥ 43 → must'
+    if rule_code == 7:
+        return f'Threshold: score {score} 38-42 → should'
+    if rule_code == 8:
+        return f'Threshold: score {score} 28-37 → could'
+    return f'Threshold: score {score} ≤ 27 → wont'
+
+
+class MoSCoWBatch:
+    """
+    Column-oriented MoSCoW analysis produced by MoSCoWPriorityPlanner.analyze_batch.
+    Arrays stay as NumPy columns; dicts are only built by to_result() and details().
+    """
+    
+    def __init__(self, planner, now, ids, titles, due_at, type_codes, importance, urgency,
+                 has_due, due_in_days, score, rule_codes, category_codes):
+        self.planner = planner
+        self.now = now
+        self.ids = ids
+        self.due_at = due_at
+        self.titles = titles
+        self.type_codes = type_codes
+        self.importance = importance
+        self.urgency = urgency
+        self.has_due = has_due
+        self.due_in_days = due_in_days
+        self.score = score
+        self.rule_codes = rule_codes
+        self.category_codes = category_codes
+    
+    def __len__(self):
+        return len(self.score)
+    
+    def categories(self):
+        """Final MoSCoW category for each row"""
+        return [MOSCOW_CATEGORIES[code] for code in self.category_codes.tolist()]
+    
+    def seconds_until_next_boundary(self, boundary_days=DEADLINE_BOUNDARY_DAYS):
+        """
+        Seconds from self.now until the first row's due_in_days steps below one of
+        boundary_days, i.e. the next instant any bucket could change.
+        Returns None if no row has an upcoming boundary.
+        """
+        due_us = self.due_at[self.has_due].astype(np.int64)
+        if not len(due_us):
+            return None
+        
+        # due_in_days drops from b to b - 1 right after now passes due - b days
+        offsets = np.asarray(boundary_days, dtype=np.int64) * MICROSECONDS_PER_DAY
+        now_us = datetime_to_epoch_us(self.now)
+        remaining = (due_us[:, None] - offsets[None, :] - now_us).ravel()
+        remaining = remaining[remaining >= 0]
+        if not len(remaining):
+            return None
+        return math.ceil(int(remaining.min()) / 10 ** 6)
+    
+    def details(self):
+        """Per-row detail dicts in input order (the shape of Task.get_moscow_details())"""
+        task_types = self.planner.task_types
+        rows = zip(
+            self.type_codes.tolist(), self.importance.tolist(), self.urgency.tolist(),
+            self.has_due.tolist(), self.due_in_days.tolist(), self.score.tolist(),
+            self.rule_codes.tolist(), self.category_codes.tolist()
+        )
+        return [
+            {
+                'category': MOSCOW_CATEGORIES[category_code],
+                'score': score,
+                'task_type': task_types[type_code],
+                'importance': importance,
+                'urgency': urgency,
+                'due_in_days': due_in_days if has_due else None,
+                'reasoning': format_matched_rule(rule_code, score)
+            }
+            for type_code, importance, urgency, has_due, due_in_days, score, rule_code, category_code in rows
+        ]
+    
+    def to_result(self):
+        """Build the analyze_tasks result ({generated_at, buckets, decision_log})"""
+        count = len(self)
+        ids = self.ids if self.ids is not None else [''] * count
+        titles = self.titles if self.titles is not None else [''] * count
+        task_types = self.planner.task_types
+        
+        buckets = {category: [] for category in MOSCOW_CATEGORIES}
+        decision_log = []
+        
+        rows = zip(
+            ids, titles, self.type_codes.tolist(), self.importance.tolist(), self.urgency.tolist(),
+            self.has_due.tolist(), self.due_in_days.tolist(), self.score.tolist(),
+            self.rule_codes.tolist(), self.category_codes.tolist()
+        )
+        for task_id, title, type_code, importance, urgency, has_due, due_in_days, score, rule_code, category_code in rows:
+            if not has_due:
+                due_in_days = None
+            final_category = MOSCOW_CATEGORIES[category_code]
+            buckets[final_category].append({
+                'id': task_id,
+                'title': title,
+                'due_in_days': due_in_days,
+                'score': score
+            })
+            decision_log.append({
+                'id': task_id,
+                'type': task_types[type_code],
+                'importance': importance,
+                'urgency': urgency,
+                'due_in_days': due_in_days,
+                'matched_rule': format_matched_rule(rule_code, score),
+                'score': score,
+                'final': final_category
+            })
+        
+        MoSCoWPriorityPlanner._sort_buckets(buckets)
+        
+        return {
+            'generated_at': self.now.isoformat(),
+            'buckets': buckets,
+            'decision_log': decision_log
+        }
+
 
 class MoSCoWPriorityPlanner:
     """
@@ -45,24 +292,31 @@ class MoSCoWPriorityPlanner:
             'Supplementary': 2,
             'Non-academic': 1
         }
+        
+        # Compiled keyword table shared by every planner in the process
+        self.keyword_matcher = get_keyword_matcher(self.task_type_keywords)
+        
+        # Integer codes used by the batch (array) path
+        self.task_types = list(self.task_type_keywords)
+        self.type_codes = {task_type: code for code, task_type in enumerate(self.task_types)}
     
     def classify_task_type(self, title, description=""):
         """
         Deterministically classify task into one type using first matching keyword.
         Returns task type based on ordered keyword matching.
         """
-        text = f"{title} {description}".lower()
-        
-        # Check keywords in order of priority
-        for task_type, keywords in self.task_type_keywords.items():
-            for keyword in keywords:
-                if keyword in text:
-                    return task_type
-        
-        # Default to Regular coursework if no keywords match
-        return 'Regular coursework'
+        # Defaults to Regular coursework if no keywords match
+        return self.keyword_matcher.classify(title, description)
+    
+    def classify_content(self, title, description=""):
+        """
+        Content-derived part of the analysis: (task_type, importance).
+        Depends only on title and description, so it can be persisted per task.
+        """
+        task_type = self.classify_task_type(title, description)
+        return task_type, self.importance_weights[task_type]
     
-    def calculate_urgency_weight(self, due_date, task_type, estimated_size=None, course_weight=None):
+    def calculate_urgency_weight(self, due_date, task_type, estimated_size=None, course_weight=None, now=None):
         """
         Calculate urgency weight based on time to deadline with adjustments.
         """
@@ -73,7 +327,8 @@ class MoSCoWPriorityPlanner:
             if timezone.is_naive(due_date):
                 due_date = timezone.make_aware(due_date)
             
-            now = timezone.now()
+            if now is None:
+                now = timezone.now()
             time_diff = due_date - now
             
             # Calculate days more accurately - same day should be 0 days
@@ -174,10 +429,7 @@ class MoSCoWPriorityPlanner:
             ]
         }
         """
-        if now is None:
-            now = timezone.now()
-        elif isinstance(now, str):
-            now = datetime.fromisoformat(now.replace('Z', '+00:00'))
+        now = self._resolve_now(now)
         
         buckets = {
             'must': [],
@@ -197,12 +449,7 @@ class MoSCoWPriorityPlanner:
             course_weight = task_data.get('course_weight')
             
             # Parse due date
-            due_date = None
-            if due_at:
-                try:
-                    due_date = datetime.fromisoformat(due_at.replace('Z', '+00:00'))
-                except:
-                    due_date = None
+            due_date = self.parse_due_at(due_at)
             
             # 1. Classify task type
             task_type = self.classify_task_type(title, description)
@@ -212,7 +459,7 @@ class MoSCoWPriorityPlanner:
             
             # 3. Calculate urgency
             urgency, due_in_days = self.calculate_urgency_weight(
-                due_date, task_type, estimated_size, course_weight
+                due_date, task_type, estimated_size, course_weight, now=now
             )
             
             # 4. Calculate score
@@ -243,21 +490,198 @@ class MoSCoWPriorityPlanner:
                 'final': final_category
             })
         
-        # Sort buckets for consistency (tie-breaking)
+        self._sort_buckets(buckets)
+        
+        return {
+            'generated_at': now.isoformat(),
+            'buckets': buckets,
+            'decision_log': decision_log
+        }
+    
+    @staticmethod
+    def _resolve_now(now):
+        """Return an aware 'now' for a whole analysis run"""
+        if now is None:
+            return timezone.now()
+        if isinstance(now, str):
+            now = datetime.fromisoformat(now.replace('Z', '+00:00'))
+        if timezone.is_naive(now):
+            now = timezone.make_aware(now)
+        return now
+    
+    @staticmethod
+    def parse_due_at(due_at):
+        """Parse an ISO due date string, returning None if missing or invalid"""
+        if not due_at:
+            return None
+        try:
+            return datetime.fromisoformat(due_at.replace('Z', '+00:00'))
+        except (AttributeError, TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def _sort_buckets(buckets):
+        """Sort buckets for consistency (tie-breaking)"""
         for category in buckets:
             buckets[category].sort(key=lambda x: (
                 x['due_in_days'] if x['due_in_days'] is not None else float('inf'),
                 x['title'].casefold(),
                 x['id']
             ))
+    
+    def build_batch_columns(self, tasks):
+        """
+        Convert task dicts (analyze_tasks input format) into the columns used by analyze_batch.
+        Type classification happens here, once per task. Columns are gathered as plain
+        lists and converted to arrays once each.
+        """
+        ids, titles, due_at, type_codes, sizes, course_weights = [], [], [], [], [], []
+        
+        for task_data in tasks:
+            title = task_data.get('title', '')
+            ids.append(task_data.get('id', ''))
+            titles.append(title)
+            
+            due_date = self.parse_due_at(task_data.get('due_at'))
+            due_at.append(None if due_date is None else datetime_to_epoch_us(due_date))
+            
+            task_type = self.classify_task_type(title, task_data.get('description', ''))
+            type_codes.append(self.type_codes[task_type])
+            sizes.append(BATCH_SIZE_CODES.get(task_data.get('estimated_size'), 0))
+            
+            course_weight = task_data.get('course_weight')
+            course_weights.append(np.nan if course_weight is None else course_weight)
         
         return {
-            'generated_at': now.isoformat(),
-            'buckets': buckets,
-            'decision_log': decision_log
+            'ids': ids,
+            'titles': titles,
+            # None becomes NaT; integers are microseconds since the epoch
+            'due_at': np.array(due_at, dtype='datetime64[us]'),
+            'type_codes': np.array(type_codes, dtype=np.int8),
+            'sizes': np.array(sizes, dtype=np.int8),
+            'course_weights': np.array(course_weights, dtype=np.float64),
         }
     
-    def analyze_django_tasks(self, tasks_queryset, user_timezone='UTC'):
+    def analyze_batch(self, due_at, type_codes, sizes=None, course_weights=None,
+                      now=None, ids=None, titles=None):
+        """
+        Array-backed equivalent of analyze_tasks.
+        
+        Takes columns of due timestamps (UTC datetime64[us], NaT when there is no deadline),
+        task type codes (index into self.task_types), estimated size codes (BATCH_SIZE_CODES)
+        and course weights (NaN when unknown). Uses a single 'now' for the whole batch.
+        Returns a MoSCoWBatch; call to_result() for the analyze_tasks output shape.
+        """
+        now = self._resolve_now(now)
+        due_at = np.asarray(due_at, dtype='datetime64[us]')
+        type_codes = np.asarray(type_codes, dtype=np.int8)
+        count = len(due_at)
+        sizes = np.zeros(count, dtype=np.int8) if sizes is None else np.asarray(sizes, dtype=np.int8)
+        if course_weights is None:
+            course_weights = np.full(count, np.nan)
+        else:
+            course_weights = np.asarray(course_weights, dtype=np.float64)
+        
+        # Same arithmetic as timedelta.total_seconds() in the scalar path
+        has_due = ~np.isnat(due_at)
+        now_us = np.datetime64(datetime_to_epoch_us(now), 'us')
+        diff_us = np.where(has_due, (due_at - now_us).astype(np.int64), 0)
+        due_in_days = np.floor(diff_us / 1e6 / (24 * 3600)).astype(np.int64)
+        
+        major = type_codes == self.type_codes['Major academic']
+        regular = type_codes == self.type_codes['Regular coursework']
+        supplementary = type_codes == self.type_codes['Supplementary']
+        non_academic = type_codes == self.type_codes['Non-academic']
+        
+        # General urgency ladder (baseline)
+        urgency = np.select(
+            [~has_due, due_in_days <= 1, due_in_days <= 3, due_in_days <= 7],
+            [0, 3, 2, 1],
+            default=0
+        ).astype(np.int64)
+        
+        # Adjustments by size/type
+        major_or_large = major | (sizes == BATCH_SIZE_CODES['large'])
+        urgency = np.where(major_or_large & has_due & (due_in_days <= 2), np.maximum(urgency, 2), urgency)
+        urgency = np.where(major_or_large & has_due & (due_in_days <= 7), np.maximum(urgency, 3), urgency)
+        small_regular = regular & (sizes == BATCH_SIZE_CODES['small']) & has_due & (due_in_days >= 14)
+        urgency = np.where(small_regular, np.minimum(urgency, 0), urgency)
+        
+        # Course weight adjustment (NaN compares False)
+        with np.errstate(invalid='ignore'):
+            weighted = course_weights >= 0.3
+        urgency = np.where(weighted, np.minimum(urgency + 1, 3), urgency)
+        
+        importance_by_code = np.array(
+            [self.importance_weights[task_type] for task_type in self.task_types], dtype=np.int64
+        )
+        importance = importance_by_code[type_codes]
+        score = importance * 10 + urgency * 3
+        
+        # MoSCoW rules in order; the index of the first match is the rule code
+        rule_codes = np.select(
+            [
+                has_due & (due_in_days <= 1),
+                major & has_due & (due_in_days <= 2),
+                regular & has_due & (due_in_days <= 1),
+                regular & has_due & (due_in_days <= 7),
+                supplementary & has_due & (due_in_days <= 1),
+                non_academic,
+                score >= 43,
+                score >= 38,
+                score >= 28,
+            ],
+            list(range(9)),
+            default=9
+        ).astype(np.int8)
+        category_codes = BATCH_RULE_CATEGORIES[rule_codes]
+        
+        return MoSCoWBatch(
+            planner=self,
+            now=now,
+            ids=ids,
+            titles=titles,
+            due_at=due_at,
+            type_codes=type_codes,
+            importance=importance,
+            urgency=urgency,
+            has_due=has_due,
+            due_in_days=due_in_days,
+            score=score,
+            rule_codes=rule_codes,
+            category_codes=category_codes,
+        )
+    
+    def analyze_tasks_batch(self, tasks_data, now=None):
+        """Batch equivalent of analyze_tasks, returning the same result shape"""
+        columns = self.build_batch_columns(tasks_data.get('tasks', []))
+        batch = self.analyze_batch(
+            columns['due_at'], columns['type_codes'], columns['sizes'], columns['course_weights'],
+            now=now, ids=columns['ids'], titles=columns['titles']
+        )
+        return batch.to_result()
+    
+    def analyze_task_rows(self, rows, now=None):
+        """
+        Analyze rows that already carry a persisted task type (Task.content_task_type).
+        Only the deadline-dependent part (urgency, score, bucket) is computed here.
+        
+        Each row is a dict with 'id', 'title', 'due_date' (datetime or None) and 'content_task_type'.
+        Returns a MoSCoWBatch.
+        """
+        ids, titles, due_at, type_codes = [], [], [], []
+        for row in rows:
+            ids.append(str(row['id']))
+            titles.append(row['title'])
+            due_at.append(None if row['due_date'] is None else datetime_to_epoch_us(row['due_date']))
+            type_codes.append(self.type_codes[row['content_task_type']])
+        
+        return self.analyze_batch(
+            np.array(due_at, dtype='datetime64[us]'), np.array(type_codes, dtype=np.int8),
+            now=now, ids=ids, titles=titles
+        )
+    
+    def analyze_django_tasks(self, tasks_queryset, user_timezone='UTC', now=None):
         """
         Analyze Django Task objects and return MoSCoW classification.
         This method converts Django tasks to the expected format and calls analyze_tasks.
@@ -282,4 +706,5 @@ class MoSCoWPriorityPlanner:
             }
             tasks_data['tasks'].append(task_dict)
         
-        return self.analyze_tasks(tasks_data)
+        # The batch path is not faster here: classifying each task dominates either way
+        return self.analyze_tasks(tasks_data, now=now)
@@ -1,3 +1,8 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from django.conf import settings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
@@ -6,9 +11,8 @@ from .services import MoSCoWPriorityPlanner
 
 
 def clear_moscow_cache(user_id):
-    """Clear MoSCoW matrix cache for a specific user"""
-    cache_key = f'moscow_matrix_{user_id}'
-    cache.delete(cache_key)
+    """Clear MoSCoW matrix cache for a specific user (the stale copy is kept)"""
+    cache.delete(MoSCoWCacheService.cache_key(user_id))
 
 
 @receiver(post_save, sender=Task)
@@ -39,21 +43,153 @@ def task_deleted_handler(sender, instance, **kwargs):
         clear_moscow_cache(instance.assigned_to.id)
 
 
+# Stat increments waiting to be written to the shared cache (see MoSCoWCacheService._incr_stat)
+_pending_stats = Counter()
+_pending_stats_lock = threading.Lock()
+
+
 class MoSCoWCacheService:
-    """Service for managing cached MoSCoW analysis results"""
+    """
+    Service for managing cached MoSCoW analysis results.
+    
+    Recomputes are single-flight per user: the first worker to miss takes a short
+    lock (cache.add) and recomputes; concurrent misses either serve the previous
+    result (stale-while-revalidate) or wait for the fresh one instead of running
+    the planner themselves.
+    """
+    
+    # Results expire when the next deadline boundary is crossed; these bound the TTL
+    MIN_CACHE_TTL = 1
+    MAX_CACHE_TTL = 7 * 24 * 3600
+    
+    # Single-flight lock and waiting behaviour (seconds)
+    LOCK_TIMEOUT = 30
+    LOCK_WAIT_TIMEOUT = 5
+    LOCK_POLL_INTERVAL = 0.05
+    
+    STATS_KEY_PREFIX = 'moscow_matrix_stats_'
+    STATS_NAMES = ['hits', 'misses', 'coalesced', 'stale_served', 'lock_timeouts']
+    # Stat increments are buffered per process and written once this many are pending
+    STATS_FLUSH_EVERY = 50
+    
+    @staticmethod
+    def cache_key(user_id):
+        return f'moscow_matrix_{user_id}'
+    
+    @staticmethod
+    def stale_cache_key(user_id):
+        return f'moscow_matrix_stale_{user_id}'
+    
+    @staticmethod
+    def lock_key(user_id):
+        return f'moscow_matrix_lock_{user_id}'
+    
+    @staticmethod
+    def stale_while_revalidate_enabled():
+        return getattr(settings, 'MOSCOW_CACHE_STALE_WHILE_REVALIDATE', True)
     
     @staticmethod
     def get_moscow_analysis(user, force_refresh=False):
         """
         Get cached MoSCoW analysis for a user, or calculate if not cached.
         """
-        cache_key = f'moscow_matrix_{user.id}'
+        cache_key = MoSCoWCacheService.cache_key(user.id)
+        
+        if force_refresh:
+            return MoSCoWCacheService._recompute(user)
+        
+        cached_result = cache.get(cache_key)
+        if cached_result:
+            MoSCoWCacheService._incr_stat('hits')
+            return cached_result
+        
+        MoSCoWCacheService._incr_stat('misses')
+        
+        # Single-flight: only the lock holder runs the planner
+        lock_key = MoSCoWCacheService.lock_key(user.id)
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, MoSCoWCacheService.LOCK_TIMEOUT):
+            try:
+                return MoSCoWCacheService._recompute(user)
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+        
+        # Someone else is recomputing: serve the previous result if allowed
+        if MoSCoWCacheService.stale_while_revalidate_enabled():
+            stale_result = cache.get(MoSCoWCacheService.stale_cache_key(user.id))
+            if stale_result:
+                MoSCoWCacheService._incr_stat('stale_served')
+                return stale_result
         
-        if not force_refresh:
+        # Otherwise wait for the lock holder's result
+        deadline = time.monotonic() + MoSCoWCacheService.LOCK_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(MoSCoWCacheService.LOCK_POLL_INTERVAL)
             cached_result = cache.get(cache_key)
             if cached_result:
+                MoSCoWCacheService._incr_stat('coalesced')
                 return cached_result
+            if cache.get(lock_key) is None:
+                break
+        
+        # Lock holder failed or is too slow; compute without the lock
+        MoSCoWCacheService._incr_stat('lock_timeouts')
+        return MoSCoWCacheService._recompute(user)
+    
+    @staticmethod
+    def build_task_details(result):
+        """Index an analysis result's decision_log by task id"""
+        task_details = {}
+        for log_entry in result['decision_log']:
+            task_details[int(log_entry['id'])] = {
+                'category': log_entry['final'],
+                'score': log_entry['score'],
+                'task_type': log_entry['type'],
+                'importance': log_entry['importance'],
+                'urgency': log_entry['urgency'],
+                'due_in_days': log_entry['due_in_days'],
+                'reasoning': log_entry['matched_rule']
+            }
+        return task_details
+    
+    @staticmethod
+    def get_task_details(user, request=None):
+        """
+        Id-indexed MoSCoW details for a user's active tasks.
+        When a request is given the map is built once and reused for the rest of that request.
+        """
+        memo = getattr(request, '_moscow_task_details', None) if request is not None else None
+        if memo is not None and user.id in memo:
+            return memo[user.id]
         
+        task_details = MoSCoWCacheService.build_task_details(
+            MoSCoWCacheService.get_moscow_analysis(user)
+        )
+        
+        if request is not None:
+            if memo is None:
+                memo = {}
+                request._moscow_task_details = memo
+            memo[user.id] = task_details
+        return task_details
+    
+    @staticmethod
+    def apply_task_details(tasks, task_details):
+        """Attach moscow_* display attributes to task instances; returns them as a list"""
+        tasks = list(tasks)
+        for task in tasks:
+            details = task_details.get(task.id, {})
+            task.moscow_category = details.get('category', 'should')
+            task.moscow_score = details.get('score', 30)
+            task.moscow_task_type = details.get('task_type', 'Regular coursework')
+            task.moscow_reasoning = details.get('reasoning', 'Default classification')
+            task.moscow_due_in_days = details.get('due_in_days')
+        return tasks
+    
+    @staticmethod
+    def _recompute(user):
+        """Run the planner for a user and store the fresh and stale copies"""
         # Get user's active tasks (both owned and assigned)
         from django.db.models import Q
         tasks = Task.objects.filter(
@@ -61,15 +197,100 @@ class MoSCoWCacheService:
             status__in=['todo', 'in_progress']
         )
         
-        # Calculate MoSCoW analysis
-        planner = MoSCoWPriorityPlanner()
-        result = planner.analyze_django_tasks(tasks, user_timezone='UTC')
+        # Calculate MoSCoW analysis from the persisted task types
+        batch = MoSCoWCacheService.analyze_task_queryset(tasks)
+        result = batch.to_result()
         
-        # Cache for 1 hour (3600 seconds)
-        cache.set(cache_key, result, 3600)
+        # Cache until the next instant a bucket could change; the stale copy
+        # survives invalidation so it can be served while the next recompute runs
+        cache.set(MoSCoWCacheService.cache_key(user.id), result, MoSCoWCacheService.cache_ttl(batch))
+        cache.set(MoSCoWCacheService.stale_cache_key(user.id), result, MoSCoWCacheService.MAX_CACHE_TTL)
         
         return result
     
+    @staticmethod
+    def _incr_stat(name):
+        """
+        Count an event (best effort). Increments are buffered in the process so a cache hit
+        costs no cache round trips; they reach the shared counters every STATS_FLUSH_EVERY events.
+        """
+        with _pending_stats_lock:
+            _pending_stats[name] += 1
+            if sum(_pending_stats.values()) < MoSCoWCacheService.STATS_FLUSH_EVERY:
+                return
+        MoSCoWCacheService._flush_stats()
+    
+    @staticmethod
+    def _flush_stats():
+        """Add this process's pending stat increments to the shared counters"""
+        with _pending_stats_lock:
+            pending = dict(_pending_stats)
+            _pending_stats.clear()
+        for name, count in pending.items():
+            key = f'{MoSCoWCacheService.STATS_KEY_PREFIX}{name}'
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                # First increment (or the key was evicted)
+                if not cache.add(key, count, None):
+                    cache.incr(key, count)
+    
+    @staticmethod
+    def get_stats():
+        """Counters for cache hits, misses, coalesced waits, stale serves and lock timeouts"""
+        MoSCoWCacheService._flush_stats()
+        keys = [f'{MoSCoWCacheService.STATS_KEY_PREFIX}{name}' for name in MoSCoWCacheService.STATS_NAMES]
+        values = cache.get_many(keys)
+        return {
+            name: values.get(key, 0)
+            for name, key in zip(MoSCoWCacheService.STATS_NAMES, keys)
+        }
+    
+    @staticmethod
+    def reset_stats():
+        with _pending_stats_lock:
+            _pending_stats.clear()
+        cache.delete_many([
+            f'{MoSCoWCacheService.STATS_KEY_PREFIX}{name}' for name in MoSCoWCacheService.STATS_NAMES
+        ])
+    
+    @staticmethod
+    def analyze_task_queryset(tasks, now=None):
+        """
+        Analyze a Task queryset without re-running keyword classification.
+        Only id/title/due date/task type are loaded; urgency and buckets are computed in one batch.
+        Returns a MoSCoWBatch.
+        """
+        planner = MoSCoWPriorityPlanner()
+        rows = list(tasks.values('id', 'title', 'due_date', 'content_task_type'))
+        MoSCoWCacheService._classify_missing(planner, rows)
+        return planner.analyze_task_rows(rows, now=now)
+    
+    @staticmethod
+    def cache_ttl(batch):
+        """Cache timeout in seconds: up to the next deadline boundary, capped at MAX_CACHE_TTL"""
+        seconds = batch.seconds_until_next_boundary()
+        if seconds is None:
+            return MoSCoWCacheService.MAX_CACHE_TTL
+        return max(MoSCoWCacheService.MIN_CACHE_TTL, min(seconds, MoSCoWCacheService.MAX_CACHE_TTL))
+    
+    @staticmethod
+    def _classify_missing(planner, rows):
+        """Backfill the persisted classification for rows saved before it existed"""
+        missing = {row['id']: row for row in rows if row['content_task_type'] not in planner.type_codes}
+        if not missing:
+            return
+        
+        tasks = list(Task.objects.filter(id__in=list(missing)).only(
+            'id', 'title', 'description', *Task.MOSCOW_CLASSIFICATION_FIELDS
+        ))
+        for task in tasks:
+            task.refresh_moscow_classification()
+            missing[task.id]['content_task_type'] = task.content_task_type
+        
+        # bulk_update skips save() and signals, so this doesn't clear any cache
+        Task.objects.bulk_update(tasks, Task.MOSCOW_CLASSIFICATION_FIELDS)
+    
     @staticmethod
     def force_refresh_moscow_analysis(user):
         """Force refresh of MoSCoW analysis for a user"""
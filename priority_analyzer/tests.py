@@ -1,3 +1,300 @@
-from django.test import TestCase
+import io
+import json
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.models import Task
+from . import views
+from .services import DEADLINE_BOUNDARY_DAYS, MoSCoWPriorityPlanner
+from .signals import MoSCoWCacheService, clear_moscow_cache
+
+
+class PersistedClassificationTests(TestCase):
+    def test_display_attributes_do_not_overwrite_persisted_type(self):
+        user = User.objects.create_user(username='student', password='pass')
+        task = Task.objects.create(user=user, title='Go to the gym')
+        self.assertEqual(task.content_task_type, 'Non-academic')
+
+        # Views decorate tasks outside the current analysis with the default display type
+        MoSCoWCacheService.apply_task_details([task], {})
+        self.assertEqual(task.moscow_task_type, 'Regular coursework')
+        task.save()
+
+        task.refresh_from_db()
+        self.assertEqual(task.content_task_type, 'Non-academic')
+
+
+class DeadlineBoundaryTests(TestCase):
+    """Cache entries expire when the first due date crosses a bucket boundary"""
+
+    def setUp(self):
+        self.planner = MoSCoWPriorityPlanner()
+        self.now = timezone.now().replace(microsecond=250000)
+
+    def seconds(self, *due_dates):
+        rows = [
+            {'id': i, 'title': f'Task {i}', 'due_date': due, 'content_task_type': 'Regular coursework'}
+            for i, due in enumerate(due_dates)
+        ]
+        return self.planner.analyze_task_rows(rows, now=self.now).seconds_until_next_boundary()
+
+    def test_each_boundary_is_the_next_expiry(self):
+        for days in DEADLINE_BOUNDARY_DAYS:
+            with self.subTest(days=days):
+                self.assertEqual(self.seconds(self.now + timedelta(days=days, seconds=90)), 90)
+                # a microsecond past a whole second rounds up, so the entry never outlives the boundary
+                self.assertEqual(self.seconds(self.now + timedelta(days=days, seconds=90, microseconds=1)), 91)
+
+    def test_far_deadline_expires_at_the_fourteen_day_boundary(self):
+        self.assertEqual(self.seconds(self.now + timedelta(days=20)), 6 * 24 * 3600)
+
+    def test_earliest_boundary_across_tasks_wins(self):
+        self.assertEqual(
+            self.seconds(self.now + timedelta(days=20), self.now + timedelta(days=3, minutes=5)),
+            5 * 60
+        )
+
+    def test_no_upcoming_boundary(self):
+        self.assertIsNone(self.seconds(None))
+        self.assertIsNone(self.seconds(self.now - timedelta(minutes=1)))
+
+    def test_cache_ttl_is_clamped(self):
+        batch = self.planner.analyze_task_rows([
+            {'id': 1, 'title': 'Essay', 'due_date': self.now + timedelta(days=1), 'content_task_type': 'Regular coursework'}
+        ], now=self.now)
+        self.assertEqual(MoSCoWCacheService.cache_ttl(batch), MoSCoWCacheService.MIN_CACHE_TTL)
+        batch = self.planner.analyze_task_rows([
+            {'id': 1, 'title': 'Essay', 'due_date': None, 'content_task_type': 'Regular coursework'}
+        ], now=self.now)
+        self.assertEqual(MoSCoWCacheService.cache_ttl(batch), MoSCoWCacheService.MAX_CACHE_TTL)
+
+
+class BatchedMoSCoWDetailsTests(TestCase):
+    """Lists of tasks are classified in one planner pass, without a query per task"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='pass')
+        self.client.login(username='student', password='pass')
+        self.now = timezone.now()
+        titles = ['Final exam revision', 'Weekly quiz', 'Read chapter 4', 'Go to the gym', 'Group project report']
+        for i in range(10):
+            Task.objects.create(
+                user=self.user, title=titles[i % len(titles)],
+                status=['todo', 'in_progress', 'review', 'done'][i % 4],
+                due_date=self.now + timedelta(days=i - 2) if i % 3 else None,
+            )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_with_moscow_matches_the_single_task_analysis(self):
+        with self.assertNumQueries(1):
+            tasks = list(Task.objects.filter(user=self.user).with_moscow(now=self.now))
+            details = [task.get_moscow_details() for task in tasks]
+
+        for task, batched in zip(tasks, details):
+            single = Task.objects.get(pk=task.pk)
+            Task.attach_moscow_details([single], now=self.now)
+            self.assertEqual(batched, single.get_moscow_details())
+            self.assertEqual(task.moscow_priority, batched['category'])
+
+    def test_lazy_backfill_classifies_old_rows_in_bulk(self):
+        active = Task.objects.filter(user=self.user, status__in=['todo', 'in_progress'])
+        Task.objects.filter(user=self.user).update(content_task_type='', moscow_content_hash='')
+        result = MoSCoWCacheService.get_moscow_analysis(self.user)
+
+        self.assertEqual(len(result['decision_log']), active.count())
+        self.assertFalse(active.filter(content_task_type='').exists())
+        self.assertEqual(active.get(title='Go to the gym').content_task_type, 'Non-academic')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_queries_do_not_grow(self, url):
+        before = self.count_queries(url)
+        for i in range(15):
+            Task.objects.create(user=self.user, title=f'Assignment {i}', due_date=self.now + timedelta(days=i))
+        self.assertEqual(self.count_queries(url), before)
+
+    def test_analytics_list_queries_do_not_grow_with_tasks(self):
+        self.assert_queries_do_not_grow(reverse('analytics:api') + '?range=7')
+
+    def test_kanban_queries_do_not_grow_with_tasks(self):
+        self.assert_queries_do_not_grow(reverse('tasks:task-kanban-board-data'))
+
+    def test_kanban_uses_the_shared_moscow_map(self):
+        data = self.client.get(reverse('tasks:task-kanban-board-data')).json()
+        task_details = MoSCoWCacheService.get_task_details(self.user)
+        active = data['todo'] + data['in_progress']
+        self.assertTrue(active)
+        for item in active:
+            self.assertEqual(item['moscow_category'], task_details[item['id']]['category'])
+
+
+class RefreshMoSCoWCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_refresh_all_users_matches_on_demand_analysis(self):
+        owner = User.objects.create_user(username='owner', password='pass')
+        assignee = User.objects.create_user(username='assignee', password='pass')
+        idle = User.objects.create_user(username='idle', password='pass')
+        due = timezone.now() + timedelta(days=2)
+        Task.objects.create(user=owner, title='Final exam revision', due_date=due)
+        Task.objects.create(user=owner, title='Weekly quiz', due_date=due, assigned_to=assignee)
+        Task.objects.create(user=owner, title='Old essay', status='done')
+
+        call_command('refresh_moscow', workers=1, chunk_size=1, stdout=io.StringIO())
+
+        for user, count in ((owner, 2), (assignee, 1)):
+            cached = cache.get(MoSCoWCacheService.cache_key(user.id))
+            self.assertEqual(len(cached['decision_log']), count)
+            cache.delete(MoSCoWCacheService.cache_key(user.id))
+            fresh = MoSCoWCacheService.get_moscow_analysis(user)
+            self.assertEqual(cached['buckets'], fresh['buckets'])
+        self.assertIsNone(cache.get(MoSCoWCacheService.cache_key(idle.id)))
+
+
+class AnalyzePriorityBatchTests(TestCase):
+    """analyze_priority_batch keeps input order, reports bad items in their slot and caps the batch"""
+
+    def post(self, body, content_type):
+        return self.client.post(reverse('priority_analyzer:analyze_priority_batch'), body, content_type=content_type)
+
+    def ndjson(self, tasks):
+        return ''.join(json.dumps(task) + '\n' for task in tasks)
+
+    def test_results_follow_input_order_with_error_slots(self):
+        tasks = [
+            {'id': 'a', 'task_name': 'Final exam revision'},
+            {'id': 'b', 'task_name': ''},
+            'not an object',
+            {'id': 'd', 'title': 'Go to the gym'},
+            {'id': 'e', 'title': 123},
+            {'id': 'f', 'title': 'Essay', 'description': ['draft']},
+        ]
+        results = self.post(json.dumps({'tasks': tasks}), 'application/json').json()['results']
+
+        self.assertEqual([item['index'] for item in results], [0, 1, 2, 3, 4, 5])
+        self.assertEqual([item.get('id') for item in results], ['a', 'b', None, 'd', 'e', 'f'])
+        self.assertEqual(results[0]['task_type'], 'Major academic')
+        self.assertEqual(results[1]['error'], 'Task name is required')
+        self.assertEqual(results[2]['error'], 'Task must be an object')
+        self.assertEqual(results[3]['priority'], 'wont')
+        self.assertEqual(results[4]['error'], 'Task name must be a string')
+        self.assertEqual(results[5]['error'], 'Task description must be a string')
+
+    def test_ndjson_reports_bad_field_types_in_their_slot(self):
+        tasks = [{'id': 'a', 'title': 123}, {'id': 'b', 'task_name': 'Weekly quiz'}]
+        response = self.post(self.ndjson(tasks), 'application/x-ndjson')
+
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['id'] for line in lines], ['a', 'b'])
+        self.assertEqual(lines[0]['error'], 'Task name must be a string')
+        self.assertIn('priority', lines[1])
+
+    def test_ndjson_streams_results_in_input_order(self):
+        tasks = [{'id': str(i), 'task_name': f'Quiz {i}'} for i in range(450)]  # spans three planner chunks
+        response = self.post(self.ndjson(tasks), 'application/x-ndjson')
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [task['id'] for task in tasks])
+
+    def test_too_many_tasks_is_rejected(self):
+        with mock.patch.object(views, 'BATCH_MAX_TASKS', 3):
+            tasks = [{'task_name': f'Quiz {i}'} for i in range(4)]
+            self.assertEqual(self.post(json.dumps(tasks), 'application/json').status_code, 413)
+            # NDJSON reading stops at the limit: the broken line after it is never parsed
+            response = self.post(self.ndjson(tasks) + '{broken\n', 'application/x-ndjson')
+            self.assertEqual(response.status_code, 413)
+
+            self.assertEqual(self.post(self.ndjson(tasks[:3]), 'application/x-ndjson').status_code, 200)
+
+
+class MoSCoWCacheSingleFlightTests(TestCase):
+    """Concurrent misses: one worker recomputes, the others serve stale data, wait, or give up waiting"""
+
+    def setUp(self):
+        cache.clear()
+        MoSCoWCacheService.reset_stats()
+        self.user = User.objects.create_user(username='student', password='pass')
+        Task.objects.create(user=self.user, title='Final exam revision', due_date=timezone.now() + timedelta(days=1))
+        self.lock_key = MoSCoWCacheService.lock_key(self.user.id)
+
+    def tearDown(self):
+        cache.clear()
+        MoSCoWCacheService.reset_stats()
+
+    def test_lock_holder_recomputes_and_releases_the_lock(self):
+        with mock.patch.object(MoSCoWCacheService, '_recompute', wraps=MoSCoWCacheService._recompute) as recompute:
+            first = MoSCoWCacheService.get_moscow_analysis(self.user)
+            second = MoSCoWCacheService.get_moscow_analysis(self.user)
+
+        self.assertEqual(recompute.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertIsNone(cache.get(self.lock_key))
+        stats = MoSCoWCacheService.get_stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 1))
+
+    def test_stale_result_is_served_while_another_worker_recomputes(self):
+        stale = MoSCoWCacheService.get_moscow_analysis(self.user)
+        clear_moscow_cache(self.user.id)
+        cache.add(self.lock_key, 'other-worker', 30)
+
+        with mock.patch.object(MoSCoWCacheService, '_recompute') as recompute:
+            self.assertEqual(MoSCoWCacheService.get_moscow_analysis(self.user), stale)
+        recompute.assert_not_called()
+        self.assertEqual(MoSCoWCacheService.get_stats()['stale_served'], 1)
+
+    @override_settings(MOSCOW_CACHE_STALE_WHILE_REVALIDATE=False)
+    def test_waiting_worker_gets_the_lock_holders_result(self):
+        cache.add(self.lock_key, 'other-worker', 30)
+        fresh = {'generated_at': 'fresh', 'buckets': {}, 'decision_log': []}
+        writer = threading.Timer(0.1, lambda: cache.set(MoSCoWCacheService.cache_key(self.user.id), fresh))
+        writer.start()
+        self.addCleanup(writer.cancel)
+
+        with mock.patch.object(MoSCoWCacheService, '_recompute') as recompute:
+            self.assertEqual(MoSCoWCacheService.get_moscow_analysis(self.user), fresh)
+        recompute.assert_not_called()
+        self.assertEqual(MoSCoWCacheService.get_stats()['coalesced'], 1)
+
+    @override_settings(MOSCOW_CACHE_STALE_WHILE_REVALIDATE=False)
+    def test_gives_up_waiting_on_a_stuck_lock_holder(self):
+        cache.add(self.lock_key, 'other-worker', 30)
+
+        with mock.patch.object(MoSCoWCacheService, 'LOCK_WAIT_TIMEOUT', 0.1):
+            result = MoSCoWCacheService.get_moscow_analysis(self.user)
+
+        self.assertEqual(len(result['decision_log']), 1)
+        self.assertEqual(MoSCoWCacheService.get_stats()['lock_timeouts'], 1)
+
+    def test_hits_do_not_touch_the_stat_counters(self):
+        MoSCoWCacheService.get_moscow_analysis(self.user)
+        MoSCoWCacheService.get_stats()
+        with mock.patch('priority_analyzer.signals.cache', wraps=cache) as shared_cache:
+            for _ in range(MoSCoWCacheService.STATS_FLUSH_EVERY - 1):
+                MoSCoWCacheService.get_moscow_analysis(self.user)
+        # one get per hit; buffered stats are written on the 50th event
+        self.assertEqual(shared_cache.get.call_count, MoSCoWCacheService.STATS_FLUSH_EVERY - 1)
+        shared_cache.incr.assert_not_called()
+        self.assertEqual(MoSCoWCacheService.get_stats()['hits'], MoSCoWCacheService.STATS_FLUSH_EVERY - 1)
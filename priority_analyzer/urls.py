@@ -5,4 +5,5 @@ app_name = 'priority_analyzer'
 
 urlpatterns = [
     path('analyze/', views.analyze_priority, name='analyze_priority'),
+    path('analyze/batch/', views.analyze_priority_batch, name='analyze_priority_batch'),
 ]
@@ -1,10 +1,32 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 import json
+import time
 from .services import MoSCoWPriorityPlanner
 
+# Upper bound on tasks per batch request, and tasks per planner call within a batch
+BATCH_MAX_TASKS = getattr(settings, 'MOSCOW_BATCH_MAX_TASKS', 1000)
+BATCH_CHUNK_SIZE = 200
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def format_analysis(analysis):
+    """Response fields for one decision_log entry"""
+    return {
+        'priority': analysis['final'],
+        'score': analysis['score'],
+        'task_type': analysis['type'],
+        'reasoning': analysis['matched_rule'],
+        'importance': analysis['importance'],
+        'urgency': analysis['urgency'],
+        'due_in_days': analysis['due_in_days']
+    }
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def analyze_priority(request):
@@ -38,15 +60,7 @@ def analyze_priority(request):
         # Get the analysis for our task
         if result['decision_log']:
             analysis = result['decision_log'][0]
-            return JsonResponse({
-                'priority': analysis['final'],
-                'score': analysis['score'],
-                'task_type': analysis['type'],
-                'reasoning': analysis['matched_rule'],
-                'importance': analysis['importance'],
-                'urgency': analysis['urgency'],
-                'due_in_days': analysis['due_in_days']
-            })
+            return JsonResponse(format_analysis(analysis))
         else:
             return JsonResponse({
                 'priority': 'should',
@@ -63,3 +77,137 @@ def analyze_priority(request):
         return JsonResponse({
             'error': str(e)
         }, status=500)
+
+
+class TooManyTasks(Exception):
+    """A batch request carries more than BATCH_MAX_TASKS tasks"""
+
+
+def parse_batch_tasks(request):
+    """
+    Read the task list from a JSON body ({"tasks": [...]} or a bare array)
+    or from NDJSON (one task object per line).
+    
+    NDJSON is parsed line by line as it is read from the request stream, and reading
+    stops as soon as there is one task more than BATCH_MAX_TASKS.
+    """
+    if request.content_type == NDJSON_CONTENT_TYPE:
+        tasks = []
+        for line in request:
+            if not line.strip():
+                continue
+            if len(tasks) == BATCH_MAX_TASKS:
+                raise TooManyTasks(f'Too many tasks: more than {BATCH_MAX_TASKS} (maximum is {BATCH_MAX_TASKS})')
+            tasks.append(json.loads(line))
+        return tasks
+    
+    data = json.loads(request.body)
+    if isinstance(data, dict):
+        data = data.get('tasks')
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of tasks')
+    if len(data) > BATCH_MAX_TASKS:
+        raise TooManyTasks(f'Too many tasks: {len(data)} (maximum is {BATCH_MAX_TASKS})')
+    return data
+
+
+def analyze_batch_chunks(tasks, now):
+    """Yield per-task results in input order, one planner call per chunk"""
+    planner = MoSCoWPriorityPlanner()
+    
+    for start in range(0, len(tasks), BATCH_CHUNK_SIZE):
+        chunk = tasks[start:start + BATCH_CHUNK_SIZE]
+        
+        # Validate each task; invalid ones get an error entry in their slot
+        results = [None] * len(chunk)
+        valid = []
+        for offset, task in enumerate(chunk):
+            if not isinstance(task, dict):
+                results[offset] = {'error': 'Task must be an object'}
+                continue
+            task_name = task.get('task_name') or task.get('title') or ''
+            if not isinstance(task_name, str):
+                results[offset] = {'error': 'Task name must be a string'}
+                continue
+            if not task_name:
+                results[offset] = {'error': 'Task name is required'}
+                continue
+            description = task.get('task_description') or task.get('description') or ''
+            if not isinstance(description, str):
+                results[offset] = {'error': 'Task description must be a string'}
+                continue
+            valid.append((offset, {
+                'id': str(start + offset),
+                'title': task_name,
+                'description': description,
+                'due_at': task.get('due_date') or task.get('due_at'),
+            }))
+        
+        if valid:
+            result = planner.analyze_tasks_batch({'tasks': [task for _, task in valid]}, now=now)
+            # decision_log follows the input order
+            for (offset, _), analysis in zip(valid, result['decision_log']):
+                results[offset] = format_analysis(analysis)
+        
+        for offset, item in enumerate(results):
+            item['index'] = start + offset
+            task = chunk[offset]
+            if isinstance(task, dict) and 'id' in task:
+                item['id'] = task['id']
+            yield item
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def analyze_priority_batch(request):
+    """
+    Batch version of analyze_priority.
+    Accepts up to BATCH_MAX_TASKS tasks as JSON or NDJSON and returns one result per
+    task in input order (NDJSON in, NDJSON out).
+    """
+    started = time.perf_counter()
+    try:
+        tasks = parse_batch_tasks(request)
+    except TooManyTasks as e:
+        return JsonResponse({
+            'error': str(e)
+        }, status=413)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except ValueError as e:
+        return JsonResponse({
+            'error': str(e)
+        }, status=400)
+    
+    parse_ms = (time.perf_counter() - started) * 1000
+    now = timezone.now()
+    
+    if request.content_type == NDJSON_CONTENT_TYPE:
+        # Results are produced chunk by chunk while the response streams
+        response = StreamingHttpResponse(
+            (json.dumps(item) + '\n' for item in analyze_batch_chunks(tasks, now)),
+            content_type=NDJSON_CONTENT_TYPE
+        )
+        response['Server-Timing'] = f'parse;dur={parse_ms:.1f}'
+    else:
+        try:
+            analyze_started = time.perf_counter()
+            results = list(analyze_batch_chunks(tasks, now))
+            analyze_ms = (time.perf_counter() - analyze_started) * 1000
+        except Exception as e:
+            return JsonResponse({
+                'error': str(e)
+            }, status=500)
+        
+        response = JsonResponse({
+            'generated_at': now.isoformat(),
+            'count': len(results),
+            'results': results
+        })
+        response['Server-Timing'] = f'parse;dur={parse_ms:.1f}, analyze;dur={analyze_ms:.1f}'
+    
+    response['X-MoSCoW-Task-Count'] = str(len(tasks))
+    response['X-MoSCoW-Max-Tasks'] = str(BATCH_MAX_TASKS)
+    return response
@@ -0,0 +1,71 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from .models import Task
+
+
+# Responses also depend on the clock (overdue flags, MoSCoW urgency, "today"), so a
+# version is only trusted for this many seconds even when no task changed
+VERSION_WINDOW = getattr(settings, 'USER_DATA_VERSION_WINDOW', 300)
+
+PROFILE_VERSION_FIELDS = ['total_points', 'level', 'streak_count', 'timezone', 'preferred_technique', 'study_hours_per_day']
+
+
+def user_data_version(user, now=None):
+    """
+    (etag, last_modified datetime) for everything a user's task JSON is built from:
+    one aggregate over their tasks (latest updated_at and the count, which catches
+    deletions), their profile and the current time window.
+    """
+    now = now or timezone.now()
+    tasks = Task.objects.filter(user=user).aggregate(last_updated=Max('updated_at'), count=Count('id'))
+    try:
+        profile = user.userprofile
+        profile_version = [getattr(profile, field) for field in PROFILE_VERSION_FIELDS]
+    except ObjectDoesNotExist:
+        profile_version = None
+
+    window = int(now.timestamp()) // VERSION_WINDOW
+    window_start = datetime.fromtimestamp(window * VERSION_WINDOW, tz=dt_timezone.utc)
+    last_modified = max(filter(None, [tasks['last_updated'], window_start]))
+
+    version = repr((user.pk, tasks['last_updated'], tasks['count'], profile_version, window))
+    return hashlib.sha1(version.encode()).hexdigest(), last_modified
+
+
+def conditional_user_data(view):
+    """
+    Conditional GET for per-user JSON views: answers 304 Not Modified from the data
+    version alone (before the view runs) when If-None-Match / If-Modified-Since still
+    match, and adds ETag / Last-Modified to fresh responses.
+
+    Put it below @api_view / @permission_classes (or wrap with method_decorator for
+    viewset actions) so request.user is already authenticated.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        etag, last_modified = user_data_version(request.user)
+        # Browsable API and JSON renderings of the same data must not share a tag
+        media_type = getattr(request, 'accepted_media_type', '')
+        etag = quote_etag(hashlib.sha1(f'{etag}:{media_type}'.encode()).hexdigest())
+        last_modified = int(last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Let the browser keep the copy but always revalidate it
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
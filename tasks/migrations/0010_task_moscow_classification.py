@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_pomodoro_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='content_task_type',
+            field=models.CharField(blank=True, default='', editable=False, help_text='MoSCoW task type derived from title and description', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='moscow_content_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash of the text the classification was computed from', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='moscow_importance',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='MoSCoW base importance for the task type'),
+        ),
+    ]
@@ -23,6 +23,39 @@ class Category(models.Model):
         return self.name
 
 
+class TaskQuerySet(models.QuerySet):
+    """QuerySet that can attach MoSCoW details to its instances in a single planner pass"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._with_moscow = False
+        self._moscow_now = None
+    
+    def with_moscow(self, now=None):
+        """
+        Classify every task of this queryset in one planner pass when it is evaluated.
+        get_moscow_details(), get_moscow_priority() and moscow_priority then reuse the result.
+        """
+        clone = self._chain()
+        clone._with_moscow = True
+        clone._moscow_now = now
+        return clone
+    
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_moscow = self._with_moscow
+        clone._moscow_now = self._moscow_now
+        return clone
+    
+    def _fetch_all(self):
+        fetched = self._result_cache is None
+        super()._fetch_all()
+        if fetched and self._with_moscow:
+            # values()/values_list() rows have nothing to attach to
+            tasks = [obj for obj in self._result_cache if isinstance(obj, Task)]
+            Task.attach_moscow_details(tasks, now=self._moscow_now)
+
+
 class Task(models.Model):
     PRIORITY_CHOICES = [
         ('must', 'Must Have'),
@@ -74,16 +107,72 @@ class Task(models.Model):
     tags = models.CharField(max_length=200, blank=True, help_text="Comma-separated tags")
     points_awarded = models.IntegerField(default=0)
     pomodoro_sessions = models.IntegerField(default=1, help_text="Number of Pomodoro sessions needed")
+    
+    # Content-derived MoSCoW classification (depends only on title/description)
+    content_task_type = models.CharField(max_length=30, blank=True, default='', editable=False, help_text="MoSCoW task type derived from title and description")
+    moscow_importance = models.PositiveSmallIntegerField(default=0, editable=False, help_text="MoSCoW base importance for the task type")
+    moscow_content_hash = models.CharField(max_length=40, blank=True, default='', editable=False, help_text="Hash of the text the classification was computed from")
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
+    MOSCOW_CLASSIFICATION_FIELDS = ['content_task_type', 'moscow_importance', 'moscow_content_hash']
+    # Stored values that post_save receivers compare a task against (see tasks.signals)
+    SNAPSHOT_FIELDS = ['user_id', 'status', 'category', 'priority', 'points_awarded', 'created_at', 'completed_at', 'due_date']
+    
+    objects = TaskQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        task = super().from_db(db, field_names, values)
+        # The loaded values are what the next save compares against; unknown if any was deferred
+        task._loaded_snapshot = (
+            task.snapshot() if all(field in task.__dict__ for field in cls.SNAPSHOT_FIELDS) else None
+        )
+        return task
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # The row may have changed since this instance was loaded; the next save reads it again
+        self._loaded_snapshot = None
+    
+    def snapshot(self):
+        """Current values of SNAPSHOT_FIELDS"""
+        return {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
+    
+    def save(self, *args, **kwargs):
+        # Attached MoSCoW details may no longer match the saved content
+        self.__dict__.pop('_moscow_details', None)
+        # Only reclassify when the title or description actually changed
+        if self.refresh_moscow_classification():
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.MOSCOW_CLASSIFICATION_FIELDS)
+        super().save(*args, **kwargs)
+    
+    def refresh_moscow_classification(self):
+        """
+        Recompute the persisted MoSCoW task type/importance if the content hash changed.
+        Returns True if the classification fields were updated.
+        """
+        from priority_analyzer.services import MoSCoWPriorityPlanner, content_hash
+        
+        current_hash = content_hash(self.title, self.description)
+        if current_hash == self.moscow_content_hash and self.content_task_type:
+            return False
+        
+        planner = MoSCoWPriorityPlanner()
+        self.content_task_type, self.moscow_importance = planner.classify_content(self.title, self.description or '')
+        self.moscow_content_hash = current_hash
+        return True
+    
     def mark_complete(self):
         self.status = 'done'
         self.completed_at = timezone.now()
@@ -189,82 +278,47 @@ class Task(models.Model):
         Get MoSCoW priority using the new deterministic planner.
         This replaces the old priority calculation methods.
         """
-        from priority_analyzer.services import MoSCoWPriorityPlanner
-        
-        planner = MoSCoWPriorityPlanner()
-        
-        # Create task data for analysis
-        tasks_data = {
-            'now': timezone.now().isoformat(),
-            'timezone': 'UTC',
-            'tasks': [{
-                'id': str(self.id),
-                'title': self.title,
-                'description': self.description or '',
-                'due_at': self.due_date.isoformat() if self.due_date else None,
-                'estimated_size': getattr(self, 'estimated_size', None),
-                'course_weight': getattr(self, 'course_weight', None)
-            }]
-        }
-        
-        result = planner.analyze_tasks(tasks_data)
-        
-        # Find this task in the results
-        for category, tasks in result['buckets'].items():
-            for task in tasks:
-                if task['id'] == str(self.id):
-                    return category
-        
-        # Fallback to 'should' if not found
-        return 'should'
+        return self.get_moscow_details()['category']
     
     def get_moscow_details(self):
         """
         Get detailed MoSCoW analysis including score and reasoning.
+        Tasks loaded through Task.objects.with_moscow() already carry the result;
+        otherwise this task is analyzed on its own and the result is kept on the instance.
+        """
+        if '_moscow_details' not in self.__dict__:
+            Task.attach_moscow_details([self])
+        return self._moscow_details
+    
+    @staticmethod
+    def attach_moscow_details(tasks, now=None):
+        """
+        Analyze tasks in one planner pass and store each task's details on the instance.
+        Uses the persisted task type; tasks saved before it existed are classified in memory.
         """
         from priority_analyzer.services import MoSCoWPriorityPlanner
         
-        planner = MoSCoWPriorityPlanner()
+        tasks = list(tasks)
+        if not tasks:
+            return tasks
         
-        # Create task data for analysis
-        tasks_data = {
-            'now': timezone.now().isoformat(),
-            'timezone': 'UTC',
-            'tasks': [{
-                'id': str(self.id),
-                'title': self.title,
-                'description': self.description or '',
-                'due_at': self.due_date.isoformat() if self.due_date else None,
-                'estimated_size': getattr(self, 'estimated_size', None),
-                'course_weight': getattr(self, 'course_weight', None)
-            }]
-        }
-        
-        result = planner.analyze_tasks(tasks_data)
-        
-        # Find this task in the decision log
-        for log_entry in result['decision_log']:
-            if log_entry['id'] == str(self.id):
-                return {
-                    'category': log_entry['final'],
-                    'score': log_entry['score'],
-                    'task_type': log_entry['type'],
-                    'importance': log_entry['importance'],
-                    'urgency': log_entry['urgency'],
-                    'due_in_days': log_entry['due_in_days'],
-                    'reasoning': log_entry['matched_rule']
-                }
+        planner = MoSCoWPriorityPlanner()
+        rows = []
+        for task in tasks:
+            task_type = task.content_task_type
+            if task_type not in planner.type_codes:
+                task_type, _ = planner.classify_content(task.title, task.description or '')
+            rows.append({
+                'id': task.id,
+                'title': task.title,
+                'due_date': task.due_date,
+                'content_task_type': task_type
+            })
         
-        # Fallback
-        return {
-            'category': 'should',
-            'score': 30,
-            'task_type': 'Regular coursework',
-            'importance': 3,
-            'urgency': 0,
-            'due_in_days': None,
-            'reasoning': 'Default classification'
-        }
+        batch = planner.analyze_task_rows(rows, now=now)
+        for task, details in zip(tasks, batch.details()):
+            task._moscow_details = details
+        return tasks
 
 
 class TimeBlock(models.Model):
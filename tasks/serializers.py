@@ -32,22 +32,16 @@ class TaskSerializer(serializers.ModelSerializer):
     
     def get_moscow_category(self, obj):
         """Get MoSCoW category for the task"""
-        # Get the actual MoSCoW analysis instead of basic priority
-        from priority_analyzer.signals import MoSCoWCacheService
-        
         # Get user from context
         request = self.context.get('request')
         if not request or not request.user:
             return 'Should Have'
             
         try:
-            # Get the full MoSCoW analysis for the user
-            result = MoSCoWCacheService.get_moscow_analysis(request.user)
-            
-            # Find this task in the decision log
-            for log_entry in result.get('decision_log', []):
-                if int(log_entry['id']) == obj.id:
-                    return log_entry['final']
+            # Look this task up in the per-request MoSCoW map
+            task_details = self.get_moscow_details_map()
+            if obj.id in task_details:
+                return task_details[obj.id]['category']
         except Exception:
             pass
         
@@ -60,6 +54,18 @@ class TaskSerializer(serializers.ModelSerializer):
         else:
             return 'Could Have'
     
+    def get_moscow_details_map(self):
+        """
+        Id-indexed MoSCoW details shared through the serializer context.
+        Built once per request (list serializers share their context with every child).
+        """
+        if 'moscow_details' not in self.context:
+            from priority_analyzer.signals import MoSCoWCacheService
+            
+            request = self.context['request']
+            self.context['moscow_details'] = MoSCoWCacheService.get_task_details(request.user, request)
+        return self.context['moscow_details']
+    
     def get_assigned_to_display(self, obj):
         if obj.assigned_to:
             if obj.assigned_to.first_name and obj.assigned_to.last_name:
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from .models import Task
+
+
+def written_snapshot_fields(update_fields):
+    """The SNAPSHOT_FIELDS a save writes (all of them unless update_fields limits it)"""
+    if update_fields is None:
+        return Task.SNAPSHOT_FIELDS
+    return [
+        field for field in Task.SNAPSHOT_FIELDS
+        if field in update_fields or field.removesuffix('_id') in update_fields
+    ]
+
+
+def stored_snapshot(task):
+    """
+    Stored values of SNAPSHOT_FIELDS after a save, for post_save receivers.
+    Fields the save left alone keep their stored values, whatever the instance holds.
+    """
+    previous = getattr(task, '_saved_snapshot', None)
+    written = getattr(task, '_snapshot_written', Task.SNAPSHOT_FIELDS)
+    return {**(previous or task.snapshot()), **{field: getattr(task, field) for field in written}}
+
+
+@receiver(pre_save, sender=Task)
+def snapshot_saved_task(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the stored values of Task.SNAPSHOT_FIELDS before this save (None for a new task)
+    for the post_save receivers (dashboard re-planning, analytics rollup). Uses the values the
+    task was loaded with when they are known; otherwise they are read in one query.
+    """
+    written = written_snapshot_fields(update_fields)
+    instance._snapshot_written = written
+    loaded = getattr(instance, '_loaded_snapshot', None)
+    if not written:
+        # Nothing the receivers track is written, so they see no change
+        instance._saved_snapshot = loaded or instance.snapshot()
+    elif loaded is not None:
+        instance._saved_snapshot = loaded
+    else:
+        instance._saved_snapshot = (
+            Task.objects.filter(pk=instance.pk).values(*Task.SNAPSHOT_FIELDS).first() if instance.pk else None
+        )
+
+
+@receiver(post_save, sender=Task)
+def remember_stored_task(sender, instance, **kwargs):
+    """What this save stored becomes the snapshot for the next save of the same instance"""
+    if instance._snapshot_written:
+        instance._loaded_snapshot = stored_snapshot(instance)
@@ -4,6 +4,7 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
 from django.db.models import Q, Count
 from django.utils import timezone
 from datetime import timedelta
@@ -14,6 +15,7 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Task, TimeBlock
+from .conditional import conditional_user_data
 from .serializers import TaskSerializer, TaskCreateSerializer, TimeBlockSerializer, KanbanBoardSerializer
 from .forms import TaskForm
 
@@ -465,25 +467,20 @@ class TaskViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Task already completed'}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'])
+    @method_decorator(conditional_user_data)
     def kanban_board_data(self, request):
         """Get tasks organized by Kanban board columns (personal tasks only)"""
-        # Optimized query with minimal data needed for Kanban - PERSONAL TASKS ONLY
+        # TaskSerializer reads every Task field, so deferring columns would cost a query per task - PERSONAL TASKS ONLY
         all_tasks = Task.objects.filter(
             user=request.user,  # Only personal tasks, not team tasks
             team__isnull=True,  # Exclude team tasks
             status__in=['todo', 'in_progress', 'review', 'done']
-        ).select_related('user', 'assigned_to').only(
-            'id', 'title', 'description', 'status', 'priority', 'due_date', 
-            'user_id', 'assigned_to_id', 'created_at'
-        )
+        ).select_related('user', 'assigned_to')
         
-        # Organize tasks by status using list comprehension for better performance
-        data = {
-            'todo': [TaskSerializer(task, context={'request': request}).data for task in all_tasks if task.status == 'todo'],
-            'in_progress': [TaskSerializer(task, context={'request': request}).data for task in all_tasks if task.status == 'in_progress'],
-            'review': [TaskSerializer(task, context={'request': request}).data for task in all_tasks if task.status == 'review'],
-            'done': [TaskSerializer(task, context={'request': request}).data for task in all_tasks if task.status == 'done']
-        }
+        # Serialize every task once (sharing one MoSCoW map), then organize by status
+        data = {'todo': [], 'in_progress': [], 'review': [], 'done': []}
+        for task_data in TaskSerializer(all_tasks, many=True, context={'request': request}).data:
+            data[task_data['status']].append(task_data)
         
         return Response(data)
     
@@ -599,19 +596,19 @@ class TaskViewSet(viewsets.ModelViewSet):
             user=request.user,
             team__isnull=True,  # Exclude team tasks
             status__in=['todo', 'in_progress']
-        )
+        ).select_related('user', 'assigned_to')
         
-        data = {
-            'must': tasks.filter(priority='must'),
-            'should': tasks.filter(priority='should'),
-            'could': tasks.filter(priority='could'),
-            'wont': tasks.filter(priority='wont')
-        }
+        data = {'must': [], 'should': [], 'could': [], 'wont': []}
+        for task in tasks:
+            if task.priority in data:
+                data[task.priority].append(task)
         
+        # One context for all four columns so the MoSCoW map is built once
+        context = {'request': request}
         serialized_data = {}
-        for priority_key, task_queryset in data.items():
+        for priority_key, task_list in data.items():
             serialized_data[priority_key] = TaskSerializer(
-                task_queryset, many=True, context={'request': request}
+                task_list, many=True, context=context
             ).data
         
         return Response(serialized_data)
@@ -870,22 +867,8 @@ def get_user_tasks_api(request):
             status__in=['todo', 'in_progress']  # Active tasks only
         )[:20]  # Limit to 20 most relevant tasks
         
-        # Get MoSCoW analysis for these tasks
-        result = MoSCoWCacheService.get_moscow_analysis(request.user)
-        
-        # Create task details mapping from MoSCoW analysis
-        task_details = {}
-        for log_entry in result['decision_log']:
-            task_id = int(log_entry['id'])
-            task_details[task_id] = {
-                'category': log_entry['final'],
-                'score': log_entry['score'],
-                'task_type': log_entry['type'],
-                'importance': log_entry['importance'],
-                'urgency': log_entry['urgency'],
-                'due_in_days': log_entry['due_in_days'],
-                'reasoning': log_entry['matched_rule']
-            }
+        # Id-indexed MoSCoW details for these tasks
+        task_details = MoSCoWCacheService.get_task_details(request.user, request)
         
         # Apply MoSCoW analysis and prepare task data
         task_data = []